@@ -0,0 +1,39 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.services.absences import detect_absences
+from core.dates import today
+
+
+class Command(BaseCommand):
+    help = "Registra las faltas (roster sin marcaciones ni permiso aprobado) de un rango de fechas"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="Fecha inicial (YYYY-MM-DD); por defecto ayer")
+        parser.add_argument("--end", help="Fecha final inclusive (YYYY-MM-DD); por defecto ayer")
+        parser.add_argument("--empresa", type=int, help="Limitar a una empresa")
+        parser.add_argument("--chunk-days", type=int, default=7, help="Días procesados por transacción")
+
+    def handle(self, *args, **options):
+        yesterday = today() - timedelta(days=1)
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else yesterday
+            end = date.fromisoformat(options["end"]) if options["end"] else yesterday
+        except ValueError as exc:
+            raise CommandError(f"Fecha inválida: {exc}")
+        if end < start:
+            raise CommandError("La fecha final debe ser mayor o igual a la inicial.")
+        if end > yesterday:
+            raise CommandError("Solo se procesan días cerrados (hasta ayer).")
+        if options["chunk_days"] < 1:
+            raise CommandError("--chunk-days debe ser mayor a 0.")
+
+        total = detect_absences(
+            start,
+            end,
+            empresa_id=options["empresa"],
+            chunk_days=options["chunk_days"],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Faltas registradas: {total}"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.services.write_behind import (
+    DEFAULT_FLUSH_BATCH_SIZE,
+    DEFAULT_FLUSH_INTERVAL_MS,
+    run_flusher,
+)
+
+
+class Command(BaseCommand):
+    help = "Vuelca a AttendanceRecord las marcaciones aceptadas en modo write-behind"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval-ms", type=int, default=DEFAULT_FLUSH_INTERVAL_MS,
+                            help="Pausa entre volcados cuando no hay un lote completo esperando")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_FLUSH_BATCH_SIZE,
+                            help="Marcaciones por lote de bulk_create")
+        parser.add_argument("--once", action="store_true", help="Vaciar la cola y terminar")
+
+    def handle(self, *args, **options):
+        if options["interval_ms"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--interval-ms y --batch-size deben ser mayores a 0.")
+
+        self.stdout.write("Volcado de marcaciones iniciado.")
+        try:
+            total = run_flusher(
+                interval_ms=options["interval_ms"],
+                batch_size=options["batch_size"],
+                once=options["once"],
+            )
+        except KeyboardInterrupt:
+            # La transacción del lote en curso se revierte; sus filas siguen pendientes
+            total = 0
+        self.stdout.write(self.style.SUCCESS(f"Marcaciones volcadas: {total}"))
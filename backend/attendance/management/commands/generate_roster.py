@@ -0,0 +1,34 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.services.roster import ROSTER_DAYS_AHEAD, regenerate_roster
+from core.dates import today
+
+
+class Command(BaseCommand):
+    help = "Genera el roster (TurnoProgramado) de la ventana móvil; pensado para correr cada noche"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="Fecha inicial (YYYY-MM-DD); por defecto hoy")
+        parser.add_argument("--days", type=int, default=ROSTER_DAYS_AHEAD, help="Días de la ventana")
+        parser.add_argument("--empresa", type=int, help="Limitar a una empresa")
+        parser.add_argument("--empleado", type=int, action="append", dest="empleados",
+                            help="Limitar a un empleado (se puede repetir)")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else today()
+        except ValueError as exc:
+            raise CommandError(f"Fecha inválida: {exc}")
+        if options["days"] < 1:
+            raise CommandError("--days debe ser mayor a 0.")
+        end = start + timedelta(days=options["days"] - 1)
+
+        total = regenerate_roster(
+            employee_ids=options["empleados"],
+            empresa_id=options["empresa"],
+            start=start,
+            end=end,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Roster {start} → {end}: {total} turnos programados"))
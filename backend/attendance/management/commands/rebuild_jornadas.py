@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from attendance.services.jornadas import rebuild_jornadas
+
+
+class Command(BaseCommand):
+    help = "Reconstruye JornadaCalculada a partir de las marcaciones en un rango de fechas"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", required=True, help="Fecha inicial (YYYY-MM-DD)")
+        parser.add_argument("--end", help="Fecha final inclusive (YYYY-MM-DD); por defecto hoy")
+        parser.add_argument("--empleado", type=int, action="append", dest="empleados",
+                            help="Limitar a un empleado (se puede repetir)")
+        parser.add_argument("--chunk-days", type=int, default=7, help="Días procesados por transacción")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"])
+            end = date.fromisoformat(options["end"]) if options["end"] else timezone.localdate()
+        except ValueError as exc:
+            raise CommandError(f"Fecha inválida: {exc}")
+        if end < start:
+            raise CommandError("La fecha final debe ser mayor o igual a la inicial.")
+        if options["chunk_days"] < 1:
+            raise CommandError("--chunk-days debe ser mayor a 0.")
+
+        total = rebuild_jornadas(
+            start,
+            end,
+            employee_ids=options["empleados"],
+            chunk_days=options["chunk_days"],
+            stdout=self.stdout,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Jornadas reconstruidas: {total}"))
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_attendancerecord_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['timestamp', 'id'], name='attendance__timesta_ccc387_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventoasistencia',
+            index=models.Index(fields=['registrado_el', 'id'], name='attendance__registr_8db963_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroasistencia',
+            index=models.Index(fields=['fecha_hora', 'id'], name='attendance__fecha_h_9ac23c_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['employee', 'timestamp'], name='attendance__employe_d2a742_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroasistencia',
+            index=models.Index(fields=['empleado', 'fecha_hora'], name='attendance__emplead_2b2a83_idx'),
+        ),
+    ]
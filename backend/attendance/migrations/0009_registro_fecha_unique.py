@@ -0,0 +1,44 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:44
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_fecha(apps, schema_editor):
+    """Día local de cada marca; los duplicados previos quedan sin fecha para no violar la restricción."""
+    RegistroAsistencia = apps.get_model('attendance', 'RegistroAsistencia')
+    seen, batch = set(), []
+    rows = RegistroAsistencia.objects.order_by('fecha_hora', 'id').only('id', 'empleado_id', 'tipo', 'fecha_hora')
+    for registro in rows.iterator(chunk_size=2000):
+        fecha = timezone.localdate(registro.fecha_hora)
+        key = (registro.empleado_id, fecha, registro.tipo)
+        if key in seen:
+            continue
+        seen.add(key)
+        registro.fecha = fecha
+        batch.append(registro)
+        if len(batch) >= 1000:
+            RegistroAsistencia.objects.bulk_update(batch, ['fecha'])
+            batch = []
+    if batch:
+        RegistroAsistencia.objects.bulk_update(batch, ['fecha'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_employee_timestamp_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroasistencia',
+            name='fecha',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_fecha, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='registroasistencia',
+            constraint=models.UniqueConstraint(fields=('empleado', 'fecha', 'tipo'), name='registro_unico_por_dia'),
+        ),
+    ]
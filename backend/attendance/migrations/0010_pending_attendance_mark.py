@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_registro_fecha_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingAttendanceMark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('type', models.CharField(choices=[('CHECK_IN', 'Check in'), ('CHECK_OUT', 'Check out'), ('LUNCH_START', 'Almuerzo inicio'), ('LUNCH_END', 'Almuerzo fin')], max_length=20)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=9, max_digits=18, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=9, max_digits=18, null=True)),
+                ('device_info', models.CharField(blank=True, max_length=255, null=True)),
+                ('is_late', models.BooleanField(default=False)),
+                ('employee', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='employees.empleado')),
+            ],
+            options={
+                'verbose_name': 'Marcación pendiente',
+                'verbose_name_plural': 'Marcaciones pendientes',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['employee', 'timestamp'], name='attendance__employe_adc2cb_idx')],
+            },
+        ),
+    ]
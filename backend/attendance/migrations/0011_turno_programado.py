@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_pending_attendance_mark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TurnoProgramado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+                ('fecha', models.DateField()),
+                ('inicio_esperado', models.DateTimeField()),
+                ('fin_esperado', models.DateTimeField()),
+                ('tolerancia_minutos', models.PositiveIntegerField(default=0)),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turnos_programados', to='employees.empleado')),
+                ('turno', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='attendance.turno')),
+                ('work_shift', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='attendance.workshift')),
+            ],
+            options={
+                'verbose_name': 'Turno Programado',
+                'verbose_name_plural': 'Turnos Programados',
+                'indexes': [models.Index(fields=['fecha', 'empleado'], name='attendance__fecha_3da1ff_idx')],
+                'unique_together': {('empleado', 'fecha')},
+            },
+        ),
+    ]
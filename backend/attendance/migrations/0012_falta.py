@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0011_turno_programado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Falta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+                ('fecha', models.DateField()),
+                ('inicio_esperado', models.DateTimeField()),
+                ('minutos_esperados', models.PositiveIntegerField(default=0)),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='faltas', to='employees.empleado')),
+            ],
+            options={
+                'verbose_name': 'Falta',
+                'verbose_name_plural': 'Faltas',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['fecha', 'empleado'], name='attendance__fecha_59f607_idx')],
+                'unique_together': {('empleado', 'fecha')},
+            },
+        ),
+    ]
@@ -1,4 +1,8 @@
+from typing import Tuple
+
 from django.db import models
+from django.utils import timezone
+from core.dates import tardiness
 from employees.models import Empleado
 from core.models import Empresa, TimeStampedModel
 
@@ -38,6 +42,10 @@ class WorkShift(TimeStampedModel):
     def __str__(self):
         return f"{self.name} ({self.empresa})"
 
+    def tardiness(self, moment) -> Tuple[bool, int]:
+        """(es_tardanza, minutos_atraso) de una entrada en `moment` respecto al inicio del turno."""
+        return tardiness(self.start_time, moment)
+
 
 class AttendanceRecord(TimeStampedModel):
     TYPE_CHOICES = [
@@ -48,7 +56,8 @@ class AttendanceRecord(TimeStampedModel):
     ]
 
     employee = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='attendance_records')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # default (no auto_now_add) para conservar la hora de captura de kioscos/clientes offline
+    timestamp = models.DateTimeField(default=timezone.now)
     type = models.CharField(max_length=20, choices=TYPE_CHOICES)
     latitude = models.DecimalField(max_digits=18, decimal_places=9, null=True, blank=True)
     longitude = models.DecimalField(max_digits=18, decimal_places=9, null=True, blank=True)
@@ -59,6 +68,34 @@ class AttendanceRecord(TimeStampedModel):
         verbose_name = "Registro de Asistencia"
         verbose_name_plural = "Registros de Asistencia"
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['timestamp', 'id']),
+            models.Index(fields=['employee', 'timestamp']),
+        ]
+
+
+class PendingAttendanceMark(models.Model):
+    """
+    Marcación aceptada en modo write-behind (settings.ATTENDANCE_WRITE_BEHIND) que
+    aún no se volcó a AttendanceRecord; ver attendance/services/write_behind.py.
+    """
+
+    # Sin FK en la base: la tabla debe aceptar inserciones baratas en horas pico
+    employee = models.ForeignKey(Empleado, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    timestamp = models.DateTimeField(default=timezone.now)
+    type = models.CharField(max_length=20, choices=AttendanceRecord.TYPE_CHOICES)
+    latitude = models.DecimalField(max_digits=18, decimal_places=9, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=18, decimal_places=9, null=True, blank=True)
+    device_info = models.CharField(max_length=255, blank=True, null=True)
+    is_late = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = "Marcación pendiente"
+        verbose_name_plural = "Marcaciones pendientes"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['employee', 'timestamp']),
+        ]
 
 
 class Geocerca(TimeStampedModel):
@@ -119,6 +156,7 @@ class EventoAsistencia(TimeStampedModel):
         verbose_name = "Evento de Asistencia"
         verbose_name_plural = "Eventos de Asistencia"
         ordering = ['-registrado_el']
+        indexes = [models.Index(fields=['registrado_el', 'id'])]
 
     def __str__(self):
         return f"{self.empleado} - {self.tipo} ({self.registrado_el})"
@@ -147,6 +185,60 @@ class JornadaCalculada(TimeStampedModel):
         return f"{self.empleado} - {self.fecha}"
 
 
+class TurnoProgramado(TimeStampedModel):
+    """
+    Turno esperado por empleado y día (roster) para una ventana móvil; lo genera
+    attendance/services/roster.py a partir del turno efectivo del empleado.
+    """
+
+    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='turnos_programados')
+    fecha = models.DateField()
+    inicio_esperado = models.DateTimeField()
+    fin_esperado = models.DateTimeField()
+    tolerancia_minutos = models.PositiveIntegerField(default=0)
+    work_shift = models.ForeignKey(WorkShift, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    turno = models.ForeignKey(Turno, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    class Meta:
+        verbose_name = "Turno Programado"
+        verbose_name_plural = "Turnos Programados"
+        unique_together = ('empleado', 'fecha')
+        indexes = [
+            models.Index(fields=['fecha', 'empleado']),
+        ]
+
+    def __str__(self):
+        return f"{self.empleado} - {self.fecha}"
+
+    def tardiness(self, moment) -> Tuple[bool, int]:
+        """Atraso contra la hora esperada; dentro de la tolerancia no hay tardanza ni minutos."""
+        seconds = (moment - self.inicio_esperado).total_seconds()
+        if seconds <= self.tolerancia_minutos * 60:
+            return False, 0
+        return True, int(seconds // 60)
+
+
+class Falta(TimeStampedModel):
+    """Día programado en el roster sin marcaciones ni permiso aprobado (ver services/absences.py)."""
+
+    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='faltas')
+    fecha = models.DateField()
+    inicio_esperado = models.DateTimeField()
+    minutos_esperados = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Falta"
+        verbose_name_plural = "Faltas"
+        ordering = ['-fecha']
+        unique_together = ('empleado', 'fecha')
+        indexes = [
+            models.Index(fields=['fecha', 'empleado']),
+        ]
+
+    def __str__(self):
+        return f"{self.empleado} - {self.fecha}"
+
+
 # ===== LEGADO =====
 
 class RegistroAsistencia(models.Model):
@@ -163,11 +255,25 @@ class RegistroAsistencia(models.Model):
     longitud = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     es_tardanza = models.BooleanField(default=False)
     minutos_atraso = models.PositiveIntegerField(default=0, verbose_name="Minutos de Atraso")
+    # Día local de la marca: una ENTRADA y una SALIDA por empleado y día (ver services.marking)
+    fecha = models.DateField(null=True, blank=True, editable=False)
 
     class Meta:
         verbose_name = 'Registro de Asistencia'
         verbose_name_plural = 'Registros de Asistencia'
         ordering = ['-fecha_hora']
+        indexes = [
+            models.Index(fields=['fecha_hora', 'id']),
+            models.Index(fields=['empleado', 'fecha_hora']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['empleado', 'fecha', 'tipo'], name='registro_unico_por_dia'),
+        ]
 
     def __str__(self):
         return f"{self.empleado} - {self.tipo} - {self.fecha_hora}"
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.fecha is None:
+            self.fecha = timezone.localdate(self.fecha_hora) if self.fecha_hora else timezone.localdate()
+        super().save(*args, **kwargs)
@@ -1,7 +1,10 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 from .models import (
     Turno, Geocerca, ReglaAsistencia, EventoAsistencia, JornadaCalculada,
-    RegistroAsistencia, WorkShift, AttendanceRecord,
+    RegistroAsistencia, WorkShift, AttendanceRecord, PendingAttendanceMark, Falta,
 )
 from employees.models import Empleado
 
@@ -46,6 +49,14 @@ class JornadaCalculadaSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class FaltaSerializer(serializers.ModelSerializer):
+    empleado_nombre = serializers.CharField(source='empleado.nombre_completo', read_only=True)
+
+    class Meta:
+        model = Falta
+        fields = ['id', 'empleado', 'empleado_nombre', 'fecha', 'inicio_esperado', 'minutos_esperados']
+
+
 # LEGADO
 
 class RegistroAsistenciaSerializer(serializers.ModelSerializer):
@@ -85,3 +96,45 @@ class AttendanceRecordSerializer(serializers.ModelSerializer):
             'cargo_nombre',
         ]
         read_only_fields = ['id', 'employee', 'timestamp', 'is_late', 'device_info']
+
+
+class AttendanceMarkSerializer(serializers.Serializer):
+    """Marcación individual aceptada en modo write-behind (se valida antes de encolar)."""
+
+    type = serializers.ChoiceField(choices=AttendanceRecord.TYPE_CHOICES, default='CHECK_IN')
+    latitude = serializers.FloatField(required=False, allow_null=True, min_value=-90, max_value=90)
+    longitude = serializers.FloatField(required=False, allow_null=True, min_value=-180, max_value=180)
+
+
+class PendingAttendanceMarkSerializer(serializers.ModelSerializer):
+    provisional_id = serializers.IntegerField(source='id', read_only=True)
+    status = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PendingAttendanceMark
+        fields = ['provisional_id', 'employee', 'timestamp', 'type', 'latitude', 'longitude', 'is_late', 'status']
+        read_only_fields = fields
+
+    def get_status(self, obj):
+        return 'PENDING'
+
+
+class AttendanceBatchMarkSerializer(serializers.Serializer):
+    """Una marcación dentro de un lote enviado por kiosco o cliente offline."""
+
+    # Tolerancia para relojes de dispositivos ligeramente adelantados
+    MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+    client_id = serializers.CharField(max_length=64, required=False, allow_blank=True)
+    employee = serializers.IntegerField(required=False, min_value=1)
+    documento = serializers.CharField(max_length=30, required=False, allow_blank=False)
+    type = serializers.ChoiceField(choices=AttendanceRecord.TYPE_CHOICES, default='CHECK_IN')
+    timestamp = serializers.DateTimeField(required=False)
+    latitude = serializers.FloatField(required=False, allow_null=True, min_value=-90, max_value=90)
+    longitude = serializers.FloatField(required=False, allow_null=True, min_value=-180, max_value=180)
+    device_info = serializers.CharField(max_length=255, required=False, allow_blank=True)
+
+    def validate_timestamp(self, value):
+        if value > timezone.now() + self.MAX_CLOCK_SKEW:
+            raise serializers.ValidationError("La marcación no puede tener fecha futura.")
+        return value
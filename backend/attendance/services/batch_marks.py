@@ -0,0 +1,215 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord, TurnoProgramado
+from attendance.serializers import AttendanceBatchMarkSerializer
+from attendance.signals import marks_bulk_created
+from attendance.services.jornadas import refresh_jornadas
+from attendance.services.roster import roster_by_key, scheduled_tardiness
+from employees.models import Empleado
+
+MAX_MARKS_PER_BATCH = 5000
+BULK_CHUNK_SIZE = 500
+
+
+def is_late_check_in(employee: Empleado, mark_type: str, moment: datetime,
+                     roster: Optional[Dict[Tuple[int, date], TurnoProgramado]] = None) -> bool:
+    """
+    Una entrada es tardía si pasa la hora esperada del roster más su tolerancia; sin
+    fila de roster, si ocurre después del inicio del turno asignado. `roster` (de
+    `roster_by_key`) evita una consulta por marcación en los lotes.
+    """
+    if mark_type != 'CHECK_IN':
+        return False
+    if roster is not None:
+        scheduled = roster.get((employee.pk, timezone.localdate(moment)))
+        scheduled = scheduled.tardiness(moment) if scheduled else None
+    else:
+        scheduled = scheduled_tardiness(employee, moment)
+    if scheduled:
+        return scheduled[0]
+    shift = getattr(employee, 'current_shift', None)
+    if not shift or not shift.start_time:
+        return False
+    return shift.tardiness(moment)[0]
+
+
+@dataclass
+class BatchMarkResult:
+    accepted: List[Dict[str, Any]] = field(default_factory=list)
+    rejected: List[Dict[str, Any]] = field(default_factory=list)
+
+    def reject(self, index: int, item: Any, errors: Any):
+        client_id = item.get('client_id') if isinstance(item, dict) else None
+        self.rejected.append({'index': index, 'client_id': client_id, 'errors': errors})
+
+
+class AttendanceBatchIngestor:
+    """
+    Valida y persiste un lote de marcaciones con una sola consulta de empleados
+    y `bulk_create` por bloques.
+
+    `own_employee` es el empleado del usuario que envía el lote; se usa para filas
+    sin identificador de empleado. Con `restrict_to_own=True` (usuarios sin rol RRHH)
+    solo se aceptan marcaciones propias; con `empresa_id` solo empleados de esa empresa.
+
+    Las filas que ya existen (mismo empleado, tipo y hora: un reintento del cliente
+    offline) se informan como aceptadas con el id existente y `duplicate: True`.
+    """
+
+    def __init__(self, own_employee: Optional[Empleado] = None, restrict_to_own: bool = False,
+                 device_info: str = '', empresa_id: Optional[int] = None):
+        self.own_employee = own_employee
+        self.restrict_to_own = restrict_to_own
+        self.device_info = device_info
+        self.empresa_id = empresa_id
+
+    def ingest(self, items: List[Any]) -> BatchMarkResult:
+        result = BatchMarkResult()
+
+        valid_rows = []
+        for index, item in enumerate(items):
+            serializer = AttendanceBatchMarkSerializer(data=item)
+            if not serializer.is_valid():
+                result.reject(index, item, serializer.errors)
+                continue
+            valid_rows.append((index, item, serializer.validated_data))
+
+        employees_by_id, employees_by_doc = self._load_employees(valid_rows)
+
+        now = timezone.now()
+        seen = set()
+        pending = []
+        for index, item, data in valid_rows:
+            employee = self._match_employee(data, employees_by_id, employees_by_doc)
+            if employee is None:
+                result.reject(index, item, {'employee': ['Empleado no encontrado.']})
+                continue
+            if self.restrict_to_own and (not self.own_employee or employee.pk != self.own_employee.pk):
+                result.reject(index, item, {'employee': ['No autorizado para marcar a otro empleado.']})
+                continue
+
+            moment = data.get('timestamp') or now
+            key = (employee.pk, data['type'], moment)
+            if key in seen:
+                result.reject(index, item, {'non_field_errors': ['Marcación duplicada en el lote.']})
+                continue
+            seen.add(key)
+
+            record = AttendanceRecord(
+                employee=employee,
+                type=data['type'],
+                timestamp=moment,
+                latitude=data.get('latitude'),
+                longitude=data.get('longitude'),
+                device_info=(data.get('device_info') or self.device_info)[:255],
+            )
+            pending.append((index, data.get('client_id'), record))
+
+        existing = self._existing_records(pending)
+        duplicates = [row for row in pending if self._key(row[2]) in existing]
+        pending = [row for row in pending if self._key(row[2]) not in existing]
+
+        # Roster de todas las entradas del lote en una sola consulta
+        roster = roster_by_key(
+            (record.employee_id, timezone.localdate(record.timestamp))
+            for _, _, record in pending
+            if record.type == 'CHECK_IN'
+        )
+        for _, _, record in pending:
+            record.is_late = is_late_check_in(record.employee, record.type, record.timestamp, roster)
+
+        if pending:
+            with transaction.atomic():
+                AttendanceRecord.objects.bulk_create(
+                    [record for _, _, record in pending],
+                    batch_size=BULK_CHUNK_SIZE,
+                )
+                # bulk_create no dispara señales: materializar las jornadas afectadas
+                keys = {
+                    (record.employee_id, timezone.localdate(record.timestamp))
+                    for _, _, record in pending
+                }
+                refresh_jornadas(keys)
+            marks_bulk_created.send(sender=AttendanceRecord, keys=keys)
+
+        for index, client_id, record in pending:
+            result.accepted.append({
+                'index': index,
+                'client_id': client_id,
+                # En MySQL bulk_create no devuelve claves primarias
+                'id': record.pk,
+                'employee': record.employee_id,
+                'type': record.type,
+                'timestamp': record.timestamp,
+                'is_late': record.is_late,
+                'duplicate': False,
+            })
+        for index, client_id, record in duplicates:
+            pk, is_late = existing[self._key(record)]
+            result.accepted.append({
+                'index': index,
+                'client_id': client_id,
+                'id': pk,
+                'employee': record.employee_id,
+                'type': record.type,
+                'timestamp': record.timestamp,
+                'is_late': is_late,
+                'duplicate': True,
+            })
+        result.accepted.sort(key=lambda row: row['index'])
+        result.rejected.sort(key=lambda row: row['index'])
+        return result
+
+    @staticmethod
+    def _key(record: AttendanceRecord) -> Tuple[int, str, datetime]:
+        return record.employee_id, record.type, record.timestamp
+
+    def _existing_records(self, pending) -> Dict[tuple, Tuple[int, bool]]:
+        """{(empleado, tipo, hora): (id, is_late)} de las filas del lote ya guardadas, en una consulta."""
+        if not pending:
+            return {}
+        records = [record for _, _, record in pending]
+        keys = {self._key(record) for record in records}
+        rows = AttendanceRecord.objects.filter(
+            employee_id__in={record.employee_id for record in records},
+            timestamp__gte=min(record.timestamp for record in records),
+            timestamp__lte=max(record.timestamp for record in records),
+        ).order_by().values_list('employee_id', 'type', 'timestamp', 'id', 'is_late')
+        return {
+            (employee_id, mark_type, moment): (pk, is_late)
+            for employee_id, mark_type, moment, pk, is_late in rows
+            if (employee_id, mark_type, moment) in keys
+        }
+
+    def _load_employees(self, valid_rows):
+        ids = {data['employee'] for _, _, data in valid_rows if data.get('employee')}
+        docs = {data['documento'] for _, _, data in valid_rows if data.get('documento')}
+        if not ids and not docs:
+            return {}, {}
+
+        employees = (
+            Empleado.objects.filter(Q(pk__in=ids) | Q(documento__in=docs))
+            .select_related('current_shift')
+        )
+        if self.empresa_id:
+            employees = employees.filter(empresa_id=self.empresa_id)
+
+        by_id, by_doc = {}, {}
+        for emp in employees:
+            by_id[emp.pk] = emp
+            if emp.documento:
+                by_doc[emp.documento] = emp
+        return by_id, by_doc
+
+    def _match_employee(self, data, employees_by_id, employees_by_doc) -> Optional[Empleado]:
+        if data.get('employee'):
+            return employees_by_id.get(data['employee'])
+        if data.get('documento'):
+            return employees_by_doc.get(data['documento'])
+        return self.own_employee
@@ -0,0 +1,277 @@
+"""
+Motor de geocercas compiladas por empresa.
+
+Cada Geocerca activa se compila una vez (JSON → tuplas de floats + bounding box) y
+se indexa en una grilla de celdas de `GRID_CELL_DEG` grados; una consulta solo
+evalúa las geocercas de la celda del punto y cuyo bounding box lo contiene.
+
+Los lotes (`containing_many`) se evalúan con NumPy: el índice guarda los bounding
+boxes y las aristas de cada geocerca como arreglos, y tanto el prefiltro por bounding
+box como el ray casting se aplican a todo el arreglo de puntos de una vez.
+
+El índice vive en memoria del proceso y se reconstruye cuando cambia la versión
+de la empresa, guardada en la caché de Django; las señales de Geocerca y
+ReglaAsistencia (attendance/signals.py) la cambian al confirmar la transacción.
+Con la caché local por proceso (LocMemCache) los demás workers no ven ese cambio,
+así que el índice se reconstruye además cada `LOCAL_INDEX_TTL_SECONDS`.
+"""
+import time
+import uuid
+from dataclasses import dataclass
+from math import asin, cos, radians, sin, sqrt
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.core.cache import cache
+
+from attendance.models import Geocerca, ReglaAsistencia
+from core.cache import is_shared_cache
+
+EARTH_RADIUS_M = 6371000
+METERS_PER_DEGREE = 111320
+GRID_CELL_DEG = 0.05
+# Geocercas que cubren más celdas que esto se evalúan siempre (por bounding box)
+MAX_CELLS_PER_FENCE = 4096
+MAX_POINTS_PER_VALIDATION = 20000
+# Tope de celdas (aristas × puntos) de la matriz del ray casting por bloque
+RAY_CAST_BLOCK = 1_000_000
+LOCAL_INDEX_TTL_SECONDS = 30
+_VERSION_PREFIX = 'attendance:geofence-version'
+
+BBox = Tuple[float, float, float, float]  # (min_lat, min_lng, max_lat, max_lng)
+Point = Tuple[float, float]  # (lat, lng)
+
+
+def haversine_distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia Haversine en metros."""
+    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
+    return 2 * asin(sqrt(a)) * EARTH_RADIUS_M
+
+
+@dataclass(frozen=True)
+class CompiledGeofence:
+    id: int
+    tipo: str
+    bbox: BBox
+    # círculo
+    center: Optional[Point] = None
+    radius_m: float = 0.0
+    # polígono: aristas (lng_i, lng_j, lat_i, pendiente lat/lng) sin tramos verticales en lng
+    edges: Tuple[Tuple[float, float, float, float], ...] = ()
+
+    def in_bbox(self, lat: float, lng: float) -> bool:
+        min_lat, min_lng, max_lat, max_lng = self.bbox
+        return min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+
+    def contains(self, lat: float, lng: float) -> bool:
+        if not self.in_bbox(lat, lng):
+            return False
+        if self.tipo == 'circulo':
+            return haversine_distance_m(lat, lng, self.center[0], self.center[1]) <= self.radius_m
+        # Ray casting sobre aristas precompiladas
+        inside = False
+        for lng_i, lng_j, lat_i, slope in self.edges:
+            if (lng_i > lng) != (lng_j > lng) and lat < slope * (lng - lng_i) + lat_i:
+                inside = not inside
+        return inside
+
+
+def compile_geocerca(geocerca: Geocerca) -> Optional[CompiledGeofence]:
+    """Forma compacta de una geocerca; None si está inactiva o sus coordenadas son inválidas."""
+    data = geocerca.coordenadas
+    if not geocerca.activo or not data:
+        return None
+    try:
+        if geocerca.tipo == 'circulo':
+            center = data.get('center') or {}
+            radius = float(data.get('radius_m') or 0)
+            lat, lng = float(center['lat']), float(center['lng'])
+            if not radius:
+                return None
+            dlat = radius / METERS_PER_DEGREE
+            dlng = radius / (METERS_PER_DEGREE * max(cos(radians(lat)), 1e-6))
+            return CompiledGeofence(
+                id=geocerca.pk,
+                tipo='circulo',
+                bbox=(lat - dlat, lng - dlng, lat + dlat, lng + dlng),
+                center=(lat, lng),
+                radius_m=radius,
+            )
+        if geocerca.tipo == 'poligono' and isinstance(data, list) and len(data) >= 3:
+            points = [(float(p['lat']), float(p['lng'])) for p in data]
+            edges = []
+            for (lat_i, lng_i), (lat_j, lng_j) in zip(points, points[-1:] + points[:-1]):
+                if lng_i != lng_j:
+                    edges.append((lng_i, lng_j, lat_i, (lat_j - lat_i) / (lng_j - lng_i)))
+            lats = [lat for lat, _ in points]
+            lngs = [lng for _, lng in points]
+            return CompiledGeofence(
+                id=geocerca.pk,
+                tipo='poligono',
+                bbox=(min(lats), min(lngs), max(lats), max(lngs)),
+                edges=tuple(edges),
+            )
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+    return None
+
+
+def _cell(lat: float, lng: float) -> Tuple[int, int]:
+    return int(lat // GRID_CELL_DEG), int(lng // GRID_CELL_DEG)
+
+
+def _haversine_many_m(lat, lng, center: Point):
+    """`haversine_distance_m` de un arreglo de puntos a un centro."""
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = radians(center[0]), radians(center[1])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(a)) * EARTH_RADIUS_M
+
+
+def _ray_cast_many(edges, lat, lng):
+    """Ray casting vectorizado: aristas (E, 4) contra M puntos; devuelve un arreglo booleano (M,)."""
+    lng_i, lng_j, lat_i, slope = (column[:, None] for column in edges.T)
+    inside = np.zeros(lat.shape[0], dtype=bool)
+    step = max(1, RAY_CAST_BLOCK // max(len(edges), 1))
+    for start in range(0, lat.shape[0], step):
+        block_lat, block_lng = lat[start:start + step], lng[start:start + step]
+        crosses = (lng_i > block_lng) != (lng_j > block_lng)
+        below = block_lat < slope * (block_lng - lng_i) + lat_i
+        inside[start:start + step] = np.count_nonzero(crosses & below, axis=0) % 2 == 1
+    return inside
+
+
+class GeofenceIndex:
+    """Geocercas activas de una empresa indexadas por celda de grilla."""
+
+    def __init__(self, fences: Iterable[CompiledGeofence], enforced_ids: Iterable[int] = ()):
+        self.fences: Dict[int, CompiledGeofence] = {fence.id: fence for fence in fences}
+        # Forma vectorial para lotes: bounding boxes (F, 4) y aristas (E, 4) de cada polígono
+        self._bboxes = np.array([fence.bbox for fence in self.fences.values()], dtype=float).reshape(-1, 4)
+        self._edges: Dict[int, np.ndarray] = {
+            fence.id: np.array(fence.edges, dtype=float).reshape(-1, 4)
+            for fence in self.fences.values()
+            if fence.tipo == 'poligono'
+        }
+        # Geocercas exigidas por ReglaAsistencia (vacío = sin validación)
+        self.enforced_ids: FrozenSet[int] = frozenset(enforced_ids)
+        self._grid: Dict[Tuple[int, int], List[CompiledGeofence]] = {}
+        self._large: List[CompiledGeofence] = []
+        for fence in self.fences.values():
+            min_lat, min_lng, max_lat, max_lng = fence.bbox
+            (row_a, col_a), (row_b, col_b) = _cell(min_lat, min_lng), _cell(max_lat, max_lng)
+            if (row_b - row_a + 1) * (col_b - col_a + 1) > MAX_CELLS_PER_FENCE:
+                self._large.append(fence)
+                continue
+            for row in range(row_a, row_b + 1):
+                for col in range(col_a, col_b + 1):
+                    self._grid.setdefault((row, col), []).append(fence)
+
+    def _candidates(self, lat: float, lng: float) -> List[CompiledGeofence]:
+        return self._grid.get(_cell(lat, lng), []) + self._large
+
+    def containing(self, lat: float, lng: float, geofence_ids: Optional[Iterable[int]] = None) -> List[int]:
+        """Ids de las geocercas que contienen el punto (opcionalmente solo entre `geofence_ids`)."""
+        allowed = None if geofence_ids is None else set(geofence_ids)
+        return [
+            fence.id for fence in self._candidates(lat, lng)
+            if (allowed is None or fence.id in allowed) and fence.contains(lat, lng)
+        ]
+
+    def contains(self, lat: float, lng: float, geofence_ids: Optional[Iterable[int]] = None) -> bool:
+        allowed = None if geofence_ids is None else set(geofence_ids)
+        return any(
+            (allowed is None or fence.id in allowed) and fence.contains(lat, lng)
+            for fence in self._candidates(lat, lng)
+        )
+
+    def is_allowed(self, lat: float, lng: float) -> bool:
+        """Regla de marcación: dentro de alguna geocerca exigida (o sin geocercas exigidas)."""
+        return not self.enforced_ids or self.contains(lat, lng, self.enforced_ids)
+
+    def containing_many(self, points: Sequence[Point],
+                        geofence_ids: Optional[Iterable[int]] = None) -> List[List[int]]:
+        """
+        Versión por lotes de `containing`: por cada geocerca, prefiltro por bounding box
+        y prueba de contención sobre todo el arreglo de puntos.
+        """
+        allowed = None if geofence_ids is None else set(geofence_ids)
+        coords = np.asarray(points, dtype=float).reshape(-1, 2)
+        lat, lng = coords[:, 0], coords[:, 1]
+        results: List[List[int]] = [[] for _ in range(len(coords))]
+        for position, fence in enumerate(self.fences.values()):
+            if allowed is not None and fence.id not in allowed:
+                continue
+            min_lat, min_lng, max_lat, max_lng = self._bboxes[position]
+            candidates = np.flatnonzero((lat >= min_lat) & (lat <= max_lat) & (lng >= min_lng) & (lng <= max_lng))
+            if not candidates.size:
+                continue
+            if fence.tipo == 'circulo':
+                inside = _haversine_many_m(lat[candidates], lng[candidates], fence.center) <= fence.radius_m
+            else:
+                inside = _ray_cast_many(self._edges[fence.id], lat[candidates], lng[candidates])
+            for point in candidates[inside].tolist():
+                results[point].append(fence.id)
+        return results
+
+
+# ===== Caché por empresa =====
+
+# empresa_id → (versión, instante de construcción, índice) en memoria del proceso
+_local_indexes: Dict[int, Tuple[str, float, GeofenceIndex]] = {}
+
+
+def _version_key(empresa_id: int) -> str:
+    return f"{_VERSION_PREFIX}:{empresa_id}"
+
+
+def geofence_version(empresa_id: int) -> str:
+    """Versión de las geocercas y reglas de la empresa (sin consultar la base de datos)."""
+    key = _version_key(empresa_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key)
+    return version
+
+
+def bump_geofence_version(empresa_id: int) -> None:
+    """Descarta el índice compilado de la empresa (llamado desde attendance/signals.py)."""
+    cache.set(_version_key(empresa_id), uuid.uuid4().hex, None)
+
+
+def build_geofence_index(empresa_id: int) -> GeofenceIndex:
+    fences = [
+        compiled
+        for compiled in map(compile_geocerca, Geocerca.objects.filter(empresa_id=empresa_id, activo=True))
+        if compiled
+    ]
+    enforced = ReglaAsistencia.objects.filter(
+        empresa_id=empresa_id, geocerca__isnull=False
+    ).values_list('geocerca_id', flat=True)
+    return GeofenceIndex(fences, enforced)
+
+
+def get_geofence_index(empresa_id: int) -> GeofenceIndex:
+    version = geofence_version(empresa_id)
+    now = time.monotonic()
+    cached = _local_indexes.get(empresa_id)
+    if cached and cached[0] == version and (is_shared_cache() or now - cached[1] < LOCAL_INDEX_TTL_SECONDS):
+        return cached[2]
+    index = build_geofence_index(empresa_id)
+    _local_indexes[empresa_id] = (version, now, index)
+    return index
+
+
+def validate_points(empresa_id: int, points: Sequence[Point]) -> List[Dict]:
+    """Valida un lote de puntos (importaciones, replays de GPS) contra las geocercas de la empresa."""
+    index = get_geofence_index(empresa_id)
+    results = []
+    for (lat, lng), inside in zip(points, index.containing_many(points)):
+        allowed = not index.enforced_ids or bool(index.enforced_ids.intersection(inside))
+        results.append({'lat': lat, 'lng': lng, 'geocercas': inside, 'permitido': allowed})
+    return results
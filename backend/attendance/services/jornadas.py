@@ -0,0 +1,141 @@
+"""
+Materialización incremental de JornadaCalculada (una fila por empleado y día).
+
+Cada marcación nueva (o movida de día) recalcula solo sus empleado-día; `rebuild_jornadas` reconstruye
+rangos completos por bloques de días (ver comando `rebuild_jornadas`).
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord, JornadaCalculada, RegistroAsistencia
+from core.dates import span_range
+
+UPSERT_BATCH_SIZE = 500
+
+# Tipos de RegistroAsistencia (legado) normalizados a los de AttendanceRecord
+_LEGACY_TYPES = {'ENTRADA': 'CHECK_IN', 'SALIDA': 'CHECK_OUT'}
+
+DayKey = Tuple[int, date]
+
+
+def _collect_marks(start: date, end: date, employee_ids: Optional[Iterable[int]] = None):
+    """Marcaciones de ambas tablas en [start, end] agrupadas por (empleado, día local)."""
+    range_start, range_end = span_range(start, end)
+
+    records = AttendanceRecord.objects.filter(timestamp__gte=range_start, timestamp__lt=range_end)
+    legacy = RegistroAsistencia.objects.filter(fecha_hora__gte=range_start, fecha_hora__lt=range_end)
+    if employee_ids is not None:
+        employee_ids = list(employee_ids)
+        records = records.filter(employee_id__in=employee_ids)
+        legacy = legacy.filter(empleado_id__in=employee_ids)
+
+    marks = defaultdict(list)
+    for emp_id, moment, mark_type, late in records.values_list(
+        'employee_id', 'timestamp', 'type', 'is_late'
+    ).order_by().iterator(chunk_size=2000):
+        marks[(emp_id, timezone.localdate(moment))].append((moment, mark_type, late))
+    for emp_id, moment, mark_type, late in legacy.values_list(
+        'empleado_id', 'fecha_hora', 'tipo', 'es_tardanza'
+    ).order_by().iterator(chunk_size=2000):
+        marks[(emp_id, timezone.localdate(moment))].append((moment, _LEGACY_TYPES.get(mark_type, mark_type), late))
+    return marks
+
+
+def summarize_day(day_marks) -> Dict:
+    """Primera entrada, última salida, minutos netos de almuerzo y estado."""
+    day_marks = sorted(day_marks, key=lambda mark: mark[0])
+    entries = [moment for moment, mark_type, _ in day_marks if mark_type == 'CHECK_IN']
+    exits = [moment for moment, mark_type, _ in day_marks if mark_type == 'CHECK_OUT']
+    first_entry = entries[0] if entries else None
+    last_exit = exits[-1] if exits else None
+    is_late = any(late for _, mark_type, late in day_marks if mark_type == 'CHECK_IN')
+
+    lunch_seconds = 0
+    lunch_start = None
+    for moment, mark_type, _ in day_marks:
+        if mark_type == 'LUNCH_START':
+            lunch_start = moment
+        elif mark_type == 'LUNCH_END' and lunch_start:
+            lunch_seconds += (moment - lunch_start).total_seconds()
+            lunch_start = None
+
+    minutes = 0
+    if first_entry and last_exit and last_exit > first_entry:
+        minutes = max(0, int(((last_exit - first_entry).total_seconds() - lunch_seconds) // 60))
+
+    if not first_entry or not last_exit:
+        estado = 'incompleto'
+    elif is_late:
+        estado = 'tardanza'
+    else:
+        estado = 'completo'
+
+    return {
+        'hora_entrada': first_entry,
+        'hora_salida': last_exit,
+        'minutos_trabajados': minutes,
+        'estado': estado,
+    }
+
+
+def _build_rows(marks, keys: Optional[Set[DayKey]] = None):
+    return [
+        JornadaCalculada(empleado_id=emp_id, fecha=day, **summarize_day(day_marks))
+        for (emp_id, day), day_marks in marks.items()
+        if keys is None or (emp_id, day) in keys
+    ]
+
+
+def _upsert(rows):
+    JornadaCalculada.objects.bulk_create(
+        rows,
+        batch_size=UPSERT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['empleado', 'fecha'],
+        update_fields=['hora_entrada', 'hora_salida', 'minutos_trabajados', 'estado', 'updated_at'],
+    )
+
+
+def refresh_jornadas(keys: Iterable[DayKey]) -> int:
+    """Recalcula (upsert) las jornadas de los pares (empleado_id, fecha) indicados."""
+    keys = set(keys)
+    if not keys:
+        return 0
+    days = [day for _, day in keys]
+    marks = _collect_marks(min(days), max(days), {emp_id for emp_id, _ in keys})
+    rows = _build_rows(marks, keys)
+
+    empty = keys - {(row.empleado_id, row.fecha) for row in rows}
+    with transaction.atomic():
+        if rows:
+            _upsert(rows)
+        # Días que se quedaron sin marcaciones (p. ej. tras eliminar un registro)
+        for emp_id, day in empty:
+            JornadaCalculada.objects.filter(empleado_id=emp_id, fecha=day).delete()
+    return len(rows)
+
+
+def rebuild_jornadas(start: date, end: date, employee_ids: Optional[Iterable[int]] = None,
+                     chunk_days: int = 7, stdout=None) -> int:
+    """Reconstruye las jornadas del rango por bloques de `chunk_days` días."""
+    employee_ids = list(employee_ids) if employee_ids is not None else None
+    total = 0
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(end, chunk_start + timedelta(days=chunk_days - 1))
+        rows = _build_rows(_collect_marks(chunk_start, chunk_end, employee_ids))
+        with transaction.atomic():
+            stale = JornadaCalculada.objects.filter(fecha__gte=chunk_start, fecha__lte=chunk_end)
+            if employee_ids is not None:
+                stale = stale.filter(empleado_id__in=employee_ids)
+            stale.delete()
+            JornadaCalculada.objects.bulk_create(rows, batch_size=UPSERT_BATCH_SIZE)
+        total += len(rows)
+        if stdout:
+            stdout.write(f"{chunk_start} → {chunk_end}: {len(rows)} jornadas")
+        chunk_start = chunk_end + timedelta(days=1)
+    return total
@@ -0,0 +1,153 @@
+"""
+Feed en vivo de entradas del día para el mapa de asistencia.
+
+- `today_entries(since_id)` devuelve solo las entradas posteriores al cursor (id).
+- `feed_hub` es un fan-out en memoria: las vistas de marcación publican y cada
+  stream SSE despierta para consultar `id > cursor`. Las marcas registradas en
+  otros procesos se recogen en el siguiente heartbeat con la misma consulta.
+- Cada stream ocupa un hilo del worker durante `STREAM_MAX_SECONDS`; se admiten
+  como máximo `MAX_CONCURRENT_STREAMS` por proceso (`open_stream` devuelve None
+  si no hay cupo y la vista responde 503).
+"""
+import json
+import threading
+from datetime import datetime
+from time import monotonic
+from typing import Dict, Iterator, List, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from attendance.models import RegistroAsistencia
+from core.dates import day_q, today
+
+HEARTBEAT_SECONDS = 15
+# Duración máxima de un stream; el cliente reconecta con Last-Event-ID
+STREAM_MAX_SECONDS = 300
+MAX_ENTRIES_PER_POLL = 500
+MAX_CONCURRENT_STREAMS = 20
+
+_stream_slots = threading.BoundedSemaphore(MAX_CONCURRENT_STREAMS)
+
+
+class LiveFeedHub:
+    """Contador de publicaciones con Condition: despierta a todos los streams en espera."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._sequence = 0
+
+    @property
+    def sequence(self) -> int:
+        return self._sequence
+
+    def publish(self) -> None:
+        with self._condition:
+            self._sequence += 1
+            self._condition.notify_all()
+
+    def wait(self, last_sequence: int, timeout: float) -> int:
+        """Bloquea hasta una nueva publicación o `timeout`; devuelve la secuencia actual."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._sequence != last_sequence, timeout)
+            return self._sequence
+
+
+feed_hub = LiveFeedHub()
+
+
+def publish_mark(registro: RegistroAsistencia) -> None:
+    """Llamado por las vistas de marcación tras crear un RegistroAsistencia."""
+    if registro.tipo == 'ENTRADA':
+        feed_hub.publish()
+
+
+def today_entries(since_id: Optional[int] = None, since_time: Optional[datetime] = None,
+                  limit: Optional[int] = None) -> List[Dict]:
+    """Entradas de hoy (id ascendente); solo las posteriores a `since_id` / `since_time` si se indican."""
+    qs = RegistroAsistencia.objects.filter(day_q('fecha_hora', today()), tipo='ENTRADA')
+    if since_id is not None:
+        qs = qs.filter(id__gt=since_id)
+    if since_time is not None:
+        qs = qs.filter(fecha_hora__gt=since_time)
+    qs = qs.order_by('id').values(
+        'id',
+        'empleado__nombres',
+        'empleado__apellidos',
+        'es_tardanza',
+        'latitud',
+        'longitud',
+        'fecha_hora',
+        'minutos_atraso',
+    )
+    if limit:
+        qs = qs[:limit]
+    return [
+        {
+            'id': row['id'],
+            'empleado_nombre': f"{row['empleado__nombres']} {row['empleado__apellidos']}",
+            'estado': 'Tarde' if row['es_tardanza'] else 'A tiempo',
+            'lat': float(row['latitud']) if row['latitud'] else None,
+            'lng': float(row['longitud']) if row['longitud'] else None,
+            'fecha_hora': row['fecha_hora'].isoformat(),
+            'minutos_atraso': row['minutos_atraso'],
+        }
+        for row in qs
+    ]
+
+
+def iter_sse(since_id: Optional[int] = None, max_seconds: int = STREAM_MAX_SECONDS) -> Iterator[str]:
+    """
+    Eventos SSE (`event: mark`, `id: <id>`) posteriores a `since_id` durante `max_seconds`.
+    Sin `since_id` el stream empieza en la última marca existente.
+    """
+    cursor = since_id
+    if cursor is None:
+        cursor = RegistroAsistencia.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    deadline = monotonic() + max_seconds
+    yield f"retry: {HEARTBEAT_SECONDS * 1000}\n\n"
+
+    sequence = feed_hub.sequence
+    while True:
+        entries = today_entries(cursor, limit=MAX_ENTRIES_PER_POLL)
+        for entry in entries:
+            cursor = entry['id']
+            yield f"id: {cursor}\nevent: mark\ndata: {json.dumps(entry, cls=DjangoJSONEncoder)}\n\n"
+        if len(entries) == MAX_ENTRIES_PER_POLL:
+            continue
+
+        remaining = deadline - monotonic()
+        if remaining <= 0:
+            return
+        new_sequence = feed_hub.wait(sequence, min(HEARTBEAT_SECONDS, remaining))
+        if new_sequence == sequence:
+            yield ": ping\n\n"
+        sequence = new_sequence
+
+
+class _SlotStream:
+    """Itera los eventos y libera el cupo al cerrarse (WSGI llama a close() aunque el stream no haya empezado)."""
+
+    def __init__(self, events: Iterator[str]):
+        self._events = events
+        self._open = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        return next(self._events)
+
+    def close(self) -> None:
+        try:
+            self._events.close()
+        finally:
+            if self._open:
+                self._open = False
+                _stream_slots.release()
+
+
+def open_stream(since_id: Optional[int] = None) -> Optional[_SlotStream]:
+    """Stream SSE que ocupa un cupo del proceso; None si ya hay MAX_CONCURRENT_STREAMS abiertos."""
+    if not _stream_slots.acquire(blocking=False):
+        return None
+    return _SlotStream(iter_sse(since_id))
@@ -0,0 +1,76 @@
+"""
+Marcación de asistencia del empleado (MarcarAsistenciaView y el portal).
+
+La unicidad "una ENTRADA y una SALIDA por empleado y día" la garantiza la
+restricción `registro_unico_por_dia` sobre (empleado, fecha, tipo): marcar es un
+INSERT y el IntegrityError se traduce en "ya marcado", sin carreras entre
+comprobar y crear. El atraso se calcula con el roster (TurnoProgramado) o, sin
+fila para el día, con el turno asignado al empleado; sin ninguno de los dos no
+se asume una hora: la entrada no cuenta como tardanza y se registra un aviso.
+"""
+import logging
+from typing import Optional, Tuple
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from attendance.models import RegistroAsistencia
+from attendance.services.roster import scheduled_tardiness
+from employees.models import Empleado
+
+logger = logging.getLogger(__name__)
+
+ALREADY_MARKED = 'already_marked'
+MISSING_CHECK_IN = 'missing_check_in'
+
+
+def mark_tardiness(empleado: Empleado, tipo: str, moment) -> Tuple[bool, int]:
+    """
+    Contra el roster (hora esperada y tolerancia); sin fila, contra el turno asignado.
+    Sin ninguno la hora esperada es desconocida: (False, 0).
+    """
+    if tipo != 'ENTRADA':
+        return False, 0
+    scheduled = scheduled_tardiness(empleado, moment)
+    if scheduled:
+        return scheduled
+    shift = empleado.current_shift
+    if shift and shift.start_time:
+        return shift.tardiness(moment)
+    logger.warning(
+        "Empleado %s sin roster ni turno para %s: la entrada no se evalúa como tardanza "
+        "(¿falta generate_roster?)", empleado.pk, timezone.localdate(moment),
+    )
+    return False, 0
+
+
+def register_mark(empleado: Empleado, tipo: str, latitud=None, longitud=None
+                  ) -> Tuple[Optional[RegistroAsistencia], Optional[str]]:
+    """
+    Registra la marca de hoy; devuelve (registro, None) o (None, error) con
+    ALREADY_MARKED si ya existe la del mismo tipo o MISSING_CHECK_IN si es
+    una SALIDA sin ENTRADA previa en el día.
+    """
+    now = timezone.now()
+    fecha = timezone.localdate(now)
+    if tipo == 'SALIDA' and not RegistroAsistencia.objects.filter(
+        empleado=empleado, fecha=fecha, tipo='ENTRADA'
+    ).exists():
+        return None, MISSING_CHECK_IN
+
+    es_tardanza, minutos_atraso = mark_tardiness(empleado, tipo, now)
+    try:
+        # Savepoint propio: el IntegrityError no invalida una transacción externa
+        with transaction.atomic():
+            registro = RegistroAsistencia.objects.create(
+                empleado=empleado,
+                tipo=tipo,
+                fecha=fecha,
+                latitud=latitud,
+                longitud=longitud,
+                es_tardanza=es_tardanza,
+                minutos_atraso=minutos_atraso,
+            )
+    except IntegrityError:
+        return None, ALREADY_MARKED
+    return registro, None
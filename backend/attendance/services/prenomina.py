@@ -0,0 +1,127 @@
+"""
+Pre-nómina de asistencia (exportación Excel) a partir de RegistroAsistencia, con
+los mismos criterios que la exportación original por empleado:
+
+- Días trabajados y minutos de atraso: una sola agregación agrupada de Empleado
+  con sus ENTRADA del mes (LEFT JOIN + GROUP BY).
+- Horas extra: requieren emparejar cada ENTRADA con la SALIDA siguiente del mismo
+  día, así que salen de un único recorrido ordenado de las marcaciones del mes.
+
+AttendanceRecord (y por tanto JornadaCalculada) no entra en esta exportación.
+"""
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterator, Tuple
+
+from django.db.models import Count, Q, Sum
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from attendance.models import RegistroAsistencia
+from core.dates import day_start, range_q
+from employees.models import Empleado
+
+HORAS_JORNADA = 8
+HEADERS = [
+    'Nombre Empleado',
+    'Días Trabajados',
+    'Horas Extra (Calculadas)',
+    'Minutos de Atraso',
+    'Estado',
+]
+
+
+def month_bounds(year: int, month: int) -> Tuple[date, date]:
+    """Primer día del mes y primer día del mes siguiente (rango semiabierto)."""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def _estado(minutos_atraso: int) -> str:
+    if minutos_atraso == 0:
+        return 'Excelente'
+    if minutos_atraso < 30:
+        return 'Bueno'
+    return 'Requiere Atención'
+
+
+def _overtime_by_employee(start: date, end: date) -> Dict[int, float]:
+    """Horas extra por empleado: pares ENTRADA/SALIDA del mismo día que pasan de 8 horas."""
+    overtime = defaultdict(float)
+    entrada_actual = {}
+    registros = (
+        RegistroAsistencia.objects.filter(range_q('fecha_hora', day_start(start), day_start(end)))
+        .order_by('empleado_id', 'fecha_hora')
+        .values_list('empleado_id', 'tipo', 'fecha_hora')
+    )
+    for empleado_id, tipo, fecha_hora in registros.iterator(chunk_size=2000):
+        if tipo == 'ENTRADA':
+            entrada_actual[empleado_id] = fecha_hora
+            continue
+        entrada = entrada_actual.get(empleado_id)
+        if tipo == 'SALIDA' and entrada and entrada.date() == fecha_hora.date():
+            del entrada_actual[empleado_id]
+            horas = (fecha_hora - entrada).total_seconds() / 3600
+            if horas > HORAS_JORNADA:
+                overtime[empleado_id] += horas - HORAS_JORNADA
+    return overtime
+
+
+def iter_prenomina_rows(start: date, end: date, empresa_id=None) -> Iterator[list]:
+    """Filas [nombre, días, horas extra, minutos atraso, estado] para empleados activos."""
+    entrada = Q(registros_asistencia__tipo='ENTRADA') & range_q(
+        'registros_asistencia__fecha_hora', day_start(start), day_start(end)
+    )
+    empleados = Empleado.objects.filter(estado='activo')
+    if empresa_id:
+        empleados = empleados.filter(empresa_id=empresa_id)
+    empleados = empleados.annotate(
+        dias=Count('registros_asistencia', filter=entrada),
+        minutos_atraso=Sum(
+            'registros_asistencia__minutos_atraso',
+            filter=entrada & Q(registros_asistencia__es_tardanza=True),
+        ),
+    ).values('id', 'nombres', 'apellidos', 'dias', 'minutos_atraso')
+
+    overtime = _overtime_by_employee(start, end)
+
+    for emp in empleados.iterator(chunk_size=2000):
+        minutos_atraso = emp['minutos_atraso'] or 0
+        yield [
+            f"{emp['nombres']} {emp['apellidos']}",
+            emp['dias'],
+            round(overtime.get(emp['id'], 0), 2),
+            minutos_atraso,
+            _estado(minutos_atraso),
+        ]
+
+
+def write_prenomina_xlsx(fileobj, start: date, end: date, empresa_id=None) -> None:
+    """Escribe la pre-nómina en modo write-only de openpyxl (memoria constante)."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Pre-Nómina")
+    for col in range(1, len(HEADERS) + 1):
+        ws.column_dimensions[get_column_letter(col)].width = 25
+
+    header_font = Font(bold=True, size=12, color="FFFFFF")
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    header_alignment = Alignment(horizontal='center', vertical='center')
+    header_row = []
+    for header in HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+        header_row.append(cell)
+    ws.append(header_row)
+
+    for row in iter_prenomina_rows(start, end, empresa_id=empresa_id):
+        ws.append(row)
+    wb.save(fileobj)
+
+
+def prenomina_filename(start: date) -> str:
+    return f'pre-nomina_{start.strftime("%Y-%m")}.xlsx'
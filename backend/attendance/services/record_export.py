@@ -0,0 +1,74 @@
+"""
+Exportación en streaming de AttendanceRecord (NDJSON o CSV).
+
+Recorre el queryset con `.values().iterator()` para no construir instancias de modelo
+ni serializadores: la memoria se mantiene constante sin importar el rango exportado.
+"""
+import csv
+import json
+from typing import Dict, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Mismas columnas que AttendanceRecordSerializer
+COLUMNS = [
+    'id',
+    'employee',
+    'employee_name',
+    'timestamp',
+    'type',
+    'latitude',
+    'longitude',
+    'device_info',
+    'is_late',
+    'sucursal_nombre',
+    'sucursal_id',
+    'cargo_nombre',
+]
+
+_VALUES = {
+    'id': 'id',
+    'employee': 'employee_id',
+    'timestamp': 'timestamp',
+    'type': 'type',
+    'latitude': 'latitude',
+    'longitude': 'longitude',
+    'device_info': 'device_info',
+    'is_late': 'is_late',
+    'nombres': 'employee__nombres',
+    'apellidos': 'employee__apellidos',
+    'sucursal_nombre': 'employee__sucursal__nombre',
+    'sucursal_id': 'employee__sucursal_id',
+    'cargo_nombre': 'employee__cargo__nombre',
+}
+
+
+def iter_export_rows(queryset) -> Iterator[Dict]:
+    rows = queryset.select_related(None).values(*_VALUES.values())
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        values = {key: row[field] for key, field in _VALUES.items()}
+        values['employee_name'] = f"{values.pop('nombres')} {values.pop('apellidos')}"
+        values['timestamp'] = timezone.localtime(values['timestamp']).isoformat()
+        yield {column: values[column] for column in COLUMNS}
+
+
+def iter_ndjson(queryset) -> Iterator[str]:
+    for row in iter_export_rows(queryset):
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """Pseudo-archivo para csv.writer: devuelve la línea en lugar de escribirla."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for row in iter_export_rows(queryset):
+        yield writer.writerow([row[column] for column in COLUMNS])
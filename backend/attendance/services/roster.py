@@ -0,0 +1,142 @@
+"""
+Roster materializado (TurnoProgramado): una fila por empleado y día laborable con
+hora de entrada/salida esperada y tolerancia, para una ventana móvil de días.
+
+Turno efectivo de cada empleado (mismo orden que EmpleadoSerializer.shift_details):
+1. `current_shift` (WorkShift): días `days`, tolerancia de la ReglaAsistencia de la empresa.
+2. Si no tiene, el Turno del contrato legado activo: `dias_semana`, `tolerancia_minutos`.
+
+Las señales de attendance/signals.py regeneran la ventana de los empleados
+afectados cuando cambian turnos, reglas, contratos o asignaciones; el comando
+`generate_roster` la avanza cada noche. Los días pasados no se regeneran (historial).
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from attendance.models import ReglaAsistencia, TurnoProgramado
+from core.dates import today
+from employees.models import Empleado
+from employees.services.employment import active_contrato, with_employment_context
+
+ROSTER_DAYS_AHEAD = 14
+BULK_BATCH_SIZE = 1000
+
+
+def default_window() -> tuple:
+    start = today()
+    return start, start + timedelta(days=ROSTER_DAYS_AHEAD - 1)
+
+
+def _rule_tolerances(empresa_ids: Iterable[int]) -> Dict[int, int]:
+    """Tolerancia por empresa (la regla más reciente si hay varias)."""
+    tolerances = {}
+    for empresa_id, minutes in (
+        ReglaAsistencia.objects.filter(empresa_id__in=set(empresa_ids))
+        .order_by('id')
+        .values_list('empresa_id', 'considera_tardanza_min')
+    ):
+        tolerances[empresa_id] = minutes
+    return tolerances
+
+
+def effective_shift(empleado: Empleado, tolerances: Dict[int, int]) -> Optional[dict]:
+    """{'start', 'end', 'days', 'tolerance', 'work_shift_id', 'turno_id'} o None sin turno."""
+    shift = empleado.current_shift
+    if shift:
+        return {
+            'start': shift.start_time, 'end': shift.end_time, 'days': shift.days or [],
+            'tolerance': tolerances.get(empleado.empresa_id, 0), 'work_shift_id': shift.pk, 'turno_id': None,
+        }
+    contrato = active_contrato(empleado)
+    turno = contrato.contrato_turno if contrato else None
+    if turno:
+        return {
+            'start': turno.hora_inicio, 'end': turno.hora_fin, 'days': turno.dias_semana or [],
+            'tolerance': turno.tolerancia_minutos, 'work_shift_id': None, 'turno_id': turno.pk,
+        }
+    return None
+
+
+def roster_rows(empleados: Iterable[Empleado], start: date, end: date) -> List[TurnoProgramado]:
+    empleados = list(empleados)
+    tolerances = _rule_tolerances(emp.empresa_id for emp in empleados)
+    tz = timezone.get_current_timezone()
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    rows = []
+    for empleado in empleados:
+        shift = effective_shift(empleado, tolerances)
+        if not shift:
+            continue
+        weekdays = {int(day) for day in shift['days']}
+        for day in days:
+            if day.weekday() not in weekdays:
+                continue
+            expected_start = timezone.make_aware(datetime.combine(day, shift['start']), tz)
+            expected_end = timezone.make_aware(datetime.combine(day, shift['end']), tz)
+            if expected_end <= expected_start:  # turno nocturno
+                expected_end += timedelta(days=1)
+            rows.append(TurnoProgramado(
+                empleado_id=empleado.pk,
+                fecha=day,
+                inicio_esperado=expected_start,
+                fin_esperado=expected_end,
+                tolerancia_minutos=shift['tolerance'],
+                work_shift_id=shift['work_shift_id'],
+                turno_id=shift['turno_id'],
+            ))
+    return rows
+
+
+def regenerate_roster(employee_ids: Optional[Iterable[int]] = None, empresa_id: Optional[int] = None,
+                      start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """
+    Reescribe el roster de [start, end] (por defecto hoy + ROSTER_DAYS_AHEAD) para los
+    empleados indicados, la empresa o todos; devuelve las filas generadas.
+    """
+    default_start, default_end = default_window()
+    start, end = start or default_start, end or default_end
+    empleados = Empleado.objects.filter(estado='activo')
+    stale = TurnoProgramado.objects.filter(fecha__gte=start, fecha__lte=end)
+    if employee_ids is not None:
+        employee_ids = list(employee_ids)
+        empleados = empleados.filter(pk__in=employee_ids)
+        stale = stale.filter(empleado_id__in=employee_ids)
+    if empresa_id:
+        empleados = empleados.filter(empresa_id=empresa_id)
+        stale = stale.filter(empleado__empresa_id=empresa_id)
+
+    rows = roster_rows(with_employment_context(empleados), start, end)
+    with transaction.atomic():
+        stale.delete()
+        TurnoProgramado.objects.bulk_create(rows, batch_size=BULK_BATCH_SIZE)
+    return len(rows)
+
+
+def roster_by_key(keys: Iterable) -> Dict[tuple, TurnoProgramado]:
+    """{(empleado_id, fecha): TurnoProgramado} para los pares indicados, en una consulta."""
+    by_employee = defaultdict(set)
+    for employee_id, day in keys:
+        by_employee[employee_id].add(day)
+    if not by_employee:
+        return {}
+    days = {day for employee_days in by_employee.values() for day in employee_days}
+    rows = TurnoProgramado.objects.filter(empleado_id__in=by_employee.keys(), fecha__in=days)
+    return {
+        (row.empleado_id, row.fecha): row
+        for row in rows
+        if row.fecha in by_employee[row.empleado_id]
+    }
+
+
+def scheduled_shift(employee_id: int, day: date) -> Optional[TurnoProgramado]:
+    return TurnoProgramado.objects.filter(empleado_id=employee_id, fecha=day).first()
+
+
+def scheduled_tardiness(empleado: Empleado, moment: datetime) -> Optional[Tuple[bool, int]]:
+    """Atraso contra el roster del día de `moment` (una consulta por índice único); None si no hay fila."""
+    scheduled = scheduled_shift(empleado.pk, timezone.localdate(moment))
+    return scheduled.tardiness(moment) if scheduled else None
@@ -0,0 +1,172 @@
+"""
+Estado del día (entrada/salida/última marca) por empleado para el inicio de la app.
+
+Se calcula con una consulta de agregación condicional sobre el índice
+(employee, timestamp) y se guarda en la caché de Django por (empleado, día, generación).
+
+Al confirmarse una marcación nueva (attendance/signals.py, write-behind) la
+generación del empleado-día avanza y el estado guardado de la generación anterior,
+si existe, se copia a la nueva con la marca aplicada (`_merge_mark`): los polls
+siguientes no tocan la base de datos. Ediciones, borrados e ingestas masivas solo
+avanzan la generación (el siguiente poll recalcula). Un poll que calculó antes del
+commit guarda su estado bajo la generación vieja, que ya nadie lee.
+
+Con la caché local por proceso (LocMemCache) los demás workers no ven la nueva
+generación: allí el estado vive `LOCAL_CACHE_TTL_SECONDS`. En modo write-behind el
+estado incluye las marcaciones aún no volcadas.
+"""
+import hashlib
+import json
+import time
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from attendance.models import AttendanceRecord, PendingAttendanceMark
+from core.cache import is_shared_cache
+from core.dates import day_q, today
+
+CACHE_TTL_SECONDS = 600
+LOCAL_CACHE_TTL_SECONDS = 15
+# Más largo que el estado: una generación perdida no debe reaparecer con un valor ya usado
+GENERATION_TTL_SECONDS = 2 * 24 * 60 * 60
+_CACHE_PREFIX = "attendance:today-status"
+
+
+def _generation_key(employee_id: int, day: date) -> str:
+    return f"{_CACHE_PREFIX}:gen:{employee_id}:{day.isoformat()}"
+
+
+def _cache_key(employee_id: int, day: date, generation: int) -> str:
+    return f"{_CACHE_PREFIX}:{employee_id}:{day.isoformat()}:{generation}"
+
+
+def _state_ttl() -> int:
+    return CACHE_TTL_SECONDS if is_shared_cache() else LOCAL_CACHE_TTL_SECONDS
+
+
+def _generation(employee_id: int, day: date) -> int:
+    key = _generation_key(employee_id, day)
+    generation = cache.get(key)
+    if generation is None:
+        # Arranca en milisegundos: una clave expulsada no repite generaciones anteriores
+        cache.add(key, int(time.time() * 1000), GENERATION_TTL_SECONDS)
+        generation = cache.get(key)
+    return generation
+
+
+def _next_generation(employee_id: int, day: date) -> int:
+    """Avanza la generación (incremento atómico) y devuelve la nueva."""
+    key = _generation_key(employee_id, day)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        _generation(employee_id, day)
+        return cache.incr(key)
+
+
+def _empty_state() -> Dict:
+    return {'has_checked_in': False, 'has_checked_out': False, 'last_type': None, 'last_timestamp': None}
+
+
+def compute_day_state(employee_id: int, day: date) -> Dict:
+    """Una sola consulta: conteos condicionales, última hora y tipo de la última marca."""
+    day_filter = day_q('timestamp', day)
+    pending = []
+    if getattr(settings, 'ATTENDANCE_WRITE_BEHIND', False):
+        # Antes que AttendanceRecord: si un volcado termina entre ambas consultas, la
+        # marcación se ve dos veces (inocuo) en lugar de ninguna
+        pending = list(
+            PendingAttendanceMark.objects.filter(day_filter, employee_id=employee_id).order_by('timestamp', 'id')
+        )
+    last_type = (
+        AttendanceRecord.objects.filter(day_filter, employee_id=OuterRef('employee_id'))
+        .order_by('-timestamp', '-id')
+        .values('type')[:1]
+    )
+    rows = (
+        AttendanceRecord.objects.filter(day_filter, employee_id=employee_id)
+        .order_by()
+        .values('employee_id')
+        .annotate(
+            check_ins=Count('id', filter=Q(type='CHECK_IN')),
+            check_outs=Count('id', filter=Q(type='CHECK_OUT')),
+            last_timestamp=Max('timestamp'),
+            last_type=Subquery(last_type),
+        )[:1]
+    )
+    if rows:
+        row = rows[0]
+        state = {
+            'has_checked_in': row['check_ins'] > 0,
+            'has_checked_out': row['check_outs'] > 0,
+            'last_type': row['last_type'],
+            'last_timestamp': row['last_timestamp'].isoformat(),
+        }
+    else:
+        state = _empty_state()
+    for mark in pending:
+        _merge_mark(state, mark)
+    return state
+
+
+def _merge_mark(state: Dict, record) -> None:
+    """Aplica una marcación (AttendanceRecord o PendingAttendanceMark) al estado."""
+    if record.type == 'CHECK_IN':
+        state['has_checked_in'] = True
+    elif record.type == 'CHECK_OUT':
+        state['has_checked_out'] = True
+    last = parse_datetime(state['last_timestamp']) if state['last_timestamp'] else None
+    if last is None or record.timestamp >= last:
+        state['last_type'] = record.type
+        state['last_timestamp'] = record.timestamp.isoformat()
+
+
+def get_today_status(employee_id: int) -> Dict:
+    day = today()
+    generation = _generation(employee_id, day)
+    key = _cache_key(employee_id, day, generation)
+    state = cache.get(key)
+    if state is None:
+        state = compute_day_state(employee_id, day)
+        # add: si una marca ya aplicó su estado a esta generación, ese gana
+        cache.add(key, state, _state_ttl())
+    return state
+
+
+def state_etag(state: Dict) -> str:
+    encoded = json.dumps(state, sort_keys=True)
+    return '"%s"' % hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def apply_mark(record) -> None:
+    """
+    Aplica una marcación nueva ya confirmada (AttendanceRecord o PendingAttendanceMark)
+    al estado guardado; sin estado previo solo avanza la generación.
+    """
+    employee_id, day = record.employee_id, timezone.localdate(record.timestamp)
+    generation = _next_generation(employee_id, day)
+    # Solo la generación inmediata anterior: si otra marca avanzó antes, su estado
+    # (con ambas marcas aplicadas o ninguna) decide y no se pierde ninguna
+    state = cache.get(_cache_key(employee_id, day, generation - 1))
+    if state is not None:
+        _merge_mark(state, record)
+        cache.add(_cache_key(employee_id, day, generation), state, _state_ttl())
+
+
+def invalidate_day_states(keys: Iterable[Tuple[int, date]]) -> None:
+    for employee_id, day in set(keys):
+        _next_generation(employee_id, day)
+
+
+def invalidate_for_record(record, previous: Optional[Tuple[int, date]] = None) -> None:
+    """Descarta el estado del día de la marcación (AttendanceRecord o PendingAttendanceMark)."""
+    keys = {(record.employee_id, timezone.localdate(record.timestamp))}
+    if previous:
+        keys.add(previous)
+    invalidate_day_states(keys)
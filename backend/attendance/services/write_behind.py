@@ -0,0 +1,116 @@
+"""
+Write-behind de marcaciones para picos de entrada (settings.ATTENDANCE_WRITE_BEHIND).
+
+AttendanceRecordMarkView valida la marcación, la guarda en la tabla angosta
+PendingAttendanceMark (sin FK ni señales) y responde 202 con un id provisional.
+El comando `flush_attendance_marks` la vuelca a AttendanceRecord con
+`bulk_create` por lotes cada N ms o en cuanto hay M filas.
+
+- Orden: lo da `timestamp`, capturado al aceptar la marcación, no el orden de
+  inserción; dos workers pueden volcar lotes en paralelo sin alterarlo. Cada lote
+  lee hasta M ids sin bloquear y bloquea solo esas filas con SKIP LOCKED (sin
+  bloqueo de rango sobre la tabla mientras siguen llegando marcaciones).
+- Estado del día: la marcación aceptada se aplica al estado en caché de
+  today_status y `compute_day_state` suma las pendientes, así la app la ve antes
+  del volcado.
+"""
+import logging
+import threading
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord, PendingAttendanceMark
+from attendance.signals import marks_bulk_created
+from attendance.services.batch_marks import BULK_CHUNK_SIZE, is_late_check_in
+from attendance.services.jornadas import refresh_jornadas
+from attendance.services.today_status import apply_mark
+from employees.models import Empleado
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL_MS = 200
+DEFAULT_FLUSH_BATCH_SIZE = BULK_CHUNK_SIZE
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'ATTENDANCE_WRITE_BEHIND', False)
+
+
+def enqueue_mark(employee: Empleado, mark_type: str, latitude=None, longitude=None,
+                 device_info: str = '') -> PendingAttendanceMark:
+    """Acepta una marcación ya validada; queda visible en el estado del día de inmediato."""
+    now = timezone.now()
+    mark = PendingAttendanceMark.objects.create(
+        employee=employee,
+        timestamp=now,
+        type=mark_type,
+        latitude=latitude,
+        longitude=longitude,
+        device_info=device_info,
+        is_late=is_late_check_in(employee, mark_type, now),
+    )
+    transaction.on_commit(lambda: apply_mark(mark))
+    return mark
+
+
+def flush_pending(batch_size: int = DEFAULT_FLUSH_BATCH_SIZE) -> int:
+    """Vuelca hasta `batch_size` marcaciones pendientes; devuelve cuántas se procesaron."""
+    ids = list(PendingAttendanceMark.objects.order_by('id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return 0
+    with transaction.atomic():
+        # Filas tomadas por otro worker se saltan; las vuelca él
+        marks = list(PendingAttendanceMark.objects.select_for_update(skip_locked=True).filter(id__in=ids))
+        if not marks:
+            return 0
+        # Empleados borrados mientras la marcación esperaba: se descartan
+        existing = set(
+            Empleado.objects.filter(pk__in={mark.employee_id for mark in marks}).values_list('pk', flat=True)
+        )
+        records = [
+            AttendanceRecord(
+                employee_id=mark.employee_id,
+                type=mark.type,
+                timestamp=mark.timestamp,
+                latitude=mark.latitude,
+                longitude=mark.longitude,
+                device_info=mark.device_info,
+                is_late=mark.is_late,
+            )
+            for mark in marks
+            if mark.employee_id in existing
+        ]
+        if len(records) < len(marks):
+            logger.warning("Se descartaron %s marcaciones de empleados inexistentes", len(marks) - len(records))
+        AttendanceRecord.objects.bulk_create(records, batch_size=BULK_CHUNK_SIZE)
+        PendingAttendanceMark.objects.filter(pk__in=[mark.pk for mark in marks]).delete()
+        # bulk_create no dispara señales: jornadas y marcas de nómina se actualizan en
+        # la misma transacción, así una caída no deja marcaciones volcadas sin su
+        # JornadaCalculada. Los bloqueos son solo de las filas del lote (SKIP LOCKED).
+        keys = {(record.employee_id, timezone.localdate(record.timestamp)) for record in records}
+        refresh_jornadas(keys)
+        marks_bulk_created.send(sender=AttendanceRecord, keys=keys)
+    return len(marks)
+
+
+def run_flusher(stop_event: Optional[threading.Event] = None, interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS,
+                batch_size: int = DEFAULT_FLUSH_BATCH_SIZE, once: bool = False) -> int:
+    """
+    Vuelca en bucle: lotes completos seguidos mientras haya `batch_size` filas
+    esperando, y una pausa de `interval_ms` cuando la tabla queda vacía o a medias.
+    """
+    stop_event = stop_event or threading.Event()
+    total = 0
+    while not stop_event.is_set():
+        close_old_connections()
+        flushed = flush_pending(batch_size)
+        total += flushed
+        if flushed < batch_size:
+            if once:
+                break
+            stop_event.wait(interval_ms / 1000)
+    close_old_connections()
+    return total
@@ -0,0 +1,197 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from employees.models import Contrato, Empleado
+from employees.services.resolver import invalidate_user_ids
+
+from .models import AttendanceRecord, Geocerca, ReglaAsistencia, RegistroAsistencia, Turno, WorkShift
+from .services.geofence import bump_geofence_version
+from .services.jornadas import refresh_jornadas
+from .services.roster import regenerate_roster
+from .services.today_status import apply_mark, invalidate_day_states, invalidate_for_record
+
+# Enviada tras insertar marcaciones con bulk_create (no dispara post_save).
+# kwargs: keys = {(employee_id, fecha_local), ...}
+marks_bulk_created = Signal()
+
+
+@receiver(pre_save, sender=AttendanceRecord)
+def remember_previous_day(sender, instance: AttendanceRecord, **kwargs):
+    if instance.pk and not kwargs.get("raw"):
+        previous = AttendanceRecord.objects.filter(pk=instance.pk).values_list("employee_id", "timestamp").first()
+        instance._previous_day_key = (previous[0], timezone.localdate(previous[1])) if previous else None
+
+
+@receiver(pre_save, sender=RegistroAsistencia)
+def remember_previous_registro_day(sender, instance: RegistroAsistencia, **kwargs):
+    if instance.pk and not kwargs.get("raw"):
+        previous = RegistroAsistencia.objects.filter(pk=instance.pk).values_list("empleado_id", "fecha_hora").first()
+        instance._previous_day_key = (previous[0], timezone.localdate(previous[1])) if previous else None
+
+
+def _refresh_mark_days(instance, employee_id, moment):
+    # Si la marcación cambió de día (o de empleado) también se recalcula la jornada anterior
+    keys = {(employee_id, timezone.localdate(moment))}
+    previous = getattr(instance, "_previous_day_key", None)
+    if previous:
+        keys.add(previous)
+    refresh_jornadas(keys)
+
+
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+def refresh_jornada_from_record(sender, instance: AttendanceRecord, **kwargs):
+    if kwargs.get("raw"):
+        return
+    _refresh_mark_days(instance, instance.employee_id, instance.timestamp)
+
+
+@receiver(post_save, sender=RegistroAsistencia)
+@receiver(post_delete, sender=RegistroAsistencia)
+def refresh_jornada_from_registro(sender, instance: RegistroAsistencia, **kwargs):
+    if kwargs.get("raw"):
+        return
+    _refresh_mark_days(instance, instance.empleado_id, instance.fecha_hora)
+
+
+# ===== Estado del día en caché (services.today_status) =====
+
+@receiver(post_save, sender=AttendanceRecord)
+def update_today_status(sender, instance: AttendanceRecord, created: bool, **kwargs):
+    if kwargs.get("raw"):
+        return
+    # Al confirmar: antes, un poll concurrente aún leería las filas anteriores
+    if created:
+        transaction.on_commit(lambda: apply_mark(instance))
+    else:
+        previous = getattr(instance, "_previous_day_key", None)
+        transaction.on_commit(lambda: invalidate_for_record(instance, previous))
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def invalidate_today_status(sender, instance: AttendanceRecord, **kwargs):
+    transaction.on_commit(lambda: invalidate_for_record(instance))
+
+
+@receiver(marks_bulk_created)
+def invalidate_today_status_for_bulk(sender, keys, **kwargs):
+    transaction.on_commit(lambda: invalidate_day_states(keys))
+
+
+# ===== Empleado resuelto en caché (lleva su turno para calcular atrasos) =====
+
+@receiver(post_save, sender=WorkShift)
+@receiver(post_delete, sender=WorkShift)
+def invalidate_shift_employees(sender, instance: WorkShift, **kwargs):
+    if kwargs.get("raw"):
+        return
+    # En post_delete el SET_NULL ya se aplicó: se invalida a toda la empresa
+    employees = Empleado.objects.filter(empresa_id=instance.empresa_id)
+    if kwargs.get("signal") is post_save:
+        employees = employees.filter(current_shift=instance)
+    invalidate_user_ids(employees.exclude(user_id=None).values_list("user_id", flat=True))
+
+
+# ===== Índice de geocercas compilado (services.geofence) =====
+
+@receiver(post_save, sender=Geocerca)
+@receiver(post_delete, sender=Geocerca)
+@receiver(post_save, sender=ReglaAsistencia)
+@receiver(post_delete, sender=ReglaAsistencia)
+def bump_geofence_index(sender, instance, **kwargs):
+    if kwargs.get("raw"):
+        return
+    # Al confirmar: un worker que reconstruya antes vería las filas anteriores
+    empresa_id = instance.empresa_id
+    transaction.on_commit(lambda: bump_geofence_version(empresa_id))
+
+
+# ===== Roster materializado (services.roster) =====
+
+# Campos que cambian el turno efectivo del empleado (ver services.roster.effective_shift)
+_ROSTER_FIELDS = {
+    Empleado: ("current_shift", "estado", "empresa"),
+    Contrato: ("empleado", "estado", "contrato_turno", "fecha_inicio"),
+}
+
+
+def _roster_values(sender, instance) -> tuple:
+    return tuple(getattr(instance, sender._meta.get_field(name).attname) for name in _ROSTER_FIELDS[sender])
+
+
+def _touches_roster(sender, update_fields) -> bool:
+    return not update_fields or bool(set(_ROSTER_FIELDS[sender]) & set(update_fields))
+
+
+@receiver(pre_save, sender=Empleado)
+@receiver(pre_save, sender=Contrato)
+def remember_roster_fields(sender, instance, **kwargs):
+    if kwargs.get("raw") or not instance.pk or not _touches_roster(sender, kwargs.get("update_fields")):
+        return
+    attnames = [sender._meta.get_field(name).attname for name in _ROSTER_FIELDS[sender]]
+    instance._previous_roster_values = sender.objects.filter(pk=instance.pk).values_list(*attnames).first()
+
+
+def _roster_changed(sender, instance, created: bool, **kwargs) -> bool:
+    if kwargs.get("raw") or not _touches_roster(sender, kwargs.get("update_fields")):
+        return False
+    # Guardados sin cambios en esos campos (la mayoría en admin y serializers) no regeneran
+    return created or getattr(instance, "_previous_roster_values", None) != _roster_values(sender, instance)
+
+
+def _regenerate_roster_on_commit(**scope):
+    transaction.on_commit(lambda: regenerate_roster(**scope))
+
+
+@receiver(post_save, sender=WorkShift)
+def regenerate_roster_for_shift(sender, instance: WorkShift, created: bool, **kwargs):
+    if kwargs.get("raw") or created:
+        return
+    employee_ids = list(Empleado.objects.filter(current_shift=instance).values_list("id", flat=True))
+    if employee_ids:
+        _regenerate_roster_on_commit(employee_ids=employee_ids)
+
+
+@receiver(post_save, sender=Turno)
+def regenerate_roster_for_turno(sender, instance: Turno, created: bool, **kwargs):
+    if kwargs.get("raw") or created:
+        return
+    employee_ids = list(
+        Contrato.objects.filter(contrato_turno=instance, estado="activo").values_list("empleado_id", flat=True)
+    )
+    if employee_ids:
+        _regenerate_roster_on_commit(employee_ids=employee_ids)
+
+
+@receiver(post_delete, sender=WorkShift)
+@receiver(post_delete, sender=Turno)
+@receiver(post_save, sender=ReglaAsistencia)
+@receiver(post_delete, sender=ReglaAsistencia)
+def regenerate_roster_for_company(sender, instance, **kwargs):
+    # Borrados: el SET_NULL ya se aplicó y no se sabe a quién afectaba
+    if kwargs.get("raw"):
+        return
+    _regenerate_roster_on_commit(empresa_id=instance.empresa_id)
+
+
+@receiver(post_save, sender=Empleado)
+def regenerate_roster_for_employee(sender, instance: Empleado, created: bool, **kwargs):
+    if _roster_changed(sender, instance, created, **kwargs):
+        _regenerate_roster_on_commit(employee_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Contrato)
+def regenerate_roster_for_contrato(sender, instance: Contrato, created: bool, **kwargs):
+    if not _roster_changed(sender, instance, created, **kwargs):
+        return
+    previous = getattr(instance, "_previous_roster_values", None)
+    # Contrato movido a otro empleado: también el anterior
+    employee_ids = {instance.empleado_id, previous[0] if previous else None} - {None}
+    _regenerate_roster_on_commit(employee_ids=list(employee_ids))
+
+
+@receiver(post_delete, sender=Contrato)
+def regenerate_roster_for_deleted_contrato(sender, instance: Contrato, **kwargs):
+    _regenerate_roster_on_commit(employee_ids=[instance.empleado_id])
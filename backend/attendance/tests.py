@@ -1,3 +1,732 @@
+import csv
+import importlib
+import io
+import json
+import random
+import threading
+import zoneinfo
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db.models import Sum
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from attendance.models import (
+    AttendanceRecord, Falta, Geocerca, JornadaCalculada, PendingAttendanceMark, ReglaAsistencia, RegistroAsistencia,
+    TurnoProgramado, WorkShift,
+)
+from attendance.services import geofence, live_feed, today_status, write_behind
+from attendance.services.absences import detect_absences
+from attendance.services.prenomina import iter_prenomina_rows
+from attendance.services.marking import ALREADY_MARKED, MISSING_CHECK_IN, mark_tardiness, register_mark
+from attendance.services.roster import regenerate_roster, scheduled_tardiness
+from core.dates import day_q, days_q, time_window_q
+from core.models import Empresa, IdempotencyKey, Usuario
+from employees.models import Cargo, Empleado, SolicitudAusencia, Sucursal, TipoAusencia
+from leaves.models import LeaveRequest
+
+
+class RegistroUnicoPorDiaTests(TestCase):
+    """Una ENTRADA y una SALIDA por empleado y día, garantizadas por la restricción única."""
+
+    def setUp(self):
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        sucursal = Sucursal.objects.create(empresa=empresa, nombre='Matriz')
+        cargo = Cargo.objects.create(empresa=empresa, nombre='Analista')
+        self.user = Usuario.objects.create_user('ana', 'ana@acme.test', 'pw', role='EMPLOYEE')
+        self.empleado = Empleado.objects.create(
+            empresa=empresa, sucursal=sucursal, cargo=cargo, user=self.user,
+            nombres='Ana', apellidos='Paz', documento='D1', email='ana@acme.test',
+            telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+
+    def test_second_mark_of_same_type_is_already_marked(self):
+        self.assertEqual(register_mark(self.empleado, 'SALIDA'), (None, MISSING_CHECK_IN))
+        registro, error = register_mark(self.empleado, 'ENTRADA')
+        self.assertIsNone(error)
+        self.assertEqual(registro.fecha, timezone.localdate())
+        # El INSERT choca con la restricción; el IntegrityError se traduce en "ya marcado"
+        self.assertEqual(register_mark(self.empleado, 'ENTRADA'), (None, ALREADY_MARKED))
+        self.assertEqual(RegistroAsistencia.objects.filter(empleado=self.empleado).count(), 1)
+
+    def test_marcar_view_rejects_duplicate(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.post('/api/attendance/marcar/', {'tipo': 'ENTRADA'}, format='json').status_code, 201)
+        response = client.post('/api/attendance/marcar/', {'tipo': 'ENTRADA'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_backfill_leaves_duplicates_without_fecha(self):
+        migration = importlib.import_module('attendance.migrations.0009_registro_fecha_unique')
+        day = date(2026, 3, 2)
+        moments = [
+            timezone.make_aware(datetime.combine(day, time(9, 0))),
+            timezone.make_aware(datetime.combine(day, time(9, 5))),
+            timezone.make_aware(datetime.combine(day + timedelta(days=1), time(9, 0))),
+        ]
+        ids = []
+        for moment in moments:
+            registro = RegistroAsistencia.objects.create(empleado=self.empleado, tipo='ENTRADA')
+            # Filas previas a la restricción: sin fecha y con duplicados en el mismo día
+            RegistroAsistencia.objects.filter(pk=registro.pk).update(fecha_hora=moment, fecha=None)
+            ids.append(registro.pk)
+
+        migration.backfill_fecha(apps, None)
+
+        fechas = dict(RegistroAsistencia.objects.filter(pk__in=ids).values_list('pk', 'fecha'))
+        self.assertEqual(fechas, {ids[0]: day, ids[1]: None, ids[2]: day + timedelta(days=1)})
+
+
+class BatchMarkTests(TestCase):
+    """Reintentos del lote y alcance de RRHH por empresa."""
+
+    def setUp(self):
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        otra = Empresa.objects.create(razon_social='Otra', ruc='1790000000002')
+        self.hr_user = Usuario.objects.create_user('rrhh', 'rrhh@acme.test', 'pw', role='HR')
+        self.hr = self._empleado(empresa, 'D1', user=self.hr_user)
+        self.empleado = self._empleado(empresa, 'D2')
+        self.ajeno = self._empleado(otra, 'D3')
+        self.client = APIClient()
+        self.client.force_authenticate(self.hr_user)
+
+    def _empleado(self, empresa, documento, user=None):
+        return Empleado.objects.create(
+            empresa=empresa, user=user,
+            sucursal=Sucursal.objects.create(empresa=empresa, nombre=f'Suc {documento}'),
+            cargo=Cargo.objects.create(empresa=empresa, nombre=f'Cargo {documento}'),
+            nombres='N', apellidos=documento, documento=documento, email=f'{documento}@acme.test',
+            telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+
+    def test_resent_batch_returns_existing_ids(self):
+        marks = [{'employee': self.empleado.pk, 'type': 'CHECK_IN', 'timestamp': '2026-03-02T09:00:00Z', 'client_id': 'a'}]
+        first = self.client.post('/api/attendance/mark/batch/', marks, format='json')
+        self.assertEqual(first.status_code, 201)
+        again = self.client.post('/api/attendance/mark/batch/', marks, format='json')
+        self.assertEqual(again.status_code, 201)
+        row = again.data['accepted'][0]
+        self.assertTrue(row['duplicate'])
+        self.assertEqual(row['id'], AttendanceRecord.objects.get(employee=self.empleado).pk)
+        self.assertEqual(AttendanceRecord.objects.filter(employee=self.empleado).count(), 1)
+
+    def test_hr_cannot_mark_other_empresa(self):
+        marks = [
+            {'employee': self.empleado.pk, 'type': 'CHECK_IN'},
+            {'documento': 'D3', 'type': 'CHECK_IN'},
+        ]
+        response = self.client.post('/api/attendance/mark/batch/', marks, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([row['index'] for row in response.data['rejected']], [1])
+        self.assertFalse(AttendanceRecord.objects.filter(employee=self.ajeno).exists())
+
+
+class JornadaRefreshTests(TestCase):
+    """Mover una marcación a otro día recalcula la jornada de ambos días."""
+
+    def setUp(self):
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.empleado = Empleado.objects.create(
+            empresa=empresa,
+            sucursal=Sucursal.objects.create(empresa=empresa, nombre='Matriz'),
+            cargo=Cargo.objects.create(empresa=empresa, nombre='Analista'),
+            nombres='Ana', apellidos='Paz', documento='D1', email='ana@acme.test',
+            telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+        self.day = date(2026, 3, 2)
+        self.moment = timezone.make_aware(datetime.combine(self.day, time(9, 0)))
+
+    def _fechas(self):
+        return set(JornadaCalculada.objects.filter(empleado=self.empleado).values_list('fecha', flat=True))
+
+    def test_moving_attendance_record(self):
+        record = AttendanceRecord.objects.create(employee=self.empleado, type='CHECK_IN', timestamp=self.moment)
+        self.assertEqual(self._fechas(), {self.day})
+        record.timestamp = self.moment + timedelta(days=1)
+        record.save()
+        self.assertEqual(self._fechas(), {self.day + timedelta(days=1)})
+
+    def test_moving_registro(self):
+        registro = RegistroAsistencia.objects.create(empleado=self.empleado, tipo='ENTRADA')
+        today = timezone.localdate(registro.fecha_hora)
+        self.assertEqual(self._fechas(), {today})
+        registro.fecha_hora = self.moment
+        registro.fecha = self.day
+        registro.save()
+        self.assertEqual(self._fechas(), {self.day})
+
+
+class GeofenceBatchTests(TestCase):
+    """El lote vectorizado coincide con la prueba escalar y el índice se sirve sin consultas."""
+
+    def setUp(self):
+        cache.clear()
+        geofence._local_indexes.clear()
+        self.empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.circle = Geocerca.objects.create(
+            empresa=self.empresa, nombre='Matriz', tipo='circulo',
+            coordenadas={'center': {'lat': -0.18, 'lng': -78.47}, 'radius_m': 500},
+        )
+        # Polígono cóncavo (en forma de L)
+        self.polygon = Geocerca.objects.create(
+            empresa=self.empresa, nombre='Bodega', tipo='poligono',
+            coordenadas=[
+                {'lat': -0.19, 'lng': -78.48}, {'lat': -0.17, 'lng': -78.48}, {'lat': -0.17, 'lng': -78.475},
+                {'lat': -0.18, 'lng': -78.475}, {'lat': -0.18, 'lng': -78.46}, {'lat': -0.19, 'lng': -78.46},
+            ],
+        )
+        ReglaAsistencia.objects.create(empresa=self.empresa, geocerca=self.polygon)
+
+    def test_batch_matches_scalar_contains(self):
+        rng = random.Random(7)
+        points = [(rng.uniform(-0.2, -0.16), rng.uniform(-78.49, -78.45)) for _ in range(2000)]
+        index = geofence.get_geofence_index(self.empresa.pk)
+        expected = [
+            sorted(fence.id for fence in index.fences.values() if fence.contains(lat, lng))
+            for lat, lng in points
+        ]
+        self.assertEqual([sorted(ids) for ids in index.containing_many(points)], expected)
+        self.assertTrue(any(len(ids) == 2 for ids in expected))
+        self.assertTrue(any(not ids for ids in expected))
+
+        results = geofence.validate_points(self.empresa.pk, points)
+        self.assertEqual(
+            [row['permitido'] for row in results],
+            [self.polygon.pk in ids for ids in expected],
+        )
+
+    def test_index_is_cached_until_a_fence_changes(self):
+        index = geofence.get_geofence_index(self.empresa.pk)
+        with self.assertNumQueries(0):
+            self.assertIs(geofence.get_geofence_index(self.empresa.pk), index)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.circle.activo = False
+            self.circle.save()
+        self.assertEqual(set(geofence.get_geofence_index(self.empresa.pk).fences), {self.polygon.pk})
+
+
+class TodayStatusCacheTests(TestCase):
+    """Estado del día: ETag/304 y coherencia de la caché tras una marcación."""
+
+    def setUp(self):
+        cache.clear()
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.user = Usuario.objects.create_user('ana', 'ana@acme.test', 'pw', role='EMPLOYEE')
+        self.empleado = Empleado.objects.create(
+            empresa=empresa, user=self.user,
+            sucursal=Sucursal.objects.create(empresa=empresa, nombre='Matriz'),
+            cargo=Cargo.objects.create(empresa=empresa, nombre='Analista'),
+            nombres='Ana', apellidos='Paz', documento='D1', email='ana@acme.test',
+            telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def mark(self, mark_type='CHECK_IN'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return AttendanceRecord.objects.create(employee=self.empleado, type=mark_type)
+
+    def test_etag_returns_304_until_a_mark(self):
+        first = self.client.get('/api/attendance/today-status/')
+        self.assertEqual(first.status_code, 200)
+        self.assertFalse(first.data['has_checked_in'])
+        etag = first['ETag']
+        self.assertEqual(self.client.get('/api/attendance/today-status/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.mark()
+        after = self.client.get('/api/attendance/today-status/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(after.status_code, 200)
+        self.assertTrue(after.data['has_checked_in'])
+        self.assertNotEqual(after['ETag'], etag)
+
+    def test_mark_is_applied_to_cached_state(self):
+        today_status.get_today_status(self.empleado.pk)
+        record = self.mark()
+        with self.assertNumQueries(0):
+            state = today_status.get_today_status(self.empleado.pk)
+        self.assertEqual(state['last_type'], 'CHECK_IN')
+        self.assertEqual(state['last_timestamp'], record.timestamp.isoformat())
+        self.mark('CHECK_OUT')
+        with self.assertNumQueries(0):
+            self.assertTrue(today_status.get_today_status(self.empleado.pk)['has_checked_out'])
+
+    def test_poll_computed_before_commit_is_not_served(self):
+        day = timezone.localdate()
+        generation = today_status._generation(self.empleado.pk, day)
+        stale = today_status.compute_day_state(self.empleado.pk, day)
+        with self.captureOnCommitCallbacks() as callbacks:
+            AttendanceRecord.objects.create(employee=self.empleado, type='CHECK_IN')
+        # El poll guarda lo que leyó antes del commit; luego se confirma la marca
+        cache.add(today_status._cache_key(self.empleado.pk, day, generation), stale, 600)
+        for callback in callbacks:
+            callback()
+        self.assertTrue(today_status.get_today_status(self.empleado.pk)['has_checked_in'])
+
+    def test_deleting_a_mark_recomputes(self):
+        record = self.mark()
+        self.assertTrue(today_status.get_today_status(self.empleado.pk)['has_checked_in'])
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delete()
+        self.assertFalse(today_status.get_today_status(self.empleado.pk)['has_checked_in'])
+
+
+class PrenominaTests(TestCase):
+    """La pre-nómina agrupada coincide con el cálculo original por empleado."""
+
+    def setUp(self):
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        sucursal = Sucursal.objects.create(empresa=empresa, nombre='Matriz')
+        cargo = Cargo.objects.create(empresa=empresa, nombre='Analista')
+        self.empleados = [
+            Empleado.objects.create(
+                empresa=empresa, sucursal=sucursal, cargo=cargo, nombres='N', apellidos=documento,
+                documento=documento, email=f'{documento}@acme.test', telefono='0999999999',
+                fecha_ingreso=date(2024, 1, 1), estado=estado,
+            )
+            for documento, estado in (('A', 'activo'), ('B', 'activo'), ('C', 'activo'), ('D', 'inactivo'))
+        ]
+        a, b, _, d = self.empleados
+        self.marks(a, '2026-03-02', [('ENTRADA', '08:00', 0), ('SALIDA', '18:30', 0)])
+        self.marks(a, '2026-03-03', [('ENTRADA', '08:20', 20), ('SALIDA', '16:00', 0)])
+        # Duplicado legado sin fecha (dejado por la migración 0009) y SALIDA sin ENTRADA
+        self.marks(a, '2026-03-04', [('ENTRADA', '08:00', 0), ('ENTRADA', '08:05', 5), ('SALIDA', '17:30', 0)])
+        self.marks(b, '2026-03-05', [('SALIDA', '17:00', 0)])
+        self.marks(b, '2026-03-06', [('ENTRADA', '09:45', 45)])
+        self.marks(b, '2026-04-01', [('ENTRADA', '08:00', 0), ('SALIDA', '20:00', 0)])
+        self.marks(d, '2026-03-02', [('ENTRADA', '08:00', 10)])
+        # Las marcaciones de AttendanceRecord no cuentan en esta exportación
+        AttendanceRecord.objects.create(
+            employee=b, type='CHECK_IN', timestamp=timezone.make_aware(datetime(2026, 3, 9, 8, 0)),
+        )
+
+    def marks(self, empleado, day, rows):
+        for tipo, hour, atraso in rows:
+            moment = timezone.make_aware(datetime.fromisoformat(f'{day}T{hour}'))
+            registro = RegistroAsistencia.objects.create(empleado=empleado, tipo=tipo)
+            duplicated = RegistroAsistencia.objects.filter(empleado=empleado, fecha=moment.date(), tipo=tipo).exists()
+            RegistroAsistencia.objects.filter(pk=registro.pk).update(
+                fecha_hora=moment, fecha=None if duplicated else moment.date(),
+                es_tardanza=atraso > 0, minutos_atraso=atraso,
+            )
+
+    @staticmethod
+    def baseline_rows(start, end):
+        """Lógica de la exportación original, una consulta por empleado."""
+        inicio, fin = timezone.make_aware(datetime.combine(start, time.min)), timezone.make_aware(datetime.combine(end, time.min))
+        rows = []
+        for empleado in Empleado.objects.filter(estado='activo'):
+            registros = RegistroAsistencia.objects.filter(empleado=empleado, fecha_hora__gte=inicio, fecha_hora__lt=fin)
+            dias = registros.filter(tipo='ENTRADA').count()
+            horas_extra, entrada_actual = 0, None
+            for registro in registros.order_by('fecha_hora'):
+                if registro.tipo == 'ENTRADA':
+                    entrada_actual = registro.fecha_hora
+                elif registro.tipo == 'SALIDA' and entrada_actual and entrada_actual.date() == registro.fecha_hora.date():
+                    horas = (registro.fecha_hora - entrada_actual).total_seconds() / 3600
+                    if horas > 8:
+                        horas_extra += horas - 8
+                    entrada_actual = None
+            atraso = registros.filter(tipo='ENTRADA', es_tardanza=True).aggregate(total=Sum('minutos_atraso'))['total'] or 0
+            estado = 'Excelente' if atraso == 0 else 'Bueno' if atraso < 30 else 'Requiere Atención'
+            rows.append([str(empleado), dias, round(horas_extra, 2), atraso, estado])
+        return rows
+
+    def test_matches_baseline(self):
+        start, end = date(2026, 3, 1), date(2026, 4, 1)
+        rows = list(iter_prenomina_rows(start, end))
+        self.assertEqual(rows, self.baseline_rows(start, end))
+        self.assertEqual(rows[0], ['N A', 4, 3.92, 25, 'Bueno'])
+        self.assertEqual(rows[1], ['N B', 1, 0, 45, 'Requiere Atención'])
+        self.assertEqual(rows[2], ['N C', 0, 0, 0, 'Excelente'])
+
+    def test_grouped_query_count(self):
+        with self.assertNumQueries(2):
+            list(iter_prenomina_rows(date(2026, 3, 1), date(2026, 4, 1)))
+
+
+class RosterTests(TestCase):
+    """Roster materializado: generación, atraso con tolerancia y regeneración solo ante cambios."""
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        ReglaAsistencia.objects.create(empresa=self.empresa, considera_tardanza_min=10)
+        self.shift = WorkShift.objects.create(
+            empresa=self.empresa, name='Mañana', start_time=time(8, 0), end_time=time(16, 0), days=[0, 1, 2, 3, 4],
+        )
+        self.empleado = Empleado.objects.create(
+            empresa=self.empresa,
+            sucursal=Sucursal.objects.create(empresa=self.empresa, nombre='Matriz'),
+            cargo=Cargo.objects.create(empresa=self.empresa, nombre='Analista'),
+            nombres='Ana', apellidos='Paz', documento='D1', email='ana@acme.test',
+            telefono='0999999999', fecha_ingreso=date(2024, 1, 1), current_shift=self.shift,
+        )
+        self.monday = date(2026, 3, 2)
+
+    def at(self, day, hour, minute=0):
+        return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+    def test_regenerate_roster_and_tardiness(self):
+        created = regenerate_roster([self.empleado.pk], start=self.monday, end=self.monday + timedelta(days=6))
+        self.assertEqual(created, 5)
+        row = TurnoProgramado.objects.get(empleado=self.empleado, fecha=self.monday)
+        self.assertEqual((row.inicio_esperado, row.tolerancia_minutos), (self.at(self.monday, 8), 10))
+
+        self.assertEqual(scheduled_tardiness(self.empleado, self.at(self.monday, 8, 10)), (False, 0))
+        self.assertEqual(scheduled_tardiness(self.empleado, self.at(self.monday, 8, 25)), (True, 25))
+        # Sábado: sin fila de roster
+        self.assertIsNone(scheduled_tardiness(self.empleado, self.at(self.monday + timedelta(days=5), 9)))
+
+    def test_no_roster_nor_shift_is_not_late(self):
+        self.empleado.current_shift = None
+        with self.assertLogs('attendance.services.marking', level='WARNING'):
+            self.assertEqual(mark_tardiness(self.empleado, 'ENTRADA', self.at(self.monday, 11)), (False, 0))
+
+    def test_only_roster_changes_regenerate(self):
+        with mock.patch('attendance.signals.regenerate_roster') as regenerate:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.empleado.telefono = '0988888888'
+                self.empleado.save()
+            regenerate.assert_not_called()
+
+            other = WorkShift.objects.create(
+                empresa=self.empresa, name='Tarde', start_time=time(14, 0), end_time=time(22, 0), days=[0],
+            )
+            with self.captureOnCommitCallbacks(execute=True):
+                self.empleado.current_shift = other
+                self.empleado.save()
+            regenerate.assert_called_once_with(employee_ids=[self.empleado.pk])
+
+
+class WriteBehindFlushTests(TestCase):
+    """Volcado de PendingAttendanceMark: lotes con SKIP LOCKED y jornadas en la misma transacción."""
+
+    def setUp(self):
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        shift = WorkShift.objects.create(
+            empresa=empresa, name='Diurno', start_time=time(0), end_time=time(23, 59), days=list(range(7))
+        )
+        self.empleado = Empleado.objects.create(
+            empresa=empresa, nombres='Ana', apellidos='Paz', documento='D1', current_shift=shift,
+            sucursal=Sucursal.objects.create(empresa=empresa, nombre='Matriz'),
+            cargo=Cargo.objects.create(empresa=empresa, nombre='Analista'),
+            email='ana@acme.test', telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+        self.marks = [write_behind.enqueue_mark(self.empleado, kind) for kind in ('CHECK_IN', 'CHECK_OUT')]
+
+    def test_locked_rows_are_left_to_their_worker(self):
+        locked, free = self.marks
+        # SQLite no bloquea filas: el SELECT ... SKIP LOCKED devuelve lo que otro worker no tomó
+        skip_locked = PendingAttendanceMark.objects.exclude(pk=locked.pk)
+        with mock.patch.object(PendingAttendanceMark.objects, 'select_for_update', return_value=skip_locked) as lock:
+            self.assertEqual(write_behind.flush_pending(), 1)
+        lock.assert_called_once_with(skip_locked=True)
+        self.assertEqual(list(AttendanceRecord.objects.values_list('type', flat=True)), [free.type])
+        self.assertEqual(list(PendingAttendanceMark.objects.values_list('pk', flat=True)), [locked.pk])
+
+        self.assertEqual(write_behind.flush_pending(), 1)
+        self.assertFalse(PendingAttendanceMark.objects.exists())
+        jornada = JornadaCalculada.objects.get(empleado=self.empleado)
+        self.assertEqual(jornada.fecha, timezone.localdate(locked.timestamp))
+
+    def test_failed_jornada_refresh_keeps_marks_pending(self):
+        with mock.patch('attendance.services.write_behind.refresh_jornadas', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                write_behind.flush_pending()
+        self.assertFalse(AttendanceRecord.objects.exists())
+        self.assertEqual(PendingAttendanceMark.objects.count(), 2)
+        self.assertEqual(write_behind.flush_pending(), 2)
+        self.assertTrue(JornadaCalculada.objects.filter(empleado=self.empleado).exists())
+
+
+class RecordExportTests(TestCase):
+    """Exportación en streaming (NDJSON/CSV) con los filtros y la visibilidad del listado."""
+
+    url = '/api/attendance/records/export/'
+
+    def setUp(self):
+        self.client = APIClient()
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        sucursal = Sucursal.objects.create(empresa=empresa, nombre='Matriz')
+        cargo = Cargo.objects.create(empresa=empresa, nombre='Analista')
+        self.user = Usuario.objects.create_user('ana', 'ana@acme.test', 'pw', role='EMPLOYEE')
+        self.hr = Usuario.objects.create_user('rrhh', 'rrhh@acme.test', 'pw', role='ADMIN')
+        self.ana, self.luis = [
+            Empleado.objects.create(
+                empresa=empresa, sucursal=sucursal, cargo=cargo, user=user, nombres=nombre, apellidos='Paz',
+                documento=f'D-{nombre}', email=f'{nombre.lower()}@acme.test', telefono='0999999999',
+                fecha_ingreso=date(2024, 1, 1),
+            )
+            for nombre, user in (('Ana', self.user), ('Luis', None))
+        ]
+        moment = timezone.make_aware(datetime(2026, 3, 2, 8, 30))
+        for empleado in (self.ana, self.luis):
+            AttendanceRecord.objects.create(employee=empleado, type='CHECK_IN', timestamp=moment)
+        AttendanceRecord.objects.create(employee=self.ana, type='CHECK_IN', timestamp=moment + timedelta(days=1))
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_ndjson_uses_list_filters(self):
+        self.client.force_authenticate(self.hr)
+        rows = [json.loads(line) for line in self.export(date='2026-03-02').splitlines()]
+        self.assertEqual(sorted(row['employee_name'] for row in rows), ['Ana Paz', 'Luis Paz'])
+        self.assertEqual(rows[0]['sucursal_nombre'], 'Matriz')
+        self.assertEqual(rows[0]['timestamp'], '2026-03-02T08:30:00+00:00')
+
+    def test_csv_has_header_and_only_own_rows_for_employees(self):
+        self.client.force_authenticate(self.user)
+        rows = list(csv.reader(io.StringIO(self.export(output='csv'))))
+        self.assertEqual(rows[0][:4], ['id', 'employee', 'employee_name', 'timestamp'])
+        self.assertEqual({row[2] for row in rows[1:]}, {'Ana Paz'})
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(self.client.get(self.url, {'output': 'xml'}).status_code, 400)
+
+
+class KeysetPaginationTests(TestCase):
+    """Paginación por cursor (timestamp, id) en el listado de marcaciones."""
+
+    url = '/api/attendance/records/'
+
+    def setUp(self):
+        self.client = APIClient()
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        empleado = Empleado.objects.create(
+            empresa=empresa, nombres='Ana', apellidos='Paz', documento='D1',
+            sucursal=Sucursal.objects.create(empresa=empresa, nombre='Matriz'),
+            cargo=Cargo.objects.create(empresa=empresa, nombre='Analista'),
+            email='ana@acme.test', telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+        moment = timezone.make_aware(datetime(2026, 3, 2, 8))
+        # Dos pares con el mismo timestamp: el id desempata en el borde de página
+        self.ids = [
+            AttendanceRecord.objects.create(employee=empleado, type='CHECK_IN', timestamp=moment + timedelta(hours=hours)).pk
+            for hours in (0, 1, 1, 2, 2)
+        ]
+        self.client.force_authenticate(Usuario.objects.create_user('rrhh', 'rrhh@acme.test', 'pw', role='ADMIN'))
+
+    def walk(self, **params):
+        seen, url = [], self.url
+        params = dict(params, pagination='cursor', page_size=2)
+        while url:
+            data = self.client.get(url, params).json()
+            seen += [row['id'] for row in data['results']]
+            url, params = data['next'], {}
+        return seen
+
+    def test_pages_cover_every_row_once(self):
+        expected = sorted(self.ids, key=lambda pk: (AttendanceRecord.objects.get(pk=pk).timestamp, pk))
+        self.assertEqual(self.walk(), expected[::-1])
+        self.assertEqual(self.walk(ordering='timestamp'), expected)
+
+    def test_invalid_cursor_is_404(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'no-es-base64'}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'eyJ2IjogIngifQ=='}).status_code, 404)
+
+
+class TimeWindowTests(TestCase):
+    """Rangos semiabiertos por día y franja horaria en la zona de la empresa (medianoche y DST)."""
+
+    tz = zoneinfo.ZoneInfo('America/New_York')
+
+    def setUp(self):
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.empleado = Empleado.objects.create(
+            empresa=empresa, nombres='Ana', apellidos='Paz', documento='D1',
+            sucursal=Sucursal.objects.create(empresa=empresa, nombre='Matriz'),
+            cargo=Cargo.objects.create(empresa=empresa, nombre='Analista'),
+            email='ana@acme.test', telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+
+    def mark(self, *local):
+        moment = datetime(*local, tzinfo=self.tz)
+        return AttendanceRecord.objects.create(employee=self.empleado, type='CHECK_IN', timestamp=moment).pk
+
+    def matching(self, q):
+        return set(AttendanceRecord.objects.filter(q).values_list('pk', flat=True))
+
+    def test_day_boundaries_on_dst_change(self):
+        # 2026-03-08 dura 23 horas en Nueva York (02:00 → 03:00)
+        first = self.mark(2026, 3, 8, 0, 0)
+        last = self.mark(2026, 3, 8, 23, 59, 59)
+        next_midnight = self.mark(2026, 3, 9, 0, 0)
+        before = self.mark(2026, 3, 7, 23, 59, 59)
+        self.assertEqual(self.matching(day_q('timestamp', date(2026, 3, 8), self.tz)), {first, last})
+        self.assertEqual(
+            self.matching(days_q('timestamp', date(2026, 3, 7), date(2026, 3, 8), self.tz)), {before, first, last}
+        )
+        self.assertNotIn(next_midnight, self.matching(days_q('timestamp', end=date(2026, 3, 8), tz=self.tz)))
+
+    def test_time_window_keeps_local_hours_across_dst(self):
+        inside = {self.mark(2026, 3, day, 8, 30) for day in (7, 8, 9)}
+        self.mark(2026, 3, 9, 9, 30)
+        self.mark(2026, 3, 10, 8, 30)
+        q = time_window_q('timestamp', date(2026, 3, 7), date(2026, 3, 9), time(8), time(9), self.tz)
+        self.assertEqual(self.matching(q), inside)
+
+    def test_open_ended_window_stops_at_midnight(self):
+        late = self.mark(2026, 3, 8, 23, 30)
+        self.mark(2026, 3, 9, 0, 15)
+        q = time_window_q('timestamp', date(2026, 3, 8), date(2026, 3, 8), from_time=time(22), tz=self.tz)
+        self.assertEqual(self.matching(q), {late})
+
+
+class LiveFeedStreamTests(TestCase):
+    """Stream SSE de entradas: solo RRHH, cupo por proceso y liberación al cerrar."""
+
+    url = '/api/attendance/today/stream/'
+
+    def setUp(self):
+        self.client = APIClient()
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        empleado = Empleado.objects.create(
+            empresa=empresa, nombres='Ana', apellidos='Paz', documento='D1',
+            sucursal=Sucursal.objects.create(empresa=empresa, nombre='Matriz'),
+            cargo=Cargo.objects.create(empresa=empresa, nombre='Analista'),
+            email='ana@acme.test', telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+        self.registro = RegistroAsistencia.objects.create(empleado=empleado, tipo='ENTRADA')
+        self.client.force_authenticate(Usuario.objects.create_user('rrhh', 'rrhh@acme.test', 'pw', role='ADMIN'))
+        slots = mock.patch.object(live_feed, '_stream_slots', threading.BoundedSemaphore(1))
+        slots.start()
+        self.addCleanup(slots.stop)
+
+    def test_stream_resumes_after_last_event_id(self):
+        response = self.client.get(self.url, HTTP_LAST_EVENT_ID='0')
+        self.assertEqual(response.status_code, 200)
+        events = iter(response.streaming_content)
+        self.assertTrue(next(events).startswith(b'retry:'))
+        self.assertIn(f'id: {self.registro.pk}\nevent: mark\n'.encode(), next(events))
+        response.close()
+
+    def test_slot_cap_returns_503_until_a_stream_closes(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        busy = self.client.get(self.url)
+        self.assertEqual(busy.status_code, 503)
+        self.assertEqual(busy['Retry-After'], str(live_feed.HEARTBEAT_SECONDS))
+        first.close()
+        again = self.client.get(self.url)
+        self.assertEqual(again.status_code, 200)
+        again.close()
+
+    def test_employees_cannot_stream(self):
+        self.client.force_authenticate(Usuario.objects.create_user('ana', 'ana@acme.test', 'pw', role='EMPLOYEE'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class IdempotencyKeyTests(TestCase):
+    """Cabecera Idempotency-Key en la marcación: repetición, clave en curso y cuerpo distinto."""
+
+    url = '/api/attendance/marcar/'
+
+    def setUp(self):
+        self.client = APIClient()
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.user = Usuario.objects.create_user('ana', 'ana@acme.test', 'pw', role='EMPLOYEE')
+        shift = WorkShift.objects.create(
+            empresa=empresa, name='Diurno', start_time=time(23, 59), end_time=time(23, 59), days=list(range(7))
+        )
+        self.empleado = Empleado.objects.create(
+            empresa=empresa, user=self.user, current_shift=shift, nombres='Ana', apellidos='Paz', documento='D1',
+            sucursal=Sucursal.objects.create(empresa=empresa, nombre='Matriz'),
+            cargo=Cargo.objects.create(empresa=empresa, nombre='Analista'),
+            email='ana@acme.test', telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+        self.client.force_authenticate(self.user)
+
+    def post(self, key, tipo='ENTRADA'):
+        return self.client.post(self.url, {'tipo': tipo}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.post('k1')
+        self.assertEqual(first.status_code, 201)
+        retry = self.post('k1')
+        self.assertEqual((retry.status_code, retry.json()), (201, first.json()))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(RegistroAsistencia.objects.filter(empleado=self.empleado).count(), 1)
+        # Otra clave sí llega a la vista: segunda ENTRADA del día
+        self.assertEqual(self.post('k2').status_code, 400)
+
+    def test_same_key_with_other_body_is_422(self):
+        self.assertEqual(self.post('k1').status_code, 201)
+        self.assertEqual(self.post('k1', tipo='SALIDA').status_code, 422)
+        self.assertFalse(RegistroAsistencia.objects.filter(tipo='SALIDA').exists())
+
+    def test_key_in_progress_is_409_until_it_expires(self):
+        now = timezone.now()
+        row = IdempotencyKey.objects.create(
+            usuario=self.user, path=self.url, key='k1', fingerprint='', created_at=now,
+            expires_at=now + timedelta(seconds=60),
+        )
+        self.assertEqual(self.post('k1').status_code, 409)
+        # Reserva de un worker caído: vencida, la toma la siguiente petición
+        IdempotencyKey.objects.filter(pk=row.pk).update(expires_at=now - timedelta(seconds=1))
+        self.assertEqual(self.post('k1').status_code, 201)
+
+    def test_validation_errors_are_replayed(self):
+        # SALIDA sin ENTRADA previa
+        first = self.post('k1', tipo='SALIDA')
+        self.assertEqual(first.status_code, 400)
+        retry = self.post('k1', tipo='SALIDA')
+        self.assertEqual((retry.status_code, retry['Idempotent-Replayed']), (400, 'true'))
+
+
+class AbsenceDetectionTests(TestCase):
+    """Faltas: días del roster sin marcaciones (en cualquier tabla) ni permiso aprobado."""
+
+    def setUp(self):
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.empleado = Empleado.objects.create(
+            empresa=empresa, nombres='Ana', apellidos='Paz', documento='D1',
+            sucursal=Sucursal.objects.create(empresa=empresa, nombre='Matriz'),
+            cargo=Cargo.objects.create(empresa=empresa, nombre='Analista'),
+            email='ana@acme.test', telefono='0999999999', fecha_ingreso=date(2026, 3, 3),
+        )
+        self.days = [date(2026, 3, day) for day in range(2, 10)]
+        for day in self.days:
+            start = timezone.make_aware(datetime.combine(day, time(8)))
+            TurnoProgramado.objects.create(
+                empleado=self.empleado, fecha=day, inicio_esperado=start, fin_esperado=start + timedelta(hours=8),
+            )
+
+    def at(self, day, hour=8):
+        return timezone.make_aware(datetime.combine(day, time(hour)))
+
+    def test_only_uncovered_days_are_absences(self):
+        ingreso, marked, pending, on_leave, requested, on_absence, absent, unreviewed = self.days
+        AttendanceRecord.objects.create(employee=self.empleado, type='CHECK_IN', timestamp=self.at(marked))
+        # Aún sin volcar: no hay jornada, la verificación contra las marcaciones la descarta
+        PendingAttendanceMark.objects.create(employee=self.empleado, type='CHECK_IN', timestamp=self.at(pending))
+        LeaveRequest.objects.create(
+            empleado=self.empleado, start_date=on_leave, end_date=on_leave, days=Decimal('1'), status='APPROVED',
+        )
+        LeaveRequest.objects.create(
+            empleado=self.empleado, start_date=requested, end_date=requested, days=Decimal('1'),
+        )
+        SolicitudAusencia.objects.create(
+            empleado=self.empleado, tipo_ausencia=TipoAusencia.objects.create(nombre='Médica'),
+            fecha_inicio=on_absence, fecha_fin=on_absence, motivo='Cita', estado='aprobado',
+        )
+        SolicitudAusencia.objects.create(
+            empleado=self.empleado, tipo_ausencia=TipoAusencia.objects.create(nombre='Personal'),
+            fecha_inicio=unreviewed, fecha_fin=unreviewed, motivo='Trámite',
+        )
+
+        # Bloques de 3 días: el resultado no depende del corte
+        self.assertEqual(detect_absences(self.days[0], self.days[-1], chunk_days=3), 3)
+        faltas = Falta.objects.filter(empleado=self.empleado).order_by('fecha')
+        # Antes del ingreso no cuenta
+        self.assertEqual([falta.fecha for falta in faltas], [requested, absent, unreviewed])
+        self.assertEqual(faltas[0].minutos_esperados, 8 * 60)
 
-# Create your tests here.
+        # Reejecutar reescribe el rango: una marca tardía elimina la falta
+        AttendanceRecord.objects.create(employee=self.empleado, type='CHECK_IN', timestamp=self.at(absent, 11))
+        self.assertEqual(detect_absences(self.days[0], self.days[-1]), 2)
+        self.assertFalse(Falta.objects.filter(fecha=absent).exists())
@@ -22,8 +22,10 @@ drf_routers.format_suffix_patterns = _safe_format_suffix
 from .views import (
     MarcarAsistenciaView,
     AsistenciaHoyView,
+    AsistenciaHoyStreamView,
     ExportarAsistenciaExcelView,
     AttendanceRecordMarkView,
+    AttendanceRecordBatchMarkView,
     AttendanceRecordHistoryView,
     AttendanceTodayStatusView,
     AttendanceRecordViewSet,
@@ -34,6 +36,7 @@ from .views import (
     ReglaAsistenciaViewSet,
     EventoAsistenciaViewSet,
     JornadaCalculadaViewSet,
+    FaltaViewSet,
 )
 
 app_name = 'attendance'
@@ -47,6 +50,7 @@ router.register(r'geocercas', GeocercaViewSet, basename='api-geocercas')
 router.register(r'reglas', ReglaAsistenciaViewSet, basename='api-reglas-asistencia')
 router.register(r'eventos', EventoAsistenciaViewSet, basename='api-eventos-asistencia')
 router.register(r'jornadas', JornadaCalculadaViewSet, basename='api-jornadas-calculadas')
+router.register(r'faltas', FaltaViewSet, basename='api-faltas')
 router.register(r'records', AttendanceRecordViewSet, basename='api-attendance-records')
 
 # ========================================================
@@ -56,12 +60,14 @@ router.register(r'records', AttendanceRecordViewSet, basename='api-attendance-re
 urlpatterns = [
     # Nueva API de marcación georreferenciada
     path('mark/', AttendanceRecordMarkView.as_view(), name='attendance-mark'),
+    path('mark/batch/', AttendanceRecordBatchMarkView.as_view(), name='attendance-mark-batch'),
     path('history/', AttendanceRecordHistoryView.as_view(), name='attendance-history'),
     path('today-status/', AttendanceTodayStatusView.as_view(), name='attendance-today-status'),
 
     # Endpoints de marcación
     path('marcar/', MarcarAsistenciaView.as_view(), name='marcar-asistencia'),
     path('today/', AsistenciaHoyView.as_view(), name='asistencia-hoy'),
+    path('today/stream/', AsistenciaHoyStreamView.as_view(), name='asistencia-hoy-stream'),
     path('exportar-excel/', ExportarAsistenciaExcelView.as_view(), name='exportar-asistencia-excel'),
     
     # Router DRF (ViewSet de Registros)
@@ -74,7 +80,10 @@ urlpatterns = [
 # 
 # MARCACIÓN:
 #   - POST   /api/attendance/marcar/         → Marcar entrada/salida
-#   - GET    /api/attendance/today/          → Registros de hoy con coords
+#   - POST   /api/attendance/mark/           → Marcación georreferenciada (202 + provisional_id con ATTENDANCE_WRITE_BEHIND)
+#   - POST   /api/attendance/mark/batch/     → Lote de marcaciones (kioscos/offline)
+#   - GET    /api/attendance/today/          → Registros de hoy con coords (?since=<id> incremental)
+#   - GET    /api/attendance/today/stream/   → Stream SSE de nuevas entradas
 #   - GET    /api/attendance/exportar-excel/ → Descargar pre-nómina Excel
 # 
 # REGISTROS (CRUD):     /api/attendance/registros/
@@ -83,4 +92,5 @@ urlpatterns = [
 # REGLAS:               /api/attendance/reglas/
 # EVENTOS:              /api/attendance/eventos/
 # JORNADAS:             /api/attendance/jornadas/
+# FALTAS:               /api/attendance/faltas/   (precalculadas: comando detect_absences)
 # ========================================================
\ No newline at end of file
@@ -4,20 +4,21 @@
 # Sin render(), LoginRequiredMixin - SOLO JSON
 # ========================================================
 
-from math import radians, cos, sin, asin, sqrt
+import json
+import tempfile
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, viewsets, filters
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-from django.http import HttpResponse
-from django.db.models import Sum
-from datetime import time, datetime
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
+from django.utils.dateparse import parse_datetime
+from django.http import FileResponse, StreamingHttpResponse
 
 from .models import (
     RegistroAsistencia,
@@ -28,6 +29,7 @@ from .models import (
     JornadaCalculada,
     WorkShift,
     AttendanceRecord,
+    Falta,
 )
 from .serializers import (
     RegistroAsistenciaSerializer,
@@ -38,29 +40,41 @@ from .serializers import (
     EventoAsistenciaSerializer,
     JornadaCalculadaSerializer,
     AttendanceRecordSerializer,
+    AttendanceMarkSerializer,
+    FaltaSerializer,
+    PendingAttendanceMarkSerializer,
 )
-from employees.models import Empleado
-
-
-def _resolve_employee(user):
-    if not user:
-        return None
-    if getattr(user, "role", None) == "ADMIN":
-        return None
-    if user.email:
-        emp = Empleado.objects.filter(email=user.email).first()
-        if emp:
-            return emp
-    return Empleado.objects.filter(email=user.username).first()
+from .services.batch_marks import AttendanceBatchIngestor, MAX_MARKS_PER_BATCH, is_late_check_in
+from .services.geofence import MAX_POINTS_PER_VALIDATION, get_geofence_index, validate_points
+from .services.live_feed import HEARTBEAT_SECONDS, open_stream, publish_mark, today_entries
+from .services.marking import MISSING_CHECK_IN, register_mark
+from .services import write_behind
+from .services.today_status import get_today_status, state_etag
+from .services.record_export import iter_csv, iter_ndjson
+from .services.prenomina import month_bounds, prenomina_filename, write_prenomina_xlsx
+from core.dates import days_q, parse_day, parse_time, time_window_q
+from core.idempotency import idempotent
+from core.pagination import KeysetPaginationMixin
+from core.permissions import IsHRUser, is_hr_user
+from employees.services.hierarchy import team_q
+from employees.services.resolver import resolve_employee
+from reports.serializers import ReportJobSerializer
+from reports.services.jobs import submit_job
 
 
 class AttendanceRecordMarkView(APIView):
-    """Marca asistencia georreferenciada."""
+    """
+    Marca asistencia georreferenciada.
+
+    Con settings.ATTENDANCE_WRITE_BEHIND la marcación se valida, se encola y se
+    responde 202 con un `provisional_id`; el comando flush_attendance_marks la persiste.
+    """
 
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request, *args, **kwargs):
-        employee = _resolve_employee(request.user)
+        employee = resolve_employee(request.user)
         if not employee:
             return Response({'detail': 'Empleado no encontrado para el usuario'}, status=status.HTTP_403_FORBIDDEN)
 
@@ -70,11 +84,19 @@ class AttendanceRecordMarkView(APIView):
         lng = data.get('longitude')
         user_agent = request.META.get('HTTP_USER_AGENT', '')[:255]
 
-        now = timezone.localtime()
-        is_late = False
-        if mark_type == 'CHECK_IN' and getattr(employee, 'current_shift', None) and employee.current_shift.start_time:
-            shift_start = employee.current_shift.start_time
-            is_late = now.time() > shift_start
+        if write_behind.is_enabled():
+            serializer = AttendanceMarkSerializer(data=data)
+            serializer.is_valid(raise_exception=True)
+            mark = write_behind.enqueue_mark(
+                employee,
+                serializer.validated_data['type'],
+                serializer.validated_data.get('latitude'),
+                serializer.validated_data.get('longitude'),
+                user_agent,
+            )
+            return Response({'record': PendingAttendanceMarkSerializer(mark).data}, status=status.HTTP_202_ACCEPTED)
+
+        is_late = is_late_check_in(employee, mark_type, timezone.now())
 
         record = AttendanceRecord.objects.create(
             employee=employee,
@@ -89,11 +111,70 @@ class AttendanceRecordMarkView(APIView):
         return Response({'record': serializer.data}, status=status.HTTP_201_CREATED)
 
 
+class AttendanceRecordBatchMarkView(APIView):
+    """
+    Ingesta masiva de marcaciones desde kioscos y clientes offline.
+
+    POST /api/attendance/mark/batch/
+    Body: lista de marcaciones o {"marks": [...]}. Cada marcación puede indicar
+    `employee` (id) o `documento`; sin ellos se usa el empleado del usuario.
+    Solo RRHH/Admin puede marcar a otros empleados, y solo de su empresa (salvo
+    superusuarios). Reenviar un lote es seguro: las filas ya guardadas vuelven
+    con su id y `duplicate: true`.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        items = request.data.get('marks') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({'detail': 'Se requiere una lista de marcaciones.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MAX_MARKS_PER_BATCH:
+            return Response(
+                {'detail': f'Máximo {MAX_MARKS_PER_BATCH} marcaciones por lote.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        is_hr = is_hr_user(request.user)
+        own_employee = resolve_employee(request.user)
+        if not is_hr and not own_employee:
+            return Response({'detail': 'Empleado no encontrado para el usuario'}, status=status.HTTP_403_FORBIDDEN)
+
+        empresa_id = None
+        if is_hr and not request.user.is_superuser:
+            # La empresa de RRHH es la de su ficha de empleado (los ADMIN también la tienen)
+            hr_employee = own_employee or resolve_employee(request.user, include_admin=True)
+            if not hr_employee:
+                return Response({'detail': 'Usuario sin empresa asignada.'}, status=status.HTTP_403_FORBIDDEN)
+            empresa_id = hr_employee.empresa_id
+
+        ingestor = AttendanceBatchIngestor(
+            own_employee=own_employee,
+            restrict_to_own=not is_hr,
+            device_info=request.META.get('HTTP_USER_AGENT', '')[:255],
+            empresa_id=empresa_id,
+        )
+        result = ingestor.ingest(items)
+
+        if not result.accepted:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif result.rejected:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response({
+            'accepted_count': len(result.accepted),
+            'rejected_count': len(result.rejected),
+            'accepted': result.accepted,
+            'rejected': result.rejected,
+        }, status=response_status)
+
+
 class AttendanceRecordHistoryView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        employee = _resolve_employee(request.user)
+        employee = resolve_employee(request.user)
         if not employee:
             return Response([], status=status.HTTP_200_OK)
 
@@ -109,29 +190,39 @@ class AttendanceRecordHistoryView(APIView):
 
 
 class AttendanceTodayStatusView(APIView):
+    """
+    Estado de marcación del día del empleado autenticado.
+
+    Se lee de la caché por empleado-día (services.today_status), que las marcaciones
+    actualizan al confirmarse, y responde con ETag; un poll con If-None-Match sin
+    cambios recibe 304 sin cuerpo.
+    """
+
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        employee = _resolve_employee(request.user)
+        employee = resolve_employee(request.user)
         if not employee:
             return Response({'has_checked_in': False, 'has_checked_out': False, 'server_time': timezone.now()}, status=status.HTTP_200_OK)
 
-        today = timezone.localtime().date()
-        qs = AttendanceRecord.objects.filter(employee=employee, timestamp__date=today).order_by('-timestamp')
-        has_checked_in = qs.filter(type='CHECK_IN').exists()
-        has_checked_out = qs.filter(type='CHECK_OUT').exists()
-        last = qs.first()
+        state = get_today_status(employee.pk)
+        etag = state_etag(state)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
         payload = {
-            'has_checked_in': has_checked_in,
-            'has_checked_out': has_checked_out,
-            'last_type': last.type if last else None,
-            'last_timestamp': last.timestamp if last else None,
+            'has_checked_in': state['has_checked_in'],
+            'has_checked_out': state['has_checked_out'],
+            'last_type': state['last_type'],
+            'last_timestamp': parse_datetime(state['last_timestamp']) if state['last_timestamp'] else None,
             'server_time': timezone.now(),
         }
-        return Response(payload)
+        return Response(payload, headers=headers)
 
 
-class AttendanceRecordViewSet(viewsets.ModelViewSet):
+class AttendanceRecordViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     """Listado de registros de asistencia (nueva tabla) con visibilidad HR/Admin."""
 
     queryset = AttendanceRecord.objects.select_related('employee', 'employee__sucursal', 'employee__cargo').all()
@@ -140,6 +231,7 @@ class AttendanceRecordViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
     ordering_fields = ['timestamp']
     ordering = ['-timestamp']
+    cursor_field = 'timestamp'
     search_fields = [
         'employee__nombres',
         'employee__apellidos',
@@ -149,8 +241,7 @@ class AttendanceRecordViewSet(viewsets.ModelViewSet):
     ]
 
     def _is_hr(self, user):
-        role = getattr(user, 'role', None)
-        return user.is_superuser or getattr(user, 'is_staff', False) or role in ['ADMIN', 'ADMIN_RRHH', 'HR', 'SUPERADMIN']
+        return is_hr_user(user)
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -162,115 +253,77 @@ class AttendanceRecordViewSet(viewsets.ModelViewSet):
         end_time = self.request.query_params.get('end_time')
         employee_id = self.request.query_params.get('employee')
         sucursal_id = self.request.query_params.get('sucursal')
+        team_of = self.request.query_params.get('team_of')
 
         if not self._is_hr(user):
-            employee = _resolve_employee(user)
+            employee = resolve_employee(user)
             if not employee:
                 return qs.none()
-            qs = qs.filter(employee=employee)
+            # Un jefe puede ver las marcas de su equipo con ?team_of=<su id>
+            if team_of == str(employee.pk):
+                qs = qs.filter(team_q('employee_id', employee.pk, include_self=True))
+            else:
+                qs = qs.filter(employee=employee)
+        elif team_of and team_of.isdigit():
+            qs = qs.filter(team_q('employee_id', int(team_of), include_self=True))
 
         if employee_id:
             qs = qs.filter(employee_id=employee_id)
         if sucursal_id:
             qs = qs.filter(employee__sucursal_id=sucursal_id)
 
-        if date_param:
-            qs = qs.filter(timestamp__date=date_param)
-        else:
-            if start_date:
-                qs = qs.filter(timestamp__date__gte=start_date)
-            if end_date:
-                qs = qs.filter(timestamp__date__lte=end_date)
-
-        if start_time:
-            try:
-                parsed = datetime.strptime(start_time, "%H:%M").time()
-                qs = qs.filter(timestamp__time__gte=parsed)
-            except ValueError:
-                pass
-        if end_time:
-            try:
-                parsed = datetime.strptime(end_time, "%H:%M").time()
-                qs = qs.filter(timestamp__time__lte=parsed)
-            except ValueError:
-                pass
+        day = parse_day(date_param)
+        start = day or parse_day(start_date)
+        end = day or parse_day(end_date)
+        qs = qs.filter(time_window_q('timestamp', start, end, parse_time(start_time), parse_time(end_time)))
         return qs
 
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Exporta en streaming con los mismos filtros del listado, sin paginar.
+        ?output=ndjson (por defecto) o ?output=csv.
+        """
+        output = request.query_params.get('output', 'ndjson')
+        if output not in ('ndjson', 'csv'):
+            return Response({'detail': "output debe ser 'ndjson' o 'csv'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        qs = self.filter_queryset(self.get_queryset())
+        stamp = timezone.localtime().strftime('%Y%m%d_%H%M')
+        if output == 'csv':
+            response = StreamingHttpResponse(iter_csv(qs), content_type='text/csv; charset=utf-8')
+        else:
+            response = StreamingHttpResponse(iter_ndjson(qs), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="asistencia_{stamp}.{output}"'
+        return response
+
 
 class MarcarAsistenciaView(APIView):
     """Marcar check-in/out asociado al usuario autenticado (rol empleado)."""
 
     permission_classes = [IsAuthenticated]
 
-    def _get_empleado(self, user):
-        if not user:
-            return None
-        if getattr(user, "role", None) == "ADMIN":
-            # Admin no marca asistencia
-            return None
-        if user.email:
-            emp = Empleado.objects.filter(email=user.email).first()
-            if emp:
-                return emp
-        return Empleado.objects.filter(email=user.username).first()
-
+    @idempotent
     def post(self, request, *args, **kwargs):
         try:
             data = request.data
             tipo = data.get('tipo', 'ENTRADA')
             latitud = data.get('latitud')
             longitud = data.get('longitud')
-            empleado = self._get_empleado(request.user)
+            empleado = resolve_employee(request.user)
             if not empleado:
                 return Response({'success': False, 'message': 'No se encontró empleado asociado al usuario.'}, status=status.HTTP_403_FORBIDDEN)
 
-            # Verificar si ya marcó entrada/salida hoy
-            hoy = timezone.now().date()
-            registros_hoy = RegistroAsistencia.objects.filter(
-                empleado=empleado,
-                fecha_hora__date=hoy
-            )
-
-            if tipo == 'ENTRADA':
-                if registros_hoy.filter(tipo='ENTRADA').exists():
-                    return Response({
-                        'success': False,
-                        'message': 'Ya has marcado entrada hoy.'
-                    }, status=status.HTTP_400_BAD_REQUEST)
-            elif tipo == 'SALIDA':
-                if not registros_hoy.filter(tipo='ENTRADA').exists():
-                    return Response({
-                        'success': False,
-                        'message': 'Debes marcar entrada antes de marcar salida.'
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                if registros_hoy.filter(tipo='SALIDA').exists():
-                    return Response({
-                        'success': False,
-                        'message': 'Ya has marcado salida hoy.'
-                    }, status=status.HTTP_400_BAD_REQUEST)
-
-            # Calcular si es tardanza (para entrada)
-            es_tardanza = False
-            minutos_atraso = 0
-            if tipo == 'ENTRADA':
-                hora_limite = time(9, 0)  # 9:00 AM
-                hora_actual = timezone.now().time()
-                if hora_actual > hora_limite:
-                    es_tardanza = True
-                    tiempo_limite = datetime.combine(timezone.now().date(), hora_limite)
-                    tiempo_actual = datetime.combine(timezone.now().date(), hora_actual)
-                    diferencia = tiempo_actual - tiempo_limite
-                    minutos_atraso = int(diferencia.total_seconds() / 60)
-
-            # Crear registro
-            registro = RegistroAsistencia.objects.create(
-                empleado=empleado,
-                tipo=tipo,
-                latitud=latitud,
-                longitud=longitud,
-                es_tardanza=es_tardanza,
-                minutos_atraso=minutos_atraso
-            )
+            registro, error = register_mark(empleado, tipo, latitud, longitud)
+            if error:
+                if error == MISSING_CHECK_IN:
+                    message = 'Debes marcar entrada antes de marcar salida.'
+                elif tipo == 'SALIDA':
+                    message = 'Ya has marcado salida hoy.'
+                else:
+                    message = 'Ya has marcado entrada hoy.'
+                return Response({'success': False, 'message': message}, status=status.HTTP_400_BAD_REQUEST)
+            publish_mark(registro)
 
             return Response({
                 'success': True,
@@ -298,34 +351,64 @@ class AsistenciaHoyView(APIView):
     
     GET /api/attendance/today/
     Retorna lista de registros con coordenadas para mapa.
+    Con ?since=<id> (o fecha ISO) retorna solo las entradas nuevas:
+    {"results": [...], "cursor": <último id>}.
     """
     permission_classes = [AllowAny]
 
     def get(self, request, *args, **kwargs):
-        hoy = timezone.now().date()
-        registros = RegistroAsistencia.objects.filter(
-            fecha_hora__date=hoy,
-            tipo='ENTRADA'
-        ).select_related('empleado')
-
-        data = []
-        for reg in registros:
-            estado = 'A tiempo' if not reg.es_tardanza else 'Tarde'
-            
-            data.append({
-                'id': reg.id,
-                'empleado_nombre': reg.empleado.nombre_completo,
-                'estado': estado,
-                'lat': float(reg.latitud) if reg.latitud else None,
-                'lng': float(reg.longitud) if reg.longitud else None,
-                'fecha_hora': reg.fecha_hora.isoformat(),
-                'minutos_atraso': reg.minutos_atraso
-            })
-
-        return Response(data)
-
-
-class RegistroAsistenciaViewSet(viewsets.ModelViewSet):
+        since = request.query_params.get('since')
+        if since is None:
+            # Formato original: lista completa del día, más recientes primero
+            return Response(list(reversed(today_entries())))
+
+        since_id = int(since) if since.isdigit() else None
+        since_time = None if since_id is not None else parse_datetime(since)
+        if since_id is None and since_time is None:
+            return Response({'detail': 'since debe ser un id o una fecha ISO.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        entries = today_entries(since_id=since_id, since_time=since_time)
+        cursor = entries[-1]['id'] if entries else since_id
+        return Response({'results': entries, 'cursor': cursor})
+
+
+class EventStreamRenderer(BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data)
+
+
+class AsistenciaHoyStreamView(APIView):
+    """
+    Stream SSE de entradas del día (GET /api/attendance/today/stream/?since=<id>).
+
+    Cada entrada llega como `event: mark` con `id:` igual al id del registro; al
+    reconectar, EventSource envía Last-Event-ID y el stream continúa desde ahí.
+    Solo RRHH; con todos los cupos de streams del proceso ocupados responde 503.
+    """
+    permission_classes = [IsAuthenticated, IsHRUser]
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+
+    def get(self, request, *args, **kwargs):
+        since = request.headers.get('Last-Event-ID') or request.query_params.get('since')
+        since_id = int(since) if since and since.isdigit() else None
+        stream = open_stream(since_id)
+        if stream is None:
+            return Response(
+                {'detail': 'Demasiados streams abiertos; reintente en unos segundos.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(HEARTBEAT_SECONDS)},
+            )
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class RegistroAsistenciaViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     """Registros de asistencia con RBAC: admin ve todo, empleado ve sus marcas."""
 
     queryset = RegistroAsistencia.objects.select_related('empleado').all().order_by('-fecha_hora')
@@ -335,18 +418,10 @@ class RegistroAsistenciaViewSet(viewsets.ModelViewSet):
     filterset_fields = ['empleado', 'tipo', 'es_tardanza']
     ordering_fields = ['fecha_hora']
     ordering = ['-fecha_hora']
+    cursor_field = 'fecha_hora'
 
     def _get_empleado(self):
-        user = self.request.user
-        if not user:
-            return None
-        if getattr(user, "role", None) == "ADMIN":
-            return None
-        if user.email:
-            emp = Empleado.objects.filter(email=user.email).first()
-            if emp:
-                return emp
-        return Empleado.objects.filter(email=user.username).first()
+        return resolve_employee(self.request.user)
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -358,12 +433,12 @@ class RegistroAsistenciaViewSet(viewsets.ModelViewSet):
             fecha_fin = self.request.query_params.get('fecha_fin')
             empleado_id = self.request.query_params.get('empleado')
             tipo = self.request.query_params.get('tipo')
-            if fecha_inicio:
-                qs = qs.filter(fecha_hora__date__gte=fecha_inicio)
-            if fecha_fin:
-                qs = qs.filter(fecha_hora__date__lte=fecha_fin)
+            equipo_de = self.request.query_params.get('equipo_de')
+            qs = qs.filter(days_q('fecha_hora', parse_day(fecha_inicio), parse_day(fecha_fin)))
             if empleado_id:
                 qs = qs.filter(empleado_id=empleado_id)
+            if equipo_de and equipo_de.isdigit():
+                qs = qs.filter(team_q('empleado_id', int(equipo_de), include_self=True))
             if tipo:
                 qs = qs.filter(tipo=tipo)
             return qs
@@ -371,13 +446,19 @@ class RegistroAsistenciaViewSet(viewsets.ModelViewSet):
         empleado = self._get_empleado()
         if not empleado:
             return qs.none()
+        if self.request.query_params.get('equipo_de') == str(empleado.pk):
+            return qs.filter(team_q('empleado_id', empleado.pk, include_self=True))
         return qs.filter(empleado=empleado)
 
     def perform_create(self, serializer):
         empleado = self._get_empleado()
         if not empleado:
             raise PermissionError("No se encontró empleado asociado al usuario")
-        serializer.save(empleado=empleado)
+        try:
+            with transaction.atomic():
+                serializer.save(empleado=empleado)
+        except IntegrityError:
+            raise ValidationError({'tipo': 'Ya existe una marca de este tipo para el día.'})
 
 
 class WorkShiftViewSet(viewsets.ModelViewSet):
@@ -405,6 +486,28 @@ class GeocercaViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['empresa', 'tipo', 'activo']
 
+    @action(detail=False, methods=['post'], url_path='validar', permission_classes=[IsAuthenticated])
+    def validar(self, request):
+        """
+        Valida un lote de puntos contra las geocercas de una empresa.
+        Body: {"empresa": id, "points": [{"lat": .., "lng": ..}, ...]}
+        """
+        empresa_id = request.data.get('empresa')
+        points = request.data.get('points')
+        if not empresa_id or not isinstance(points, list):
+            return Response({'detail': 'Se requieren empresa y una lista de points.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(points) > MAX_POINTS_PER_VALIDATION:
+            return Response(
+                {'detail': f'Máximo {MAX_POINTS_PER_VALIDATION} puntos por lote.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            parsed = [(float(point['lat']), float(point['lng'])) for point in points]
+            empresa_id = int(empresa_id)
+        except (KeyError, TypeError, ValueError):
+            return Response({'detail': 'Cada punto debe tener lat y lng numéricos.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': validate_points(empresa_id, parsed)})
+
 
 class ReglaAsistenciaViewSet(viewsets.ModelViewSet):
     queryset = ReglaAsistencia.objects.select_related('empresa', 'geocerca').all()
@@ -414,50 +517,7 @@ class ReglaAsistenciaViewSet(viewsets.ModelViewSet):
     filterset_fields = ['empresa']
 
 
-def _haversine_distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Distancia Haversine en metros."""
-    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-    c = 2 * asin(sqrt(a))
-    r = 6371000
-    return c * r
-
-
-def _point_in_polygon(point_lat: float, point_lng: float, polygon: list) -> bool:
-    num = len(polygon)
-    j = num - 1
-    inside = False
-    for i in range(num):
-        lat_i, lng_i = polygon[i]['lat'], polygon[i]['lng']
-        lat_j, lng_j = polygon[j]['lat'], polygon[j]['lng']
-        intersect = ((lng_i > point_lng) != (lng_j > point_lng)) and (
-            point_lat < (lat_j - lat_i) * (point_lng - lng_i) / (lng_j - lng_i + 1e-9) + lat_i
-        )
-        if intersect:
-            inside = not inside
-        j = i
-    return inside
-
-
-def _esta_dentro_geocerca(geocerca: Geocerca, lat: float, lng: float) -> bool:
-    if not geocerca.activo or not geocerca.coordenadas:
-        return False
-    if geocerca.tipo == 'circulo':
-        center = geocerca.coordenadas.get('center', {})
-        radius = geocerca.coordenadas.get('radius_m', 0)
-        if not center or not radius:
-            return False
-        distancia = _haversine_distance_m(lat, lng, center.get('lat'), center.get('lng'))
-        return distancia <= radius
-    if geocerca.tipo == 'poligono':
-        puntos = geocerca.coordenadas if isinstance(geocerca.coordenadas, list) else []
-        return _point_in_polygon(lat, lng, puntos)
-    return False
-
-
-class EventoAsistenciaViewSet(viewsets.ModelViewSet):
+class EventoAsistenciaViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = EventoAsistencia.objects.select_related('empleado').all()
     serializer_class = EventoAsistenciaSerializer
     permission_classes = [AllowAny]
@@ -465,6 +525,7 @@ class EventoAsistenciaViewSet(viewsets.ModelViewSet):
     filterset_fields = ['empleado', 'tipo', 'fuente', 'dentro_geocerca']
     ordering_fields = ['registrado_el']
     ordering = ['-registrado_el']
+    cursor_field = 'registrado_el'
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -473,13 +534,14 @@ class EventoAsistenciaViewSet(viewsets.ModelViewSet):
         lat = serializer.validated_data.get('gps_lat')
         lng = serializer.validated_data.get('gps_lng')
 
-        regla = ReglaAsistencia.objects.filter(empresa=empleado.empresa).select_related('geocerca').first()
+        # Índice compilado de la empresa: considera todas las geocercas de sus reglas
+        geofences = get_geofence_index(empleado.empresa_id)
         dentro_geocerca = False
 
-        if regla and regla.geocerca:
+        if geofences.enforced_ids:
             if lat is None or lng is None:
                 return Response({'detail': 'Coordenadas requeridas para validar geocerca.'}, status=status.HTTP_400_BAD_REQUEST)
-            dentro_geocerca = _esta_dentro_geocerca(regla.geocerca, float(lat), float(lng))
+            dentro_geocerca = geofences.is_allowed(float(lat), float(lng))
             if not dentro_geocerca:
                 return Response({'detail': 'Marcación fuera de la geocerca permitida.'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -496,120 +558,75 @@ class JornadaCalculadaViewSet(viewsets.ModelViewSet):
     filterset_fields = ['empleado', 'fecha', 'estado']
 
 
+class FaltaViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Faltas precalculadas por el comando detect_absences (?empleado=, ?start=&end=).
+    RRHH ve todas; el resto solo las propias.
+    """
+
+    queryset = Falta.objects.select_related('empleado').all()
+    serializer_class = FaltaSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['empleado', 'fecha']
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        start = parse_day(self.request.query_params.get('start'))
+        end = parse_day(self.request.query_params.get('end'))
+        if start:
+            qs = qs.filter(fecha__gte=start)
+        if end:
+            qs = qs.filter(fecha__lte=end)
+        if is_hr_user(self.request.user):
+            return qs
+        empleado = resolve_employee(self.request.user)
+        return qs.filter(empleado=empleado) if empleado else qs.none()
+
+
 class ExportarAsistenciaExcelView(APIView):
     """
     API para exportar pre-nómina en Excel.
     
-    GET /api/attendance/exportar-excel/
-    Retorna archivo Excel con datos de asistencia del mes actual.
+    GET /api/attendance/exportar-excel/?month=&year=
+    Retorna archivo Excel con datos de asistencia del mes (por defecto el actual).
+    El archivo se genera en disco con openpyxl write-only y se envía por bloques.
+    Con ?async=1 (requiere autenticación) encola un ReportJob y responde 202
+    (ver /api/reports/jobs/).
     """
     permission_classes = [AllowAny]
 
-    def get(self, request, *args, **kwargs):
-        # Crear workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Pre-Nómina"
-
-        # Estilos
-        header_font = Font(bold=True, size=12, color="FFFFFF")
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        header_alignment = Alignment(horizontal='center', vertical='center')
-
-        # Encabezados
-        headers = [
-            'Nombre Empleado', 
-            'Días Trabajados', 
-            'Horas Extra (Calculadas)', 
-            'Minutos de Atraso',
-            'Estado'
-        ]
-        
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-
-        # Obtener datos del mes actual
-        hoy = timezone.now()
-        inicio_mes = hoy.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Calcular fin de mes
-        if hoy.month == 12:
-            fin_mes = hoy.replace(year=hoy.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        else:
-            fin_mes = hoy.replace(month=hoy.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
-
-        # Obtener empleados activos
-        empleados = Empleado.objects.filter(estado='activo')
-
-        row_num = 2
-        for empleado in empleados:
-            # Calcular días trabajados
-            dias_trabajados = RegistroAsistencia.objects.filter(
-                empleado=empleado,
-                tipo='ENTRADA',
-                fecha_hora__gte=inicio_mes,
-                fecha_hora__lt=fin_mes
-            ).count()
-
-            # Calcular horas extra (simplificado)
-            horas_extra = 0
-            registros_mes = RegistroAsistencia.objects.filter(
-                empleado=empleado,
-                fecha_hora__gte=inicio_mes,
-                fecha_hora__lt=fin_mes
-            ).order_by('fecha_hora')
-
-            entrada_actual = None
-            for registro in registros_mes:
-                if registro.tipo == 'ENTRADA':
-                    entrada_actual = registro.fecha_hora
-                elif registro.tipo == 'SALIDA' and entrada_actual and entrada_actual.date() == registro.fecha_hora.date():
-                    horas_trabajadas = (registro.fecha_hora - entrada_actual).total_seconds() / 3600
-                    if horas_trabajadas > 8:
-                        horas_extra += horas_trabajadas - 8
-                    entrada_actual = None
-
-            # Calcular minutos de atraso
-            minutos_atraso = RegistroAsistencia.objects.filter(
-                empleado=empleado,
-                tipo='ENTRADA',
-                es_tardanza=True,
-                fecha_hora__gte=inicio_mes,
-                fecha_hora__lt=fin_mes
-            ).aggregate(total=Sum('minutos_atraso'))['total'] or 0
-
-            # Estado
-            if minutos_atraso == 0:
-                estado = 'Excelente'
-            elif minutos_atraso < 30:
-                estado = 'Bueno'
-            else:
-                estado = 'Requiere Atención'
+    def _is_async(self):
+        return self.request.query_params.get('async') in ('1', 'true')
 
-            # Escribir fila
-            ws.cell(row=row_num, column=1, value=str(empleado))
-            ws.cell(row=row_num, column=2, value=dias_trabajados)
-            ws.cell(row=row_num, column=3, value=round(horas_extra, 2))
-            ws.cell(row=row_num, column=4, value=minutos_atraso)
-            ws.cell(row=row_num, column=5, value=estado)
+    def get_permissions(self):
+        if self._is_async():
+            return [IsAuthenticated()]
+        return super().get_permissions()
 
-            row_num += 1
+    def get(self, request, *args, **kwargs):
+        hoy = timezone.now()
+        try:
+            month = int(request.query_params.get('month', hoy.month))
+            year = int(request.query_params.get('year', hoy.year))
+            inicio_mes, fin_mes = month_bounds(year, month)
+        except ValueError:
+            return Response({'detail': 'Periodo inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if self._is_async():
+            job = submit_job('PRENOMINA_EXCEL', year, month, user=request.user)
+            return Response(
+                ReportJobSerializer(job, context={'request': request}).data,
+                status=status.HTTP_200_OK if job.status == 'DONE' else status.HTTP_202_ACCEPTED,
+            )
 
-        # Ajustar ancho de columnas
-        for col in range(1, 6):
-            column_letter = get_column_letter(col)
-            ws.column_dimensions[column_letter].width = 25
+        archivo = tempfile.TemporaryFile()
+        write_prenomina_xlsx(archivo, inicio_mes, fin_mes)
+        archivo.seek(0)
 
-        # Crear respuesta HTTP
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        return FileResponse(
+            archivo,
+            as_attachment=True,
+            filename=prenomina_filename(inicio_mes),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         )
-        response['Content-Disposition'] = f'attachment; filename=pre-nomina_{hoy.strftime("%Y-%m")}.xlsx'
-
-        # Guardar workbook en la respuesta
-        wb.save(response)
-
-        return response
@@ -0,0 +1,19 @@
+"""
+Utilidades sobre la caché de Django.
+
+Con el backend por defecto (LocMemCache) cada worker tiene su propia caché y una
+invalidación hecha en un proceso no llega a los demás; las cachés que deben ser
+coherentes entre workers solo se usan si `is_shared_cache()`.
+"""
+from django.conf import settings
+
+_PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def is_shared_cache(alias: str = 'default') -> bool:
+    """True si el backend configurado es visible para todos los procesos."""
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    return backend not in _PROCESS_LOCAL_BACKENDS
@@ -0,0 +1,123 @@
+"""
+Rangos de fechas para filtrar columnas DateTimeField sin envolverlas en DATE()/TIME().
+
+Un día se traduce a [00:00 del día, 00:00 del día siguiente) en la zona horaria de la
+empresa (la zona activa, por defecto settings.TIME_ZONE); así los filtros por día,
+mes o franja horaria se resuelven como range scans sobre los índices
+(empleado, fecha) de las tablas de marcaciones.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Tuple
+
+from django.db.models import Q
+from django.utils import timezone
+
+# Por encima de este número de días la franja horaria se filtra con __time
+# (el rango de fechas ya acota el índice) en lugar de un OR por día.
+MAX_TIME_WINDOW_DAYS = 62
+
+DateTimeRange = Tuple[datetime, datetime]
+
+
+def today(tz=None) -> date:
+    return timezone.localdate(timezone=tz)
+
+
+def day_start(day: date, tz=None) -> datetime:
+    """00:00 del día en la zona de la empresa (aware)."""
+    return timezone.make_aware(datetime.combine(day, time.min), tz or timezone.get_current_timezone())
+
+
+def day_range(day: date, tz=None) -> DateTimeRange:
+    return day_start(day, tz), day_start(day + timedelta(days=1), tz)
+
+
+def span_range(start: date, end: date, tz=None) -> DateTimeRange:
+    """Días [start, end] (ambos inclusive) como rango semiabierto."""
+    return day_start(start, tz), day_start(end + timedelta(days=1), tz)
+
+
+def month_range(year: int, month: int, tz=None) -> DateTimeRange:
+    next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return day_start(date(year, month, 1), tz), day_start(next_month, tz)
+
+
+def parse_day(value) -> Optional[date]:
+    """Fecha ISO de un query param; None si falta o es inválida."""
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)) if value else None
+    except ValueError:
+        return None
+
+
+def parse_time(value) -> Optional[time]:
+    """Hora HH:MM de un query param; None si falta o es inválida."""
+    try:
+        return datetime.strptime(value, "%H:%M").time() if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def tardiness(start: time, moment: Optional[datetime] = None) -> Tuple[bool, int]:
+    """(tarde, minutos de atraso) de `moment` (ahora por defecto) frente a la hora `start` local."""
+    local = timezone.localtime(moment)
+    if local.time() <= start:
+        return False, 0
+    delta = datetime.combine(local.date(), local.time()) - datetime.combine(local.date(), start)
+    return True, int(delta.total_seconds() // 60)
+
+
+def range_q(field: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Q:
+    """`field` en [start, end); cualquiera de los extremos puede omitirse."""
+    q = Q()
+    if start is not None:
+        q &= Q(**{f"{field}__gte": start})
+    if end is not None:
+        q &= Q(**{f"{field}__lt": end})
+    return q
+
+
+def day_q(field: str, day: date, tz=None) -> Q:
+    return range_q(field, *day_range(day, tz))
+
+
+def days_q(field: str, start: Optional[date] = None, end: Optional[date] = None, tz=None) -> Q:
+    """Días [start, end] inclusive; sin extremos devuelve Q() (sin filtro)."""
+    return range_q(
+        field,
+        day_start(start, tz) if start else None,
+        day_start(end + timedelta(days=1), tz) if end else None,
+    )
+
+
+def time_window_q(field: str, start: Optional[date] = None, end: Optional[date] = None,
+                  from_time: Optional[time] = None, to_time: Optional[time] = None, tz=None) -> Q:
+    """
+    Días [start, end] y, opcionalmente, franja horaria [from_time, to_time] de cada día.
+
+    Con ambos extremos y un periodo corto la franja se arma como OR de rangos por día;
+    si falta un extremo o el periodo es largo se usa __time sobre el rango de días.
+    """
+    if from_time is None and to_time is None:
+        return days_q(field, start, end, tz)
+    if start is None or end is None or not 0 <= (end - start).days < MAX_TIME_WINDOW_DAYS:
+        q = days_q(field, start, end, tz)
+        if from_time is not None:
+            q &= Q(**{f"{field}__time__gte": from_time})
+        if to_time is not None:
+            q &= Q(**{f"{field}__time__lte": to_time})
+        return q
+
+    tz = tz or timezone.get_current_timezone()
+    q = Q()
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        window = Q(**{f"{field}__gte": timezone.make_aware(datetime.combine(day, from_time or time.min), tz)})
+        if to_time is not None:
+            window &= Q(**{f"{field}__lte": timezone.make_aware(datetime.combine(day, to_time), tz)})
+        else:
+            window &= Q(**{f"{field}__lt": day_start(day + timedelta(days=1), tz)})
+        q |= window
+    return q
@@ -0,0 +1,125 @@
+"""
+Soporte de la cabecera `Idempotency-Key` para endpoints POST que crean registros
+(marcaciones, solicitudes de permiso).
+
+La primera petición con una clave reserva una fila en IdempotencyKey (la
+restricción única (usuario, path, key) decide quién llega primero, en todos los
+workers) y, al terminar, guarda (status, cuerpo) por `TTL_SECONDS`. Los reintentos
+con la misma clave, usuario y ruta devuelven la respuesta guardada sin volver a
+validar ni tocar las tablas de dominio. Se guardan también los errores de
+validación; si la vista responde 5xx o lanza otra excepción se libera la clave.
+Las peticiones anónimas no usan la cabecera: se procesan siempre.
+
+Las filas vencidas cuentan como ausentes y se reutilizan; el comando
+`purge_idempotency_keys` las borra.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.models import IdempotencyKey
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+TTL_SECONDS = 24 * 60 * 60
+# Reserva mientras la primera petición se procesa (si el worker muere, otra la retoma)
+IN_PROGRESS_TTL_SECONDS = 60
+
+
+def _fingerprint(request) -> str:
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = sorted(data.lists())
+    encoded = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def _reserve(request, key: str, fingerprint: str):
+    """(fila reservada, None) si esta petición debe ejecutarse; (None, fila existente) si no."""
+    now = timezone.now()
+    lookup = {'usuario': request.user, 'path': request.path[:255], 'key': key}
+    reserved = {
+        'fingerprint': fingerprint, 'status_code': None, 'response': None,
+        'created_at': now, 'expires_at': now + timedelta(seconds=IN_PROGRESS_TTL_SECONDS),
+    }
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(**lookup, **reserved), None
+    except IntegrityError:
+        pass
+
+    existing = IdempotencyKey.objects.filter(**lookup).first()
+    if existing is None or existing.expires_at > now:
+        return None, existing
+    # Vencida (respuesta caducada o reserva de un worker caído): la toma quien
+    # logre el UPDATE condicionado a la expiración leída
+    taken = IdempotencyKey.objects.filter(pk=existing.pk, expires_at=existing.expires_at).update(**reserved)
+    if taken:
+        existing.__dict__.update(reserved)
+        return existing, None
+    return None, IdempotencyKey.objects.filter(pk=existing.pk).first()
+
+
+def idempotent(view_method):
+    """Decorador para `post`/`create`/acciones POST de APIView y ViewSet."""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'detail': f'Idempotency-Key admite como máximo {MAX_KEY_LENGTH} caracteres.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = _fingerprint(request)
+        row, existing = _reserve(request, key, fingerprint)
+        if row is None:
+            return _replay(existing, fingerprint)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except ValidationError as exc:
+            # El error de validación también es la respuesta de esta clave
+            response = self.handle_exception(exc)
+        except Exception:
+            row.delete()
+            raise
+        if response.status_code >= 500 or not hasattr(response, 'data'):
+            row.delete()
+        else:
+            IdempotencyKey.objects.filter(pk=row.pk).update(
+                status_code=response.status_code,
+                response=json.loads(json.dumps(response.data, cls=JSONEncoder)),
+                expires_at=timezone.now() + timedelta(seconds=TTL_SECONDS),
+            )
+        return response
+
+    return wrapper
+
+
+def _replay(stored, fingerprint: str) -> Response:
+    if stored is None or stored.status_code is None:
+        # Liberada entre el INSERT y la lectura, o la primera petición aún no termina
+        return Response(
+            {'detail': 'Una petición con esta Idempotency-Key está en curso; reintente en unos segundos.'},
+            status=status.HTTP_409_CONFLICT,
+        )
+    if stored.fingerprint != fingerprint:
+        return Response(
+            {'detail': 'La Idempotency-Key ya se usó con un cuerpo distinto.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(stored.response, status=stored.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
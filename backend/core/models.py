@@ -112,3 +112,29 @@ class Usuario(AbstractUser):
     def can_manage_users(self):
         """Verifica si el usuario puede gestionar otros usuarios."""
         return self.role == "SUPERADMIN"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Respuesta guardada para una cabecera Idempotency-Key (ver core/idempotency.py).
+    `status_code` nulo indica que la primera petición aún se está procesando.
+    """
+
+    usuario = models.ForeignKey("core.Usuario", on_delete=models.CASCADE, related_name="+")
+    path = models.CharField(max_length=255)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=40)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Clave de idempotencia"
+        verbose_name_plural = "Claves de idempotencia"
+        constraints = [
+            models.UniqueConstraint(fields=["usuario", "path", "key"], name="idempotency_key_unica"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.usuario_id} {self.path} {self.key}"
@@ -0,0 +1,123 @@
+"""
+Paginación por cursor (keyset) para listados ordenados por fecha.
+
+Los viewsets que usan `KeysetPaginationMixin` mantienen PageNumberPagination por
+defecto y cambian a cursor con `?pagination=cursor` (o al recibir `?cursor=`).
+El cursor guarda (fecha, id) del último elemento, así cada página es un rango
+sobre el índice compuesto y no necesita OFFSET ni COUNT(*).
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor sobre (campo de fecha, id); descendente salvo `?ordering=<campo>`."""
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 500
+    invalid_cursor_message = 'Cursor inválido'
+
+    def __init__(self, field: str):
+        self.field = field
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, value, pk) -> str:
+        raw = json.dumps({'v': value.isoformat(), 'id': pk})
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            value = parse_datetime(data['v'])
+            pk = int(data['id'])
+        except (ValueError, TypeError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        self.descending = request.query_params.get('ordering') != self.field
+        prefix, op = ('-', 'lt') if self.descending else ('', 'gt')
+
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}pk')
+        position = self.decode_cursor(request)
+        if position:
+            value, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{op}': value}) | Q(**{self.field: value, f'pk__{op}': pk})
+            )
+
+        results = list(queryset[:size + 1])
+        self.next_position = None
+        if len(results) > size:
+            results = results[:size]
+            last = results[-1]
+            self.next_position = (getattr(last, self.field), last.pk)
+        return results
+
+    def get_next_link(self):
+        if not self.next_position:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(*self.next_position))
+
+    def get_first_link(self):
+        url = remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return replace_query_param(url, 'pagination', 'cursor')
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('first', self.get_first_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class KeysetPaginationMixin:
+    """Permite elegir paginación por cursor en un viewset (`cursor_field` = campo de fecha)."""
+
+    cursor_field = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            request = getattr(self, 'request', None)
+            params = request.query_params if request is not None else {}
+            if self.cursor_field and (params.get('pagination') == 'cursor' or 'cursor' in params):
+                self._paginator = KeysetPagination(self.cursor_field)
+            else:
+                return super().paginator
+        return self._paginator
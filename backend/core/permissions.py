@@ -1,6 +1,23 @@
 from rest_framework.permissions import BasePermission
 
 
+def is_hr_user(user) -> bool:
+    """RRHH/Admin (incluye staff y superusuario): visibilidad sobre todos los empleados."""
+    role = getattr(user, "role", None)
+    return bool(
+        user
+        and user.is_authenticated
+        and (user.is_superuser or getattr(user, "is_staff", False) or role in ["ADMIN", "ADMIN_RRHH", "HR", "SUPERADMIN"])
+    )
+
+
+class IsHRUser(BasePermission):
+    """Permite solo a RRHH/Admin (ver `is_hr_user`)."""
+
+    def has_permission(self, request, view):
+        return is_hr_user(request.user)
+
+
 class IsAdminUser(BasePermission):
     """Permite solo a usuarios con rol ADMIN."""
 
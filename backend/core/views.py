@@ -3,6 +3,7 @@ from django.utils import timezone
 from datetime import date
 from employees.models import Empleado, Sucursal
 from attendance.models import RegistroAsistencia
+from attendance.services.absences import find_absences
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -17,6 +18,7 @@ from .serializers import (
     UsuarioUpdateSerializer,
     PasswordResetSerializer,
 )
+from .dates import day_q, today
 from .permissions import IsSuperAdminOrReadOnly, IsSuperAdmin
 
 def home(request):
@@ -25,12 +27,14 @@ def home(request):
     total_sucursales = Sucursal.objects.count()
 
     # Asistencia de hoy
-    hoy = timezone.now().date()
-    registros_hoy = RegistroAsistencia.objects.filter(fecha_hora__date=hoy)
+    registros_hoy = RegistroAsistencia.objects.filter(day_q('fecha_hora', today()))
 
     asistencia_hoy = registros_hoy.filter(tipo='ENTRADA').count()
     atrasos_hoy = registros_hoy.filter(tipo='ENTRADA', es_tardanza=True).count()
-    faltas_hoy = total_empleados - asistencia_hoy
+    # Programados hoy cuya hora de entrada ya pasó, sin marcaciones ni permiso aprobado
+    hoy = today()
+    ahora = timezone.now()
+    faltas_hoy = sum(1 for _, _, inicio, _ in find_absences(hoy, hoy) if inicio <= ahora)
 
     # Solicitudes pendientes (por ahora simulado)
     solicitudes_pendientes = 0  # TODO: implementar cuando haya sistema de solicitudes
@@ -1,14 +1,12 @@
-from collections import defaultdict
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
-from django.db.models import Count, Q, Avg
 from django.utils import timezone
 from datetime import timedelta
 from .models import (
-    Empleado, Sucursal, Contrato, SolicitudAusencia,
+    Empleado, Sucursal,
     Cargo, Contract, LeaveRequest, OnboardingTask,
 )
 from .serializers import (
@@ -20,18 +18,21 @@ from .serializers import (
     ContractSerializer,
     LeaveRequestSerializer,
     OnboardingTaskSerializer,
-    OrganigramSerializer
 )
+from .services.counts import active_employee_count, active_subordinates_count
+from .services.dashboard import get_dashboard
+from .services.employment import with_employment_context
+from .services.organigram import build_flat, build_tree, get_index
 
 
 class SucursalViewSet(viewsets.ModelViewSet):
-    queryset = Sucursal.objects.all()
+    queryset = Sucursal.objects.annotate(active_employee_count=active_employee_count())
     serializer_class = SucursalSerializer
     permission_classes = [IsAuthenticated]
 
 
 class CargoViewSet(viewsets.ModelViewSet):
-    queryset = Cargo.objects.all()
+    queryset = Cargo.objects.annotate(active_employee_count=active_employee_count())
     serializer_class = CargoSerializer
     permission_classes = [IsAuthenticated]
 
@@ -49,6 +50,10 @@ class EmpleadoViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         queryset = Empleado.objects.select_related('cargo', 'sucursal', 'reports_to')
+        if self.action == 'retrieve':
+            queryset = queryset.annotate(active_subordinates_count=active_subordinates_count())
+        if self.action != 'list':
+            queryset = with_employment_context(queryset)
         
         # Filtros opcionales
         estado = self.request.query_params.get('estado', None)
@@ -210,138 +215,12 @@ class OnboardingTaskViewSet(viewsets.ModelViewSet):
 def kpi_dashboard(request):
     """
     Endpoint especial para KPIs del dashboard
-    Retorna métricas agregadas del sistema
+    Retorna métricas agregadas del sistema (snapshot en caché, ver services.dashboard);
+    `?empresa=<id>` limita las métricas a una empresa
     """
     try:
-        # 1. Headcount por puesto
-        headcount_by_department = list(
-            Empleado.objects
-            .filter(estado='activo')
-            .values('cargo__nombre')
-            .annotate(count=Count('id'))
-            .order_by('-count')
-        )
-
-        headcount_data = [
-            {
-                'department': item['cargo__nombre'] or 'Sin cargo',
-                'count': item['count']
-            }
-            for item in headcount_by_department
-        ]
-        
-        # 2. Headcount por sucursal
-        headcount_by_branch = list(
-            Empleado.objects
-            .filter(estado='activo')
-            .values('sucursal__nombre')
-            .annotate(count=Count('id'))
-            .order_by('-count')
-        )
-        
-        branch_data = [
-            {
-                'branch': item['sucursal__nombre'],
-                'count': item['count']
-            }
-            for item in headcount_by_branch
-        ]
-        
-        # 3. Total de empleados activos
-        total_employees = Empleado.objects.filter(estado='activo').count()
-        
-        # 4. Retention rate (simplificado)
-        # Empleados con más de 1 año / Total empleados
-        one_year_ago = timezone.now().date() - timedelta(days=365)
-        long_term_employees = Empleado.objects.filter(
-            estado='activo',
-            fecha_ingreso__lte=one_year_ago
-        ).count()
-        
-        retention_rate = (long_term_employees / total_employees * 100) if total_employees > 0 else 0
-        
-        # 5. Solicitudes pendientes
-        pending_leaves_count = SolicitudAusencia.objects.filter(estado='pendiente').count()
-        
-        # 6. Onboarding progress (empleados del mes actual)
-        current_month_start = timezone.now().date().replace(day=1)
-        new_employees = Empleado.objects.filter(
-            fecha_ingreso__gte=current_month_start,
-            estado='activo'
-        )
-        
-        total_tasks = OnboardingTask.objects.filter(
-            employee__in=new_employees
-        ).count()
-        
-        completed_tasks = OnboardingTask.objects.filter(
-            employee__in=new_employees,
-            is_completed=True
-        ).count()
-        
-        onboarding_progress = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
-        
-        # 7. Nuevos empleados este mes
-        new_hires_this_month = new_employees.count()
-        
-        # 8. Contratos por vencer (próximos 30 días)
-        today = timezone.now().date()
-        expiry_date = today + timedelta(days=30)
-        expiring_contracts = Contrato.objects.filter(
-            estado='activo',
-            fecha_fin__isnull=False,
-            fecha_fin__lte=expiry_date,
-            fecha_fin__gte=today
-        ).count()
-        
-        # 9. Cumpleaños del mes
-        current_month = timezone.now().month
-        birthdays_this_month = Empleado.objects.filter(
-            estado='activo',
-            fecha_nacimiento__month=current_month
-        ).values('id', 'nombres', 'apellidos', 'fecha_nacimiento', 'foto_url').order_by('fecha_nacimiento__day')
-        
-        # Formatear cumpleaños
-        birthday_list = [
-            {
-                'id': emp['id'],
-                'name': f"{emp['nombres']} {emp['apellidos']}",
-                'date': emp['fecha_nacimiento'],
-                'photo': emp['foto_url']
-            }
-            for emp in birthdays_this_month
-        ]
-        
-        # 10. Distribución por estado
-        employees_by_status = list(
-            Empleado.objects
-            .values('estado')
-            .annotate(count=Count('id'))
-        )
-        
-        status_data = [
-            {
-                'status': item['estado'],
-                'count': item['count']
-            }
-            for item in employees_by_status
-        ]
-        
-        # Construir respuesta
-        data = {
-            'total_employees': total_employees,
-            'retention_rate': round(retention_rate, 2),
-            'pending_leaves_count': pending_leaves_count,
-            'onboarding_progress': round(onboarding_progress, 2),
-            'new_hires_this_month': new_hires_this_month,
-            'expiring_contracts': expiring_contracts,
-            'headcount_by_department': headcount_data,
-            'headcount_by_branch': branch_data,
-            'birthdays_this_month': birthday_list,
-            'employees_by_status': status_data,
-        }
-        
-        return Response(data)
+        empresa_id = request.query_params.get('empresa')
+        return Response(get_dashboard(int(empresa_id) if empresa_id and empresa_id.isdigit() else None))
     
     except Exception as e:
         return Response(
@@ -350,42 +229,46 @@ def kpi_dashboard(request):
         )
 
 
-def _build_children_map(employees_queryset):
-    """Optimiza la serialización recursiva agrupando hijos por manager_id."""
-    children_map = defaultdict(list)
-    roots = []
-
-    for emp in employees_queryset:
-        if emp.manager_id:
-            children_map[emp.manager_id].append(emp)
-        else:
-            roots.append(emp)
-
-    return roots, children_map
-
-
 class OrganigramView(APIView):
+    """
+    Organigrama de empleados activos (índice en caché, ver services.organigram).
+
+    Query params:
+    - empresa: limita a una empresa
+    - root: id del empleado desde el que se arma un subárbol (expansión lazy)
+    - depth: niveles bajo la raíz (por defecto 1 con `root`, sin límite sin él)
+    - layout: `tree` (anidado, por defecto) o `flat` (lista de adyacencia)
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        params = request.query_params
         try:
-            employees = (
-                Empleado.objects.filter(estado='activo')
-                .select_related('cargo', 'manager', 'sucursal')
-                .order_by('apellidos', 'nombres')
-            )
-
-            roots, children_map = _build_children_map(employees)
-            serializer = OrganigramSerializer(
-                roots,
-                many=True,
-                context={'request': request, 'children_map': children_map},
-            )
+            empresa_id = int(params['empresa']) if params.get('empresa') else None
+            root = int(params['root']) if params.get('root') else None
+            depth = int(params['depth']) if params.get('depth') else (1 if root else None)
+        except ValueError:
+            return Response({'error': 'empresa, root y depth deben ser enteros'}, status=status.HTTP_400_BAD_REQUEST)
+        layout = params.get('layout', 'tree')
+        if layout not in ('tree', 'flat'):
+            return Response({'error': 'layout debe ser tree o flat'}, status=status.HTTP_400_BAD_REQUEST)
 
-            return Response({
-                'organization': serializer.data,
-                'total_employees': employees.count(),
-            })
+        try:
+            index = get_index(empresa_id)
+            if root is not None and root not in index['nodes']:
+                return Response({'error': 'Empleado no encontrado en el organigrama'}, status=status.HTTP_404_NOT_FOUND)
+            roots = [root] if root is not None else index['roots']
+            photo_url = request.build_absolute_uri
+            data = {'total_employees': index['total']}
+            if layout == 'flat':
+                data['employees'] = build_flat(index, roots, depth, photo_url)
+            else:
+                data['organization'] = build_tree(
+                    index, roots, depth, photo_url, with_counts=root is not None or depth is not None
+                )
+            if root is not None:
+                data.update({'root': root, 'depth': depth})
+            return Response(data)
 
         except Exception as e:
             return Response(
@@ -398,4 +281,4 @@ class OrganigramView(APIView):
 def organigram(request):
     """Compatibilidad legado para el organigrama."""
     view = OrganigramView.as_view()
-    return view(request)
+    return view(request._request)
@@ -0,0 +1,39 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import Empresa
+from employees.services.vacations import DEFAULT_MONTHLY_ACCRUAL, post_monthly_accrual
+
+
+class Command(BaseCommand):
+    help = "Registra la acumulación mensual de vacaciones de los empleados activos (idempotente por mes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--empresa", type=int, action="append", dest="empresas",
+                            help="Empresa a procesar (se puede repetir); por defecto todas")
+        parser.add_argument("--year", type=int, help="Año; por defecto el actual")
+        parser.add_argument("--month", type=int, help="Mes 1-12; por defecto el actual")
+        parser.add_argument("--dias", default=str(DEFAULT_MONTHLY_ACCRUAL), help="Días a acumular por empleado")
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        year = options["year"] or hoy.year
+        month = options["month"] or hoy.month
+        if not 1 <= month <= 12:
+            raise CommandError("--month debe estar entre 1 y 12.")
+        try:
+            dias = Decimal(options["dias"])
+        except InvalidOperation:
+            raise CommandError(f"--dias inválido: {options['dias']}")
+        if dias <= 0:
+            raise CommandError("--dias debe ser mayor a 0.")
+
+        empresa_ids = options["empresas"] or list(Empresa.objects.values_list("id", flat=True))
+        total = 0
+        for empresa_id in empresa_ids:
+            posted = post_monthly_accrual(empresa_id, year, month, dias)
+            self.stdout.write(f"Empresa {empresa_id}: {posted} empleados")
+            total += posted
+        self.stdout.write(self.style.SUCCESS(f"Acumulación {month:02d}/{year}: {total} movimientos"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from employees.services.hierarchy import rebuild_hierarchy
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice jerárquico (EmpleadoJerarquia) desde Empleado.manager"
+
+    def handle(self, *args, **options):
+        total = rebuild_hierarchy()
+        self.stdout.write(self.style.SUCCESS(f"Relaciones jerárquicas: {total}"))
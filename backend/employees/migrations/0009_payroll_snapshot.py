@@ -0,0 +1,68 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:19
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_empresa_email_contacto_empresa_logo_and_more'),
+        ('employees', '0008_alter_contract_options_remove_contract_document_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última actualización')),
+                ('period_key', models.CharField(max_length=40, unique=True)),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('inputs_hash', models.CharField(blank=True, default='', max_length=64)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payroll_snapshots', to='core.empresa')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de nómina',
+                'verbose_name_plural': 'Snapshots de nómina',
+            },
+        ),
+        migrations.CreateModel(
+            name='PayrollSnapshotLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sort_key', models.CharField(blank=True, default='', max_length=220)),
+                ('has_attendance', models.BooleanField(default=False)),
+                ('inputs_hash', models.CharField(max_length=64)),
+                ('result', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('issues', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('dirty', models.BooleanField(default=False)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_snapshot_lines', to='employees.empleado')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='employees.payrollsnapshot')),
+            ],
+            options={
+                'verbose_name': 'Línea de snapshot de nómina',
+                'verbose_name_plural': 'Líneas de snapshot de nómina',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='payrollsnapshot',
+            index=models.Index(fields=['year', 'month'], name='employees_p_year_7d1f0a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payrollsnapshotline',
+            index=models.Index(fields=['snapshot', 'sort_key'], name='employees_p_snapsho_91a030_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payrollsnapshotline',
+            index=models.Index(fields=['employee', 'dirty'], name='employees_p_employe_b5edfe_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='payrollsnapshotline',
+            unique_together={('snapshot', 'employee')},
+        ),
+    ]
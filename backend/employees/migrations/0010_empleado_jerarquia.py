@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:38
+
+from collections import deque
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_closure(apps, schema_editor):
+    # Copia de services.hierarchy.closure_rows (las migraciones no importan servicios)
+    Empleado = apps.get_model('employees', 'Empleado')
+    EmpleadoJerarquia = apps.get_model('employees', 'EmpleadoJerarquia')
+    managers = dict(Empleado.objects.values_list('id', 'manager_id'))
+    children = {}
+    for employee_id, manager_id in managers.items():
+        if manager_id in managers:
+            children.setdefault(manager_id, []).append(employee_id)
+    queue = deque((employee_id, ()) for employee_id, manager_id in managers.items() if manager_id not in managers)
+    rows = []
+    while queue:
+        employee_id, chain = queue.popleft()
+        rows.append(EmpleadoJerarquia(ancestor_id=employee_id, descendant_id=employee_id, depth=0))
+        rows.extend(
+            EmpleadoJerarquia(ancestor_id=ancestor_id, descendant_id=employee_id, depth=len(chain) - i)
+            for i, ancestor_id in enumerate(chain)
+        )
+        queue.extend((child_id, chain + (employee_id,)) for child_id in children.get(employee_id, []))
+    EmpleadoJerarquia.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0009_payroll_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmpleadoJerarquia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jerarquia_descendientes', to='employees.empleado')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jerarquia_ancestros', to='employees.empleado')),
+            ],
+            options={
+                'verbose_name': 'Relación jerárquica',
+                'verbose_name_plural': 'Jerarquía de empleados',
+                'indexes': [models.Index(fields=['ancestor', 'depth'], name='employees_e_ancesto_067d71_idx'), models.Index(fields=['descendant', 'depth'], name='employees_e_descend_b0aa38_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def opening_balances(apps, schema_editor):
+    # Un ajuste de apertura por saldo existente para que el libro cuadre con dias_disponibles
+    SaldoVacaciones = apps.get_model('employees', 'SaldoVacaciones')
+    MovimientoVacaciones = apps.get_model('employees', 'MovimientoVacaciones')
+    MovimientoVacaciones.objects.bulk_create(
+        [
+            MovimientoVacaciones(
+                empleado_id=saldo.empleado_id,
+                periodo=saldo.periodo,
+                tipo='AJUSTE',
+                dias=saldo.dias_disponibles,
+                referencia=f'apertura:{saldo.periodo}',
+                descripcion='Saldo inicial',
+            )
+            for saldo in SaldoVacaciones.objects.exclude(dias_disponibles=0).iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0010_empleado_jerarquia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoVacaciones',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.PositiveIntegerField(help_text='Año del periodo, ej. 2025')),
+                ('tipo', models.CharField(choices=[('ACUMULACION', 'Acumulación'), ('DEBITO', 'Débito'), ('AJUSTE', 'Ajuste')], max_length=15)),
+                ('dias', models.DecimalField(decimal_places=2, help_text='Positivo acredita, negativo debita', max_digits=6)),
+                ('referencia', models.CharField(blank=True, max_length=60, null=True)),
+                ('descripcion', models.CharField(blank=True, default='', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_vacaciones', to=settings.AUTH_USER_MODEL)),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_vacaciones', to='employees.empleado')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de vacaciones',
+                'verbose_name_plural': 'Movimientos de vacaciones',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['empleado', 'periodo'], name='employees_m_emplead_ec14b8_idx'), models.Index(fields=['referencia'], name='employees_m_referen_f735b4_idx')],
+                'unique_together': {('empleado', 'referencia')},
+            },
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:46
+
+import django.db.models.expressions
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0011_movimiento_vacaciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empleado',
+            name='cumpleanos',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.datetime.ExtractMonth('fecha_nacimiento'), '*', models.Value(100)), '+', django.db.models.functions.datetime.ExtractDay('fecha_nacimiento')), output_field=models.PositiveSmallIntegerField(null=True)),
+        ),
+        migrations.AddIndex(
+            model_name='empleado',
+            index=models.Index(fields=['empresa', 'estado', 'cumpleanos'], name='employees_e_empresa_177767_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import RegexValidator
+from django.db.models.functions import ExtractDay, ExtractMonth
 from core.models import TimeStampedModel, Empresa
 
 
@@ -89,6 +91,12 @@ class Empleado(TimeStampedModel):
     telefono = models.CharField(max_length=20, validators=[RegexValidator(regex=r'^\+?[\d\s\-\(\)]{7,}$', message='Teléfono inválido')])
     direccion = models.CharField(max_length=255, blank=True, null=True)
     fecha_nacimiento = models.DateField(null=True, blank=True)
+    # Mes y día de nacimiento como MMDD, calculado por la base de datos: indexable por rango
+    cumpleanos = models.GeneratedField(
+        expression=ExtractMonth('fecha_nacimiento') * 100 + ExtractDay('fecha_nacimiento'),
+        output_field=models.PositiveSmallIntegerField(null=True),
+        db_persist=True,
+    )
     fecha_ingreso = models.DateField()
     sucursal = models.ForeignKey(Sucursal, on_delete=models.PROTECT, related_name='empleados')
     cargo = models.ForeignKey(Cargo, on_delete=models.PROTECT, related_name='empleados', null=True, blank=True)
@@ -105,6 +113,7 @@ class Empleado(TimeStampedModel):
             models.Index(fields=['empresa', 'documento']),
             models.Index(fields=['empresa', 'email']),
             models.Index(fields=['empresa', 'estado']),
+            models.Index(fields=['empresa', 'estado', 'cumpleanos']),
         ]
 
     def __str__(self):
@@ -239,6 +248,44 @@ class SaldoVacaciones(TimeStampedModel):
         return f"{self.empleado.nombre_completo} - {self.periodo} ({self.dias_disponibles} días)"
 
 
+class MovimientoVacaciones(models.Model):
+    """
+    Libro de movimientos de vacaciones (solo inserción). `SaldoVacaciones.dias_disponibles`
+    es la suma mantenida de `dias` por (empleado, periodo); ver services.vacations.
+    """
+
+    TIPO_CHOICES = [
+        ('ACUMULACION', 'Acumulación'),
+        ('DEBITO', 'Débito'),
+        ('AJUSTE', 'Ajuste'),
+    ]
+
+    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='movimientos_vacaciones')
+    periodo = models.PositiveIntegerField(help_text="Año del periodo, ej. 2025")
+    tipo = models.CharField(max_length=15, choices=TIPO_CHOICES)
+    dias = models.DecimalField(max_digits=6, decimal_places=2, help_text="Positivo acredita, negativo debita")
+    # Idempotencia: p. ej. "acumulacion:2025-03" o "permiso:42"; NULL en ajustes manuales
+    referencia = models.CharField(max_length=60, null=True, blank=True)
+    descripcion = models.CharField(max_length=255, blank=True, default='')
+    creado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_vacaciones'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Movimiento de vacaciones"
+        verbose_name_plural = "Movimientos de vacaciones"
+        ordering = ['-created_at', '-id']
+        unique_together = ('empleado', 'referencia')
+        indexes = [
+            models.Index(fields=['empleado', 'periodo']),
+            models.Index(fields=['referencia']),
+        ]
+
+    def __str__(self):
+        return f"{self.empleado_id} {self.periodo} {self.tipo} {self.dias}"
+
+
 class KPI(TimeStampedModel):
     nombre = models.CharField(max_length=150)
     formula = models.JSONField(null=True, blank=True)
@@ -268,6 +315,74 @@ class ResultadoKPI(TimeStampedModel):
         return f"{self.empleado} - {self.kpi} ({self.periodo})"
 
 
+class PayrollSnapshot(TimeStampedModel):
+    """Pre-nómina calculada de un periodo (ver services.payroll_snapshot)."""
+
+    period_key = models.CharField(max_length=40, unique=True)
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=True, blank=True, related_name='payroll_snapshots')
+    inputs_hash = models.CharField(max_length=64, blank=True, default='')
+    computed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Snapshot de nómina"
+        verbose_name_plural = "Snapshots de nómina"
+        indexes = [models.Index(fields=['year', 'month'])]
+
+    def __str__(self):
+        return f"{self.period_key} ({self.inputs_hash[:8]})"
+
+    @staticmethod
+    def build_period_key(year: int, month: int, empresa_id=None) -> str:
+        return f"{year}-{month:02d}:{empresa_id or 'all'}"
+
+
+class PayrollSnapshotLine(models.Model):
+    """Resultado de un empleado dentro de un snapshot; `dirty` marca entradas cambiadas."""
+
+    snapshot = models.ForeignKey(PayrollSnapshot, on_delete=models.CASCADE, related_name='lines')
+    employee = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='payroll_snapshot_lines')
+    sort_key = models.CharField(max_length=220, blank=True, default='')
+    has_attendance = models.BooleanField(default=False)
+    inputs_hash = models.CharField(max_length=64)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    issues = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+    dirty = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = "Línea de snapshot de nómina"
+        verbose_name_plural = "Líneas de snapshot de nómina"
+        unique_together = ('snapshot', 'employee')
+        indexes = [
+            models.Index(fields=['snapshot', 'sort_key']),
+            models.Index(fields=['employee', 'dirty']),
+        ]
+
+    def __str__(self):
+        return f"{self.snapshot} - {self.employee_id}"
+
+
+class EmpleadoJerarquia(models.Model):
+    """Tabla de clausura de jefaturas: una fila por (jefe ancestro, empleado), incluida la propia (depth=0)."""
+
+    ancestor = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='jerarquia_descendientes')
+    descendant = models.ForeignKey(Empleado, on_delete=models.CASCADE, related_name='jerarquia_ancestros')
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        verbose_name = "Relación jerárquica"
+        verbose_name_plural = "Jerarquía de empleados"
+        unique_together = ('ancestor', 'descendant')
+        indexes = [
+            models.Index(fields=['ancestor', 'depth']),
+            models.Index(fields=['descendant', 'depth']),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} > {self.descendant_id} ({self.depth})"
+
+
 # ====== LEGACY MODELS (se mantienen para compatibilidad) ======
 
 class Contract(TimeStampedModel):
@@ -5,11 +5,13 @@ from core.models import Empresa
 from .models import (
     Empresa as _Empresa,  # alias for type hints (Empresa lives in core)
     Sucursal, Empleado, Contrato, DocumentoEmpleado,
-    TipoAusencia, SolicitudAusencia, SaldoVacaciones,
+    TipoAusencia, SolicitudAusencia, SaldoVacaciones, MovimientoVacaciones,
     KPI, ResultadoKPI,
     Cargo, Contract, LeaveRequest, OnboardingTask,
 )
 from attendance.models import Turno, WorkShift
+from .services.employment import active_contract, active_contrato, current_shift
+from .services.hierarchy import would_create_cycle
 
 
 class WorkShiftNestedSerializer(serializers.ModelSerializer):
@@ -32,6 +34,10 @@ class SucursalSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def get_employee_count(self, obj):
+        # Anotado por el viewset (services.counts); consulta solo como respaldo
+        count = getattr(obj, 'active_employee_count', None)
+        if count is not None:
+            return count
         return obj.empleados.filter(estado='activo').count()
 
 
@@ -111,10 +117,13 @@ class EmpleadoDetailSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def get_subordinates_count(self, obj):
+        count = getattr(obj, 'active_subordinates_count', None)
+        if count is not None:
+            return count
         return obj.subordinados.filter(estado='activo').count()
 
     def get_contrato_activo(self, obj):
-        contract = obj.contratos.filter(estado='activo').first()
+        contract = active_contrato(obj)
         if contract:
             return ContratoSerializer(contract).data
         return None
@@ -149,6 +158,9 @@ class EmpleadoSerializer(serializers.ModelSerializer):
         cargo = attrs.get('cargo')
         if not cargo:
             raise serializers.ValidationError("Debes seleccionar un cargo")
+        manager = attrs.get('manager')
+        if self.instance and manager and would_create_cycle(self.instance.pk, manager.pk):
+            raise serializers.ValidationError({'manager': "El jefe no puede ser el propio empleado ni alguien de su equipo"})
         return attrs
 
     def create(self, validated_data):
@@ -175,7 +187,7 @@ class EmpleadoSerializer(serializers.ModelSerializer):
         return obj.sucursal.nombre if obj.sucursal else None
 
     def get_active_contract(self, obj):
-        contract = getattr(obj, "contract", None)
+        contract = active_contract(obj)
         if contract:
             return {
                 "id": contract.id,
@@ -187,7 +199,7 @@ class EmpleadoSerializer(serializers.ModelSerializer):
                 "is_active": contract.is_active,
             }
         # Fallback: legacy contratos
-        legacy = obj.contratos.filter(estado='activo').first()
+        legacy = active_contrato(obj)
         if legacy:
             return {
                 "id": legacy.id,
@@ -246,6 +258,14 @@ class SaldoVacacionesSerializer(serializers.ModelSerializer):
     class Meta:
         model = SaldoVacaciones
         fields = '__all__'
+        # El saldo solo cambia por movimientos del libro (acción `ajustar`, aprobaciones, acumulación)
+        read_only_fields = ['dias_disponibles']
+
+
+class MovimientoVacacionesSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MovimientoVacaciones
+        fields = '__all__'
 
 
 class KPISerializer(serializers.ModelSerializer):
@@ -307,7 +327,7 @@ class EmployeePortalSerializer(serializers.ModelSerializer):
         return None
 
     def _legacy_contract(self, obj):
-        legacy = obj.contratos.filter(estado='activo').order_by('-fecha_inicio').first()
+        legacy = active_contrato(obj)
         if not legacy:
             return None
         return {
@@ -319,7 +339,7 @@ class EmployeePortalSerializer(serializers.ModelSerializer):
         }
 
     def get_contract_details(self, obj):
-        contract = getattr(obj, 'contract', None)
+        contract = active_contract(obj)
         if contract:
             return {
                 'id': contract.id,
@@ -331,7 +351,7 @@ class EmployeePortalSerializer(serializers.ModelSerializer):
         return self._legacy_contract(obj)
 
     def get_shift_details(self, obj):
-        shift = getattr(obj, 'current_shift', None)
+        shift = current_shift(obj)
         if shift:
             return {
                 'id': shift.id,
@@ -340,7 +360,7 @@ class EmployeePortalSerializer(serializers.ModelSerializer):
                 'end_time': shift.end_time,
                 'days': shift.days,
             }
-        legacy = obj.contratos.filter(estado='activo').order_by('-fecha_inicio').first()
+        legacy = active_contrato(obj)
         if legacy and legacy.contrato_turno:
             t: Turno = legacy.contrato_turno
             return {
@@ -363,6 +383,9 @@ class CargoSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def get_employee_count(self, obj):
+        count = getattr(obj, 'active_employee_count', None)
+        if count is not None:
+            return count
         return obj.empleados.filter(estado='activo').count() if hasattr(obj, 'empleados') else 0
 
 
@@ -392,46 +415,3 @@ class OnboardingTaskSerializer(serializers.ModelSerializer):
         if obj.due_date and not obj.is_completed:
             return obj.due_date < timezone.now().date()
         return False
-
-
-class OrganigramSerializer(serializers.ModelSerializer):
-    """Serializer recursivo que expone la forma requerida para react-d3-tree."""
-
-    name = serializers.SerializerMethodField(read_only=True)
-    attributes = serializers.SerializerMethodField(read_only=True)
-    children = serializers.SerializerMethodField(read_only=True)
-
-    class Meta:
-        model = Empleado
-        fields = ['id', 'name', 'attributes', 'children']
-
-    def get_name(self, obj: Empleado) -> str:
-        return obj.nombre_completo
-
-    def get_attributes(self, obj: Empleado) -> dict:
-        cargo_nombre = obj.cargo.nombre if obj.cargo else 'Sin cargo asignado'
-        departamento = None
-        if obj.cargo and hasattr(obj.cargo, 'departamento'):
-            departamento = obj.cargo.departamento
-        elif obj.sucursal:
-            departamento = obj.sucursal.nombre
-
-        foto = obj.foto_url
-        photo_url = None
-        if foto:
-            request = self.context.get('request')
-            if request and hasattr(foto, 'url'):
-                photo_url = request.build_absolute_uri(foto.url)
-            else:
-                photo_url = getattr(foto, 'url', None) or foto
-
-        return {
-            'cargo': cargo_nombre,
-            'foto': photo_url,
-            'departamento': departamento,
-        }
-
-    def get_children(self, obj: Empleado):
-        children_map = self.context.get('children_map') or {}
-        children = children_map.get(obj.id, [])
-        return OrganigramSerializer(children, many=True, context=self.context).data
@@ -0,0 +1,12 @@
+"""Conteos anotados en los querysets de los viewsets (los serializers los leen si existen)."""
+from django.db.models import Count, Q
+
+
+def active_employee_count() -> Count:
+    """Para Sucursal y Cargo: empleados activos (anotar como `active_employee_count`)."""
+    return Count('empleados', filter=Q(empleados__estado='activo'))
+
+
+def active_subordinates_count() -> Count:
+    """Para Empleado: subordinados directos activos (anotar como `active_subordinates_count`)."""
+    return Count('subordinados', filter=Q(subordinados__estado='activo'))
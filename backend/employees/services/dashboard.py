@@ -0,0 +1,139 @@
+"""
+Snapshot de métricas del dashboard de KPIs por empresa.
+
+Los contadores de empleados salen de una sola consulta de agregación condicional
+y el resultado se guarda en la caché de Django. Los cambios en empleados,
+contratos, solicitudes de ausencia u onboarding (employees/signals.py) cambian la
+versión global y el siguiente acceso recalcula.
+
+La versión vive en la misma caché: con la caché local por proceso (LocMemCache)
+solo la ve el worker que hizo el cambio, así que el snapshot se guarda con un TTL
+corto (`LOCAL_CACHE_TTL_SECONDS`) y puede llegar con ese atraso; `computed_at`
+indica su antigüedad. Con una caché compartida la invalidación es inmediata.
+"""
+import uuid
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from core.cache import is_shared_cache
+from core.dates import today
+from employees.models import Contrato, Empleado, SolicitudAusencia
+
+CACHE_TTL_SECONDS = 300
+LOCAL_CACHE_TTL_SECONDS = 30
+_CACHE_PREFIX = "employees:kpi-dashboard"
+_VERSION_KEY = f"{_CACHE_PREFIX}:version"
+
+
+def _percent(part: int, total: int) -> float:
+    return round(part / total * 100, 2) if total else 0
+
+
+def _ranked(counter: Counter, label: str):
+    return [{label: name, 'count': count} for name, count in counter.most_common()]
+
+
+def compute_dashboard(empresa_id: Optional[int] = None) -> Dict:
+    hoy = today()
+    one_year_ago = hoy - timedelta(days=365)
+    month_start = hoy.replace(day=1)
+    empleados = Empleado.objects.all()
+    if empresa_id:
+        empleados = empleados.filter(empresa_id=empresa_id)
+
+    active = Q(estado='activo')
+    new_hire = active & Q(fecha_ingreso__gte=month_start)
+    # distinct: el join con onboarding_tasks repite filas de empleados nuevos
+    status_counts = {
+        f'status_{value}': Count('id', filter=Q(estado=value), distinct=True)
+        for value, _ in Empleado.ESTADO_CHOICES
+    }
+    totals = empleados.aggregate(
+        long_term=Count('id', filter=active & Q(fecha_ingreso__lte=one_year_ago), distinct=True),
+        new_hires=Count('id', filter=new_hire, distinct=True),
+        onboarding_total=Count('onboarding_tasks', filter=new_hire),
+        onboarding_done=Count('onboarding_tasks', filter=new_hire & Q(onboarding_tasks__is_completed=True)),
+        **status_counts,
+    )
+    total_employees = totals['status_activo']
+
+    # Headcount por cargo y por sucursal en un solo GROUP BY
+    by_cargo, by_branch = Counter(), Counter()
+    for row in (
+        empleados.filter(active)
+        .order_by()
+        .values('cargo__nombre', 'sucursal__nombre')
+        .annotate(count=Count('id'))
+    ):
+        by_cargo[row['cargo__nombre'] or 'Sin cargo'] += row['count']
+        by_branch[row['sucursal__nombre']] += row['count']
+
+    pending_leaves = SolicitudAusencia.objects.filter(estado='pendiente')
+    contratos = Contrato.objects.filter(
+        estado='activo', fecha_fin__gte=hoy, fecha_fin__lte=hoy + timedelta(days=30)
+    )
+    if empresa_id:
+        pending_leaves = pending_leaves.filter(empleado__empresa_id=empresa_id)
+        contratos = contratos.filter(empleado__empresa_id=empresa_id)
+
+    # Rango sobre `cumpleanos` (MMDD): usa el índice (empresa, estado, cumpleanos)
+    birthdays = (
+        empleados.filter(active, cumpleanos__range=(hoy.month * 100 + 1, hoy.month * 100 + 31))
+        .values('id', 'nombres', 'apellidos', 'fecha_nacimiento', 'foto_url')
+        .order_by('cumpleanos')
+    )
+
+    return {
+        'total_employees': total_employees,
+        'retention_rate': _percent(totals['long_term'], total_employees),
+        'pending_leaves_count': pending_leaves.count(),
+        'onboarding_progress': _percent(totals['onboarding_done'], totals['onboarding_total']),
+        'new_hires_this_month': totals['new_hires'],
+        'expiring_contracts': contratos.count(),
+        'headcount_by_department': _ranked(by_cargo, 'department'),
+        'headcount_by_branch': _ranked(by_branch, 'branch'),
+        'birthdays_this_month': [
+            {
+                'id': emp['id'],
+                'name': f"{emp['nombres']} {emp['apellidos']}",
+                'date': emp['fecha_nacimiento'],
+                'photo': emp['foto_url'],
+            }
+            for emp in birthdays
+        ],
+        'employees_by_status': [
+            {'status': value, 'count': totals[f'status_{value}']}
+            for value, _ in Empleado.ESTADO_CHOICES
+            if totals[f'status_{value}']
+        ],
+        'computed_at': timezone.now(),
+    }
+
+
+def _version() -> str:
+    version = cache.get(_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(_VERSION_KEY, version, None):
+            version = cache.get(_VERSION_KEY)
+    return version
+
+
+def get_dashboard(empresa_id: Optional[int] = None) -> Dict:
+    """Snapshot en caché (por empresa y día); lo recalcula si expiró o fue invalidado."""
+    key = f"{_CACHE_PREFIX}:{_version()}:{empresa_id or 'all'}:{today().isoformat()}"
+    data = cache.get(key)
+    if data is None:
+        data = compute_dashboard(empresa_id)
+        cache.set(key, data, CACHE_TTL_SECONDS if is_shared_cache() else LOCAL_CACHE_TTL_SECONDS)
+    return data
+
+
+def invalidate_dashboard() -> None:
+    """Descarta los snapshots de todas las empresas (la empresa de contratos/solicitudes requeriría otra consulta)."""
+    cache.set(_VERSION_KEY, uuid.uuid4().hex, None)
@@ -0,0 +1,55 @@
+"""
+Contexto laboral de empleados (contrato nuevo, contrato legado activo y turno).
+
+Los viewsets aplican `with_employment_context` al queryset y los serializers leen
+solo de `active_contrato` / `active_contract` / `current_shift`; así una página de
+empleados resuelve contratos y turnos con un número fijo de consultas.
+"""
+from typing import Iterable, Optional
+
+from django.db.models import Prefetch, QuerySet, prefetch_related_objects
+
+from attendance.models import WorkShift
+from employees.models import Contract, Contrato, Empleado
+
+ACTIVE_CONTRATOS_ATTR = 'active_contratos'
+
+
+def _active_contratos_prefetch() -> Prefetch:
+    return Prefetch(
+        'contratos',
+        queryset=Contrato.objects.filter(estado='activo')
+        .select_related('contrato_turno')
+        .order_by('-fecha_inicio', '-id'),
+        to_attr=ACTIVE_CONTRATOS_ATTR,
+    )
+
+
+def with_employment_context(queryset: QuerySet) -> QuerySet:
+    """Une contrato nuevo y turno actual; precarga contratos legados activos con su Turno."""
+    return queryset.select_related('contract', 'current_shift').prefetch_related(_active_contratos_prefetch())
+
+
+def load_employment_context(empleados: Iterable[Empleado]) -> None:
+    """Igual que `with_employment_context` para instancias ya cargadas (p. ej. el empleado del portal)."""
+    pending = [emp for emp in empleados if not hasattr(emp, ACTIVE_CONTRATOS_ATTR)]
+    if pending:
+        prefetch_related_objects(pending, 'contract', 'current_shift', _active_contratos_prefetch())
+
+
+def active_contrato(empleado: Empleado) -> Optional[Contrato]:
+    """Contrato legado activo más reciente (con `contrato_turno` ya cargado)."""
+    load_employment_context([empleado])
+    contratos = getattr(empleado, ACTIVE_CONTRATOS_ATTR)
+    return contratos[0] if contratos else None
+
+
+def active_contract(empleado: Empleado) -> Optional[Contract]:
+    """Contrato nuevo (OneToOne) o None."""
+    load_employment_context([empleado])
+    return getattr(empleado, 'contract', None)
+
+
+def current_shift(empleado: Empleado) -> Optional[WorkShift]:
+    load_employment_context([empleado])
+    return empleado.current_shift
@@ -0,0 +1,141 @@
+"""
+Índice jerárquico de jefaturas (tabla de clausura `EmpleadoJerarquia`).
+
+Cada empleado tiene una fila por cada jefe en su cadena de mando (depth = niveles
+de distancia) más la propia (depth=0). Así "todo el equipo bajo X" y "cadena de
+mando de X" son una consulta indexada. employees/signals.py mantiene el índice
+cuando cambia `manager` (incluido `assign_manager_from_branch`); las
+actualizaciones masivas con `.update()` requieren `rebuild_hierarchy`.
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import F, Q, QuerySet
+
+from employees.models import Empleado, EmpleadoJerarquia
+
+BULK_BATCH_SIZE = 1000
+
+
+def team_ids(manager_id: int, include_self: bool = False, max_depth: Optional[int] = None) -> QuerySet:
+    """Subconsulta con los ids del equipo transitivo de `manager_id`."""
+    qs = EmpleadoJerarquia.objects.filter(ancestor_id=manager_id, depth__gte=0 if include_self else 1)
+    if max_depth is not None:
+        qs = qs.filter(depth__lte=max_depth)
+    return qs.values('descendant_id')
+
+
+def team_q(field: str, manager_id: int, include_self: bool = False) -> Q:
+    """Filtro `field IN (equipo de manager_id)` para listados (asistencia, permisos, empleados)."""
+    return Q(**{f"{field}__in": team_ids(manager_id, include_self)})
+
+
+def all_reports(manager_id: int, max_depth: Optional[int] = None) -> QuerySet:
+    """Subordinados directos e indirectos, anotados con `nivel` (1 = directo)."""
+    depth_filter = {'jerarquia_ancestros__depth__lte': max_depth} if max_depth is not None else {}
+    return (
+        Empleado.objects.filter(
+            jerarquia_ancestros__ancestor_id=manager_id, jerarquia_ancestros__depth__gte=1, **depth_filter
+        )
+        .annotate(nivel=F('jerarquia_ancestros__depth'))
+        .select_related('cargo', 'sucursal')
+    )
+
+
+def chain_of_command(employee_id: int) -> List[Empleado]:
+    """Jefes desde el directo hasta el más alto."""
+    rows = (
+        EmpleadoJerarquia.objects.filter(descendant_id=employee_id, depth__gte=1)
+        .select_related('ancestor', 'ancestor__cargo')
+        .order_by('depth')
+    )
+    return [row.ancestor for row in rows]
+
+
+def would_create_cycle(employee_id: int, manager_id: Optional[int]) -> bool:
+    """True si `manager_id` es el propio empleado o alguien de su equipo."""
+    if not manager_id or not employee_id:
+        return False
+    return manager_id == employee_id or EmpleadoJerarquia.objects.filter(
+        ancestor_id=employee_id, descendant_id=manager_id
+    ).exists()
+
+
+def _ancestors(employee_id: int) -> List[Tuple[int, int]]:
+    """(ancestro, depth) incluida la fila propia; la crea si el empleado aún no está indexado."""
+    rows = list(EmpleadoJerarquia.objects.filter(descendant_id=employee_id).values_list('ancestor_id', 'depth'))
+    if not rows:
+        EmpleadoJerarquia.objects.create(ancestor_id=employee_id, descendant_id=employee_id, depth=0)
+        rows = [(employee_id, 0)]
+    return rows
+
+
+@transaction.atomic
+def move_employee(employee_id: int, manager_id: Optional[int]) -> None:
+    """Reubica el subárbol de `employee_id` bajo `manager_id` (None = raíz)."""
+    subtree = list(EmpleadoJerarquia.objects.filter(ancestor_id=employee_id).values_list('descendant_id', 'depth'))
+    if not subtree:
+        EmpleadoJerarquia.objects.create(ancestor_id=employee_id, descendant_id=employee_id, depth=0)
+        subtree = [(employee_id, 0)]
+    subtree_ids = [descendant_id for descendant_id, _ in subtree]
+
+    # Cortar los vínculos del subárbol con sus antiguos ancestros
+    EmpleadoJerarquia.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+    if not manager_id or manager_id in subtree_ids:
+        # Sin jefe o ciclo: el subárbol queda como raíz en el índice
+        return
+    EmpleadoJerarquia.objects.bulk_create(
+        [
+            EmpleadoJerarquia(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=up + 1 + down)
+            for ancestor_id, up in _ancestors(manager_id)
+            for descendant_id, down in subtree
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+
+
+def sync_employee(employee_id: int, manager_id: Optional[int]) -> None:
+    """Mueve al empleado solo si el jefe indexado difiere de `manager_id` (o si no está indexado)."""
+    rows = dict(
+        EmpleadoJerarquia.objects.filter(descendant_id=employee_id, depth__lte=1).values_list('depth', 'ancestor_id')
+    )
+    if 0 not in rows or rows.get(1) != manager_id:
+        move_employee(employee_id, manager_id)
+
+
+def detach_reports(employee_ids: Iterable[int]) -> None:
+    """Tras borrar un jefe (SET_NULL sin señales), sus subordinados pasan a ser raíces."""
+    for employee_id in employee_ids:
+        move_employee(employee_id, None)
+
+
+def closure_rows(managers: Dict[int, Optional[int]]) -> List[Tuple[int, int, int]]:
+    """(ancestro, descendiente, depth) para el mapa empleado → jefe; ignora ciclos."""
+    children: Dict[int, List[int]] = {}
+    for employee_id, manager_id in managers.items():
+        if manager_id in managers:
+            children.setdefault(manager_id, []).append(employee_id)
+    roots = [employee_id for employee_id, manager_id in managers.items() if manager_id not in managers]
+    rows = []
+    # Recorrido en anchura desde las raíces con la cadena de ancestros de cada nodo
+    queue = deque((root, ()) for root in roots)
+    while queue:
+        employee_id, chain = queue.popleft()
+        rows.append((employee_id, employee_id, 0))
+        rows.extend((ancestor_id, employee_id, len(chain) - i) for i, ancestor_id in enumerate(chain))
+        queue.extend((child_id, chain + (employee_id,)) for child_id in children.get(employee_id, []))
+    return rows
+
+
+@transaction.atomic
+def rebuild_hierarchy() -> int:
+    """Reconstruye el índice completo desde `Empleado.manager`; devuelve el número de filas."""
+    managers = dict(Empleado.objects.values_list('id', 'manager_id'))
+    rows = closure_rows(managers)
+    EmpleadoJerarquia.objects.all().delete()
+    EmpleadoJerarquia.objects.bulk_create(
+        [EmpleadoJerarquia(ancestor_id=a, descendant_id=d, depth=depth) for a, d, depth in rows],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    return len(rows)
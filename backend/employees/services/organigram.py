@@ -0,0 +1,132 @@
+"""
+Organigrama por empresa en caché.
+
+El índice (nodos + hijos por jefe) se arma con una sola consulta `.values()` y se
+guarda en la caché de Django bajo una versión derivada de la base de datos
+(último `updated_at` y cantidad de empleados, cargos y sucursales de la empresa):
+cualquier alta, cambio o baja cambia la clave en todos los procesos, sin señales
+de invalidación, al costo de tres agregados por consulta. Las vistas
+arman el árbol completo, un subárbol limitado en profundidad o una lista plana
+de forma iterativa a partir del índice.
+"""
+from collections import deque
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+
+from employees.models import Cargo, Empleado, Sucursal
+
+CACHE_TTL_SECONDS = 3600
+_CACHE_PREFIX = "employees:organigram"
+
+
+def organigram_version(empresa_id: Optional[int] = None) -> str:
+    """Cambia con cualquier save o delete de empleados, cargos (incluidos los compartidos) o sucursales."""
+    empleados, cargos, sucursales = Empleado.objects.all(), Cargo.objects.all(), Sucursal.objects.all()
+    if empresa_id:
+        empleados = empleados.filter(empresa_id=empresa_id)
+        cargos = cargos.filter(Q(empresa_id=empresa_id) | Q(empresa__isnull=True))
+        sucursales = sucursales.filter(empresa_id=empresa_id)
+    parts = []
+    for qs in (empleados, cargos, sucursales):
+        totals = qs.aggregate(last=Max('updated_at'), total=Count('id'))
+        parts.append(f"{totals['last'].timestamp() if totals['last'] else 0}-{totals['total']}")
+    return ":".join(parts)
+
+
+def _cache_key(empresa_id: Optional[int]) -> str:
+    return f"{_CACHE_PREFIX}:{empresa_id or 'all'}:{organigram_version(empresa_id)}"
+
+
+def build_index(empresa_id: Optional[int] = None) -> Dict:
+    """
+    {'nodes': {id: nodo}, 'children': {jefe_id: [ids]}, 'roots': [ids], 'total': n}.
+
+    Como antes, solo cuentan los empleados activos y las raíces son los que no tienen jefe.
+    """
+    qs = Empleado.objects.filter(estado='activo')
+    if empresa_id:
+        qs = qs.filter(empresa_id=empresa_id)
+    storage = Empleado._meta.get_field('foto_url').storage
+    nodes, children, roots = {}, {}, []
+    for row in qs.order_by('apellidos', 'nombres').values(
+        'id', 'nombres', 'apellidos', 'manager_id', 'foto_url',
+        'cargo_id', 'cargo__nombre', 'cargo__departamento', 'sucursal__nombre',
+    ):
+        nodes[row['id']] = {
+            'id': row['id'],
+            'name': f"{row['nombres']} {row['apellidos']}",
+            'manager_id': row['manager_id'],
+            'attributes': {
+                'cargo': row['cargo__nombre'] if row['cargo_id'] else 'Sin cargo asignado',
+                'foto': storage.url(row['foto_url']) if row['foto_url'] else None,
+                'departamento': row['cargo__departamento'] if row['cargo_id'] else row['sucursal__nombre'],
+            },
+        }
+        if row['manager_id']:
+            children.setdefault(row['manager_id'], []).append(row['id'])
+        else:
+            roots.append(row['id'])
+    return {'nodes': nodes, 'children': children, 'roots': roots, 'total': len(nodes)}
+
+
+def get_index(empresa_id: Optional[int] = None) -> Dict:
+    key = _cache_key(empresa_id)
+    index = cache.get(key)
+    if index is None:
+        index = build_index(empresa_id)
+        cache.set(key, index, CACHE_TTL_SECONDS)
+    return index
+
+
+def _node(index: Dict, node_id: int, photo_url) -> Dict:
+    source = index['nodes'][node_id]
+    attributes = dict(source['attributes'])
+    if attributes['foto'] and photo_url:
+        attributes['foto'] = photo_url(attributes['foto'])
+    return {'id': node_id, 'name': source['name'], 'attributes': attributes}
+
+
+def build_tree(index: Dict, roots: List[int], depth: Optional[int] = None,
+               photo_url=None, with_counts: bool = False) -> List[Dict]:
+    """
+    Árbol anidado (forma de react-d3-tree) desde `roots`, recorrido en anchura sin recursión.
+    Con `depth`, los nodos del último nivel quedan con `children` vacío; `with_counts`
+    agrega `children_count` para que la UI sepa qué nodos puede expandir.
+    """
+    tree, seen = [], set()
+    queue = deque((root, 0, tree) for root in roots)
+    while queue:
+        node_id, level, siblings = queue.popleft()
+        if node_id in seen:  # ciclos de jefatura
+            continue
+        seen.add(node_id)
+        node = _node(index, node_id, photo_url)
+        child_ids = index['children'].get(node_id, [])
+        if with_counts:
+            node['children_count'] = len(child_ids)
+        node['children'] = []
+        siblings.append(node)
+        if depth is None or level < depth:
+            queue.extend((child_id, level + 1, node['children']) for child_id in child_ids)
+    return tree
+
+
+def build_flat(index: Dict, roots: List[int], depth: Optional[int] = None, photo_url=None) -> List[Dict]:
+    """Lista de adyacencia (`manager_id` por nodo) en el mismo orden de recorrido que `build_tree`."""
+    rows, seen = [], set()
+    queue = deque((root, 0) for root in roots)
+    while queue:
+        node_id, level = queue.popleft()
+        if node_id in seen:
+            continue
+        seen.add(node_id)
+        node = _node(index, node_id, photo_url)
+        child_ids = index['children'].get(node_id, [])
+        node['manager_id'] = index['nodes'][node_id]['manager_id']
+        node['children_count'] = len(child_ids)
+        rows.append(node)
+        if depth is None or level < depth:
+            queue.extend((child_id, level + 1) for child_id in child_ids)
+    return rows
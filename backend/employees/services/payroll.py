@@ -1,14 +1,21 @@
+import hashlib
+import json
 from dataclasses import dataclass
 from datetime import date
-from typing import List, Dict, Any
+from decimal import Decimal
+from typing import Iterable, List, Dict, Any, Optional, Set
 
-from django.db.models import Sum, DecimalField, Value
-from django.db.models.functions import Coalesce
+import numpy as np
+from django.db.models import Sum
 
 from attendance.models import AttendanceRecord
+from core.dates import days_q
 from employees.models import Empleado
 from leaves.models import LeaveRequest as HRLeaveRequest
 
+PAYROLL_DAYS = 30
+ZERO = Decimal(0)
+
 
 @dataclass
 class PayrollIssue:
@@ -19,98 +26,162 @@ class PayrollIssue:
 
 
 class PayrollCalculator:
-    """Valida y calcula montos base de nómina devolviendo errores detallados en vez de fallar."""
+    """
+    Valida y calcula montos base de nómina devolviendo errores detallados en vez de fallar.
+
+    Trabaja por lotes sobre toda la empresa: contratos, presencia de asistencia y días
+    no justificados se obtienen con tres consultas agrupadas y los montos se calculan
+    por columnas con arreglos NumPy (float64, la misma aritmética del cálculo por empleado).
+    """
 
-    def __init__(self, start: date, end: date):
+    def __init__(self, start: date, end: date, empresa_id=None, employee_ids: Optional[Iterable[int]] = None):
         self.start = start
         self.end = end
-
-    def calculate(self) -> Dict[str, Any]:
-        employees = (
-            Empleado.objects.filter(estado="activo")
-            .select_related("contract", "sucursal", "cargo")
-            .all()
+        self.empresa_id = empresa_id
+        # Subconjunto opcional (recálculo incremental de snapshots)
+        self.employee_ids = list(employee_ids) if employee_ids is not None else None
+
+    def _employees(self) -> List[Dict[str, Any]]:
+        qs = Empleado.objects.filter(estado="activo")
+        if self.empresa_id:
+            qs = qs.filter(empresa_id=self.empresa_id)
+        if self.employee_ids is not None:
+            qs = qs.filter(id__in=self.employee_ids)
+        return list(
+            qs.values(
+                "id",
+                "nombres",
+                "apellidos",
+                "sucursal__nombre",
+                "cargo__nombre",
+                "contract__id",
+                "contract__is_active",
+                "contract__salary",
+                "contract__end_date",
+            )
         )
 
-        results: List[Dict[str, Any]] = []
-        issues: List[PayrollIssue] = []
+    def _employees_with_attendance(self) -> Set[int]:
+        qs = AttendanceRecord.objects.filter(days_q("timestamp", self.start, self.end))
+        if self.empresa_id:
+            qs = qs.filter(employee__empresa_id=self.empresa_id)
+        if self.employee_ids is not None:
+            qs = qs.filter(employee_id__in=self.employee_ids)
+        return set(qs.order_by().values_list("employee_id", flat=True).distinct())
+
+    def _unexcused_days(self) -> Dict[int, Decimal]:
+        qs = HRLeaveRequest.objects.filter(
+            status="REJECTED",
+            start_date__lte=self.end,
+            end_date__gte=self.start,
+        )
+        if self.empresa_id:
+            qs = qs.filter(empleado__empresa_id=self.empresa_id)
+        if self.employee_ids is not None:
+            qs = qs.filter(empleado_id__in=self.employee_ids)
+        return {
+            row["empleado_id"]: row["total"] or ZERO
+            for row in qs.order_by().values("empleado_id").annotate(total=Sum("days"))
+        }
 
+    def calculate_rows(self) -> List[Dict[str, Any]]:
+        """
+        Resultado por empleado (en el orden de Empleado): `result` (o None),
+        `issues`, `has_attendance`, `sort_key` y `inputs_hash` (huella de sus datos de entrada).
+        """
+        employees = self._employees()
+        with_attendance = self._employees_with_attendance()
+        unexcused_by_employee = self._unexcused_days()
+
+        rows: List[Dict[str, Any]] = []
+        payable = []
         for emp in employees:
-            contract = getattr(emp, "contract", None)
-            if not contract or not contract.is_active:
-                issues.append(
+            name = f"{emp['nombres']} {emp['apellidos']}"
+            unexcused_days = unexcused_by_employee.get(emp["id"], ZERO)
+            has_attendance = emp["id"] in with_attendance
+            row = {
+                "employee_id": emp["id"],
+                "sort_key": f"{emp['apellidos']} {emp['nombres']}".lower()[:220],
+                "has_attendance": has_attendance,
+                "inputs_hash": _inputs_hash(emp, unexcused_days, has_attendance),
+                "result": None,
+                "issues": [],
+            }
+            rows.append(row)
+
+            if not emp["contract__id"] or not emp["contract__is_active"]:
+                row["issues"].append(
                     PayrollIssue(
-                        employee_id=emp.id,
-                        employee_name=emp.nombre_completo,
+                        employee_id=emp["id"],
+                        employee_name=name,
                         level="error",
-                        message=f"{emp.nombre_completo} no tiene contrato configurado",
-                    )
+                        message=f"{name} no tiene contrato configurado",
+                    ).__dict__
                 )
                 continue
-
-            salary = contract.salary
-            if salary is None:
-                issues.append(
+            if emp["contract__salary"] is None:
+                row["issues"].append(
                     PayrollIssue(
-                        employee_id=emp.id,
-                        employee_name=emp.nombre_completo,
+                        employee_id=emp["id"],
+                        employee_name=name,
                         level="error",
-                        message=f"Salario no definido para {emp.nombre_completo}",
-                    )
+                        message=f"Salario no definido para {name}",
+                    ).__dict__
                 )
                 continue
-
-            has_attendance = AttendanceRecord.objects.filter(
-                employee=emp,
-                timestamp__date__gte=self.start,
-                timestamp__date__lte=self.end,
-            ).exists()
             if not has_attendance:
-                issues.append(
+                row["issues"].append(
                     PayrollIssue(
-                        employee_id=emp.id,
-                        employee_name=emp.nombre_completo,
+                        employee_id=emp["id"],
+                        employee_name=name,
                         level="warning",
                         message="Sin asistencia registrada en el periodo (se calcula pago base)",
-                    )
-                )
-
-            unexcused_days = (
-                HRLeaveRequest.objects.filter(
-                    empleado=emp,
-                    status="REJECTED",
-                    start_date__lte=self.end,
-                    end_date__gte=self.start,
-                )
-                .aggregate(
-                    total=Coalesce(
-                        Sum("days", output_field=DecimalField(max_digits=7, decimal_places=2)),
-                        Value(0, output_field=DecimalField(max_digits=7, decimal_places=2)),
-                    )
+                    ).__dict__
                 )
-                .get("total")
-            ) or 0
-
-            days_worked = max(0, 30 - float(unexcused_days))
-            base_salary = float(salary)
-            estimated_payment = round((base_salary / 30) * days_worked, 2)
-
-            results.append(
-                {
-                    "employee_id": emp.id,
-                    "employee_name": emp.nombre_completo,
-                    "branch": emp.sucursal.nombre if emp.sucursal else None,
-                    "position": emp.cargo.nombre if emp.cargo else None,
-                    "base_salary": base_salary,
-                    "unexcused_days": float(unexcused_days),
-                    "days_worked": days_worked,
-                    "estimated_payment": estimated_payment,
-                    "contract_id": contract.id,
-                    "end_date": contract.end_date,
-                }
-            )
+            payable.append((row, emp, name, unexcused_days))
+
+        # Cálculo por columnas
+        salaries = np.array([float(emp["contract__salary"]) for _, emp, _, _ in payable], dtype=float)
+        unexcused = np.array([float(days) for _, _, _, days in payable], dtype=float)
+        days_worked = np.maximum(0.0, PAYROLL_DAYS - unexcused)
+        payments = salaries / PAYROLL_DAYS * days_worked
+
+        for (row, emp, name, _), salary, unexcused_days, worked, payment in zip(
+            payable, salaries.tolist(), unexcused.tolist(), days_worked.tolist(), payments.tolist()
+        ):
+            row["result"] = {
+                "employee_id": emp["id"],
+                "employee_name": name,
+                "branch": emp["sucursal__nombre"],
+                "position": emp["cargo__nombre"],
+                "base_salary": salary,
+                "unexcused_days": unexcused_days,
+                "days_worked": worked,
+                # round() de Python (no np.round): mismo redondeo que el cálculo por empleado
+                "estimated_payment": round(payment, 2),
+                "contract_id": emp["contract__id"],
+                "end_date": emp["contract__end_date"],
+            }
+        return rows
 
-        return {
-            "results": results,
-            "issues": [issue.__dict__ for issue in issues],
-        }
+    def calculate(self) -> Dict[str, Any]:
+        return assemble_payload(self.calculate_rows())
+
+
+def assemble_payload(rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    results: List[Dict[str, Any]] = []
+    issues: List[Dict[str, Any]] = []
+    for row in rows:
+        issues.extend(row["issues"])
+        if row["result"] is not None:
+            results.append(row["result"])
+    return {
+        "results": results,
+        "issues": issues,
+    }
+
+
+def _inputs_hash(emp: Dict[str, Any], unexcused_days: Decimal, has_attendance: bool) -> str:
+    inputs = dict(emp, unexcused_days=unexcused_days, has_attendance=has_attendance)
+    encoded = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
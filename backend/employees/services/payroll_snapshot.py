@@ -0,0 +1,148 @@
+"""
+Snapshots persistidos de la pre-nómina (PayrollSnapshot / PayrollSnapshotLine).
+
+- Periodos cerrados: se sirven desde el snapshot mientras ninguna línea esté marcada.
+- Periodo abierto: se recalculan solo los empleados marcados (`dirty`) y los que
+  entran o salen del padrón de activos desde la última corrida.
+
+Las líneas se marcan desde employees/signals.py cuando cambian sus entradas
+(Contract, leaves.LeaveRequest, AttendanceRecord, Empleado) y cuando se renombra la
+Sucursal o el Cargo que la línea muestra (`branch`, `position`).
+"""
+import hashlib
+from calendar import monthrange
+from datetime import date
+from typing import Any, Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from employees.models import Empleado, PayrollSnapshot, PayrollSnapshotLine
+from employees.services.payroll import PayrollCalculator, assemble_payload
+
+LINE_UPDATE_FIELDS = ["sort_key", "has_attendance", "inputs_hash", "result", "issues", "dirty"]
+
+
+def _period_bounds(year: int, month: int):
+    return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+
+
+def _line(snapshot: PayrollSnapshot, row: Dict[str, Any]) -> PayrollSnapshotLine:
+    return PayrollSnapshotLine(
+        snapshot=snapshot,
+        employee_id=row["employee_id"],
+        sort_key=row["sort_key"],
+        has_attendance=row["has_attendance"],
+        inputs_hash=row["inputs_hash"],
+        result=row["result"],
+        issues=row["issues"],
+        dirty=False,
+    )
+
+
+def _recompute(snapshot: PayrollSnapshot, employee_ids: Optional[Iterable[int]]) -> int:
+    """Recalcula las líneas indicadas (None = todas) y retira empleados ya no activos."""
+    start, end = _period_bounds(snapshot.year, snapshot.month)
+    if employee_ids is not None:
+        employee_ids = set(employee_ids)
+        # Se limpian antes de calcular: una señal posterior vuelve a marcarlas
+        snapshot.lines.filter(employee_id__in=employee_ids).update(dirty=False)
+
+    rows = PayrollCalculator(start, end, empresa_id=snapshot.empresa_id, employee_ids=employee_ids).calculate_rows()
+    computed = {row["employee_id"] for row in rows}
+
+    with transaction.atomic():
+        PayrollSnapshotLine.objects.bulk_create(
+            [_line(snapshot, row) for row in rows],
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["snapshot", "employee"],
+            update_fields=LINE_UPDATE_FIELDS,
+        )
+        stale = snapshot.lines.exclude(employee_id__in=computed)
+        if employee_ids is not None:
+            stale = stale.filter(employee_id__in=employee_ids)
+        stale.delete()
+    return len(rows)
+
+
+def _active_employee_ids(empresa_id=None):
+    qs = Empleado.objects.filter(estado="activo")
+    if empresa_id:
+        qs = qs.filter(empresa_id=empresa_id)
+    return set(qs.values_list("id", flat=True))
+
+
+def get_payroll_preview(year: int, month: int, empresa_id=None) -> Dict[str, Any]:
+    """Pre-nómina del periodo ({results, issues, inputs_hash, computed_at}) usando el snapshot."""
+    start, end = _period_bounds(year, month)
+    snapshot, created = PayrollSnapshot.objects.get_or_create(
+        period_key=PayrollSnapshot.build_period_key(year, month, empresa_id),
+        defaults={"year": year, "month": month, "empresa_id": empresa_id},
+    )
+
+    changed = False
+    if created or snapshot.computed_at is None:
+        _recompute(snapshot, None)
+        changed = True
+    else:
+        pending = set(snapshot.lines.filter(dirty=True).values_list("employee_id", flat=True))
+        if end >= timezone.localdate():
+            # Periodo abierto: altas y bajas del padrón desde la última corrida
+            current = set(snapshot.lines.values_list("employee_id", flat=True))
+            active = _active_employee_ids(empresa_id)
+            pending |= active ^ current
+        if pending:
+            _recompute(snapshot, pending)
+            changed = True
+
+    lines = list(
+        snapshot.lines.order_by("sort_key", "employee_id").values("inputs_hash", "result", "issues")
+    )
+    if changed:
+        joined = "".join(line["inputs_hash"] for line in lines)
+        snapshot.inputs_hash = hashlib.sha256(joined.encode("utf-8")).hexdigest()
+        snapshot.computed_at = timezone.now()
+        snapshot.save(update_fields=["inputs_hash", "computed_at", "updated_at"])
+
+    payload = assemble_payload(lines)
+    payload["inputs_hash"] = snapshot.inputs_hash
+    payload["computed_at"] = snapshot.computed_at
+    return payload
+
+
+# ===== Marcado de líneas (llamado desde employees/signals.py) =====
+
+def mark_employee_dirty(employee_id: int) -> int:
+    """Todas las líneas del empleado (cambio de contrato, datos o permisos)."""
+    return PayrollSnapshotLine.objects.filter(employee_id=employee_id, dirty=False).update(dirty=True)
+
+
+def mark_leave_dirty(employee_id: int, start: date, end: date) -> int:
+    """Líneas del empleado en los periodos que cruza el permiso."""
+    periods = Q()
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        periods |= Q(snapshot__year=year, snapshot__month=month)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return PayrollSnapshotLine.objects.filter(periods, employee_id=employee_id, dirty=False).update(dirty=True)
+
+
+def mark_attendance_dirty(employee_id: int, day: date, removed: bool = False) -> int:
+    """
+    Una marcación solo cambia la pre-nómina si altera la presencia del empleado en el mes:
+    al crear, solo importan líneas sin asistencia; al eliminar, cualquiera.
+    """
+    qs = PayrollSnapshotLine.objects.filter(
+        employee_id=employee_id, snapshot__year=day.year, snapshot__month=day.month, dirty=False
+    )
+    if not removed:
+        qs = qs.filter(has_attendance=False)
+    return qs.update(dirty=True)
+
+
+def mark_labels_dirty(sucursal_id: Optional[int] = None, cargo_id: Optional[int] = None) -> int:
+    """Líneas de los empleados de la sucursal o cargo renombrado (sus etiquetas van en `result`)."""
+    lookup = {"employee__sucursal_id": sucursal_id} if sucursal_id else {"employee__cargo_id": cargo_id}
+    return PayrollSnapshotLine.objects.filter(dirty=False, **lookup).update(dirty=True)
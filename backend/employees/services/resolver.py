@@ -0,0 +1,126 @@
+"""
+Empleado del usuario autenticado, con su turno asignado (`current_shift`).
+
+Tres niveles, del más barato al más caro:
+1. Memo en el propio objeto `user` (vive lo que dura el request).
+2. Caché por id de usuario: la de Django si es compartida entre procesos
+   (`CACHE_TTL_SECONDS`); si no, una LRU acotada del proceso (`LOCAL_CACHE_SIZE`
+   entradas, `LOCAL_CACHE_TTL_SECONDS`), porque una invalidación no llegaría a los
+   demás workers y solo el TTL corto acota su atraso.
+3. La consulta (`_lookup_employee`).
+
+Las señales de Empleado, Usuario y WorkShift llaman a `invalidate_user_ids`, que
+limpia ambos niveles de caché.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from django.core.cache import cache
+
+from core.cache import is_shared_cache
+from employees.models import Empleado
+
+CACHE_TTL_SECONDS = 300
+LOCAL_CACHE_TTL_SECONDS = 30
+LOCAL_CACHE_SIZE = 1024
+_CACHE_PREFIX = "employees:user-empleado"
+# Marca "usuario sin empleado" para no repetir la búsqueda en cada request
+_NO_EMPLOYEE = "none"
+_MEMO_ATTR = "_empleado_resuelto"
+_UNSET = object()
+
+# user_id → (expira, empleado o _NO_EMPLOYEE), del menos al más usado
+_local_cache: "OrderedDict[int, tuple]" = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _cache_key(user_id) -> str:
+    return f"{_CACHE_PREFIX}:{user_id}"
+
+
+def _lookup_employee(user) -> Optional[Empleado]:
+    empleados = Empleado.objects.select_related('current_shift')
+    # 1) relación directa OneToOne (índice único)
+    emp = empleados.filter(user_id=user.pk).first()
+    if emp:
+        return emp
+    # 2) fallback por correo o username
+    if user.email:
+        emp = empleados.filter(email=user.email).first()
+        if emp:
+            return emp
+    return empleados.filter(email=user.username).first()
+
+
+def _local_get(user_id):
+    with _local_lock:
+        entry = _local_cache.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del _local_cache[user_id]
+            return None
+        _local_cache.move_to_end(user_id)
+        return entry[1]
+
+
+def _local_set(user_id, value) -> None:
+    with _local_lock:
+        _local_cache[user_id] = (time.monotonic() + LOCAL_CACHE_TTL_SECONDS, value)
+        _local_cache.move_to_end(user_id)
+        while len(_local_cache) > LOCAL_CACHE_SIZE:
+            _local_cache.popitem(last=False)
+
+
+def _cached_lookup(user):
+    """Empleado o _NO_EMPLOYEE desde la caché que corresponda (None si no está)."""
+    if is_shared_cache():
+        return cache.get(_cache_key(user.pk))
+    cached = _local_get(user.pk)
+    # Copia: la instancia guardada se comparte entre requests e hilos
+    return copy.copy(cached) if isinstance(cached, Empleado) else cached
+
+
+def _store_lookup(user, value) -> None:
+    if is_shared_cache():
+        cache.set(_cache_key(user.pk), value, CACHE_TTL_SECONDS)
+    else:
+        _local_set(user.pk, copy.copy(value) if isinstance(value, Empleado) else value)
+
+
+def resolve_employee(user, include_admin: bool = False) -> Optional[Empleado]:
+    """
+    Empleado vinculado al usuario autenticado (ver niveles de caché arriba).
+    Los ADMIN no marcan asistencia y resuelven a None salvo `include_admin`.
+    """
+    if not user or not getattr(user, "is_authenticated", False):
+        return None
+    if getattr(user, "role", None) == "ADMIN" and not include_admin:
+        return None
+
+    memo = getattr(user, _MEMO_ATTR, _UNSET)
+    if memo is not _UNSET:
+        return memo
+
+    cached = _cached_lookup(user)
+    if cached is None:
+        emp = _lookup_employee(user)
+        _store_lookup(user, emp if emp else _NO_EMPLOYEE)
+    else:
+        emp = None if cached == _NO_EMPLOYEE else cached
+
+    setattr(user, _MEMO_ATTR, emp)
+    return emp
+
+
+def invalidate_user_ids(user_ids: Iterable) -> None:
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if not user_ids:
+        return
+    with _local_lock:
+        for user_id in user_ids:
+            _local_cache.pop(user_id, None)
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
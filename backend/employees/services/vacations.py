@@ -0,0 +1,113 @@
+"""
+Libro de vacaciones: cada cambio de saldo es un `MovimientoVacaciones` más una
+actualización con F() sobre `SaldoVacaciones`, en la misma transacción.
+
+- Los débitos son condicionales (`dias_disponibles >= dias`), así dos aprobaciones
+  concurrentes no pueden gastar el mismo saldo.
+- `referencia` es única por empleado: repetir un débito o una acumulación mensual
+  no la registra dos veces.
+"""
+from decimal import Decimal
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from employees.models import Empleado, MovimientoVacaciones, SaldoVacaciones
+
+# 15 días al año
+DEFAULT_MONTHLY_ACCRUAL = Decimal('1.25')
+BULK_BATCH_SIZE = 1000
+
+
+def accrual_reference(year: int, month: int) -> str:
+    return f"acumulacion:{year}-{month:02d}"
+
+
+def leave_reference(leave_id: int) -> str:
+    return f"permiso:{leave_id}"
+
+
+def debit_days(empleado_id: int, periodo: int, dias: Decimal, referencia: str,
+               user=None, descripcion: str = '') -> bool:
+    """
+    Descuenta `dias` si el saldo alcanza; False si no hay saldo suficiente (o no existe).
+    Llamarlo dentro de la transacción del cambio que lo origina para revertir ambos juntos.
+    """
+    with transaction.atomic():
+        updated = SaldoVacaciones.objects.filter(
+            empleado_id=empleado_id, periodo=periodo, dias_disponibles__gte=dias
+        ).update(dias_disponibles=F('dias_disponibles') - dias, updated_at=timezone.now())
+        if not updated:
+            return False
+        MovimientoVacaciones.objects.create(
+            empleado_id=empleado_id, periodo=periodo, tipo='DEBITO', dias=-dias,
+            referencia=referencia, descripcion=descripcion, creado_por=user,
+        )
+    return True
+
+
+def adjust_days(empleado_id: int, periodo: int, dias: Decimal, user=None, descripcion: str = '') -> bool:
+    """Ajuste manual (positivo o negativo); False si dejaría el saldo en negativo."""
+    with transaction.atomic():
+        SaldoVacaciones.objects.get_or_create(empleado_id=empleado_id, periodo=periodo)
+        qs = SaldoVacaciones.objects.filter(empleado_id=empleado_id, periodo=periodo)
+        if dias < 0:
+            qs = qs.filter(dias_disponibles__gte=-dias)
+        if not qs.update(dias_disponibles=F('dias_disponibles') + dias, updated_at=timezone.now()):
+            return False
+        MovimientoVacaciones.objects.create(
+            empleado_id=empleado_id, periodo=periodo, tipo='AJUSTE', dias=dias,
+            descripcion=descripcion, creado_por=user,
+        )
+    return True
+
+
+def post_monthly_accrual(empresa_id: int, year: int, month: int,
+                         dias: Decimal = DEFAULT_MONTHLY_ACCRUAL, user=None) -> int:
+    """
+    Acumula `dias` a todos los empleados activos de la empresa para el mes indicado
+    (periodo = año). Idempotente por empleado y mes; devuelve cuántos empleados acumularon.
+    """
+    referencia = accrual_reference(year, month)
+    employee_ids = set(
+        Empleado.objects.filter(empresa_id=empresa_id, estado='activo').values_list('id', flat=True)
+    )
+    with transaction.atomic():
+        employee_ids -= set(
+            MovimientoVacaciones.objects.filter(
+                referencia=referencia, empleado__empresa_id=empresa_id
+            ).values_list('empleado_id', flat=True)
+        )
+        if not employee_ids:
+            return 0
+        SaldoVacaciones.objects.bulk_create(
+            [SaldoVacaciones(empleado_id=employee_id, periodo=year) for employee_id in employee_ids],
+            batch_size=BULK_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        # Una ejecución concurrente del mismo mes choca aquí con la referencia única y se revierte
+        MovimientoVacaciones.objects.bulk_create(
+            [
+                MovimientoVacaciones(
+                    empleado_id=employee_id, periodo=year, tipo='ACUMULACION', dias=dias,
+                    referencia=referencia, descripcion=f"Acumulación {month:02d}/{year}", creado_por=user,
+                )
+                for employee_id in employee_ids
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        SaldoVacaciones.objects.filter(empleado_id__in=employee_ids, periodo=year).update(
+            dias_disponibles=F('dias_disponibles') + dias, updated_at=timezone.now()
+        )
+    return len(employee_ids)
+
+
+def current_balance(empleado_id: int, periodo: int) -> Optional[Decimal]:
+    return (
+        SaldoVacaciones.objects.filter(empleado_id=empleado_id, periodo=periodo)
+        .values_list('dias_disponibles', flat=True)
+        .first()
+    )
+
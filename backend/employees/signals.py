@@ -1,10 +1,20 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from django.db.models.signals import post_save
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 
-from .models import Empleado
+from attendance.models import AttendanceRecord
+from attendance.signals import marks_bulk_created
+from leaves.models import LeaveRequest as HRLeaveRequest
+
+from .models import Cargo, Contract, Contrato, Empleado, OnboardingTask, SolicitudAusencia, Sucursal
+from .services.dashboard import invalidate_dashboard
+from .services.hierarchy import detach_reports, sync_employee
+from .services.payroll_snapshot import mark_attendance_dirty, mark_employee_dirty, mark_labels_dirty, mark_leave_dirty
+from .services.resolver import invalidate_user_ids
 from django.db import transaction
 
 
@@ -78,4 +88,138 @@ def assign_manager_from_branch(sender, instance: Empleado, created: bool, **kwar
     if gerente and gerente != instance:
         # evitar loops, usar update_fields para no disparar lógica adicional
         instance.manager = gerente
-        instance.save(update_fields=["manager"])
\ No newline at end of file
+        instance.save(update_fields=["manager"])
+
+
+# ===== Caché usuario → empleado (services.resolver) =====
+
+@receiver(pre_save, sender=Empleado)
+def remember_previous_user_link(sender, instance: Empleado, **kwargs):
+    if instance.pk and not kwargs.get("raw"):
+        instance._previous_user_id = (
+            Empleado.objects.filter(pk=instance.pk).values_list("user_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Empleado)
+@receiver(post_delete, sender=Empleado)
+def invalidate_employee_resolution(sender, instance: Empleado, **kwargs):
+    User = get_user_model()
+    user_ids = [instance.user_id, getattr(instance, "_previous_user_id", None)]
+    # Usuarios que pudieron resolverse (o quedar sin empleado) por correo
+    user_ids += User.objects.filter(
+        Q(email=instance.email) | Q(username=instance.email)
+    ).values_list("id", flat=True)
+    invalidate_user_ids(user_ids)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_resolution(sender, instance, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    invalidate_user_ids([instance.pk])
+
+
+# ===== Snapshots de pre-nómina (services.payroll_snapshot) =====
+
+@receiver(post_save, sender=Empleado)
+def mark_payroll_for_employee(sender, instance: Empleado, created: bool, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    if created or kwargs.get("raw") or (update_fields and set(update_fields) <= {"user", "manager"}):
+        return
+    mark_employee_dirty(instance.pk)
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+def mark_payroll_for_contract(sender, instance: Contract, **kwargs):
+    if not kwargs.get("raw"):
+        mark_employee_dirty(instance.employee_id)
+
+
+@receiver(post_save, sender=HRLeaveRequest)
+@receiver(post_delete, sender=HRLeaveRequest)
+def mark_payroll_for_leave(sender, instance: HRLeaveRequest, **kwargs):
+    if not kwargs.get("raw"):
+        mark_leave_dirty(instance.empleado_id, instance.start_date, instance.end_date)
+
+
+@receiver(post_save, sender=AttendanceRecord)
+def mark_payroll_for_record(sender, instance: AttendanceRecord, **kwargs):
+    if not kwargs.get("raw"):
+        mark_attendance_dirty(instance.employee_id, timezone.localdate(instance.timestamp))
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def mark_payroll_for_deleted_record(sender, instance: AttendanceRecord, **kwargs):
+    mark_attendance_dirty(instance.employee_id, timezone.localdate(instance.timestamp), removed=True)
+
+
+@receiver(marks_bulk_created)
+def mark_payroll_for_bulk_marks(sender, keys, **kwargs):
+    for employee_id, day in keys:
+        mark_attendance_dirty(employee_id, day)
+
+
+@receiver(pre_save, sender=Sucursal)
+@receiver(pre_save, sender=Cargo)
+def remember_previous_name(sender, instance, **kwargs):
+    if instance.pk and not kwargs.get("raw"):
+        instance._previous_nombre = sender.objects.filter(pk=instance.pk).values_list("nombre", flat=True).first()
+
+
+@receiver(post_save, sender=Sucursal)
+@receiver(post_save, sender=Cargo)
+def mark_payroll_for_rename(sender, instance, created: bool, **kwargs):
+    if created or kwargs.get("raw") or getattr(instance, "_previous_nombre", instance.nombre) == instance.nombre:
+        return
+    if sender is Sucursal:
+        mark_labels_dirty(sucursal_id=instance.pk)
+    else:
+        mark_labels_dirty(cargo_id=instance.pk)
+
+
+# ===== Snapshot del dashboard de KPIs (services.dashboard) =====
+
+@receiver(post_save, sender=Empleado)
+@receiver(post_delete, sender=Empleado)
+def invalidate_dashboard_for_employee(sender, instance: Empleado, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    if update_fields and set(update_fields) <= {"user", "manager"}:
+        return
+    invalidate_dashboard()
+
+
+@receiver(post_save, sender=Contrato)
+@receiver(post_delete, sender=Contrato)
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+@receiver(post_save, sender=SolicitudAusencia)
+@receiver(post_delete, sender=SolicitudAusencia)
+@receiver(post_save, sender=OnboardingTask)
+@receiver(post_delete, sender=OnboardingTask)
+def invalidate_dashboard_for_related(sender, instance, **kwargs):
+    invalidate_dashboard()
+
+
+# ===== Índice jerárquico (services.hierarchy) =====
+
+@receiver(post_save, sender=Empleado)
+def sync_hierarchy_for_employee(sender, instance: Empleado, **kwargs):
+    update_fields = kwargs.get("update_fields")
+    if kwargs.get("raw") or (update_fields and "manager" not in update_fields):
+        return
+    # Se compara con el índice (no con pre_save): las señales anidadas vuelven a guardar la instancia
+    sync_employee(instance.pk, instance.manager_id)
+
+
+@receiver(pre_delete, sender=Empleado)
+def remember_reports_before_delete(sender, instance: Empleado, **kwargs):
+    instance._report_ids = list(instance.subordinados.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Empleado)
+def detach_reports_after_delete(sender, instance: Empleado, **kwargs):
+    detach_reports(getattr(instance, "_report_ids", []))
@@ -1,3 +1,604 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from attendance.models import AttendanceRecord, Turno, WorkShift
+from core.models import Empresa, Usuario
+from employees.models import (
+    Cargo, Contract, Contrato, Empleado, EmpleadoJerarquia, MovimientoVacaciones, SaldoVacaciones, Sucursal,
+)
+from employees.serializers import EmpleadoDetailSerializer, EmpleadoSerializer, EmployeePortalSerializer
+from employees.services.counts import active_subordinates_count
+from employees.services.dashboard import get_dashboard
+from employees.services.employment import with_employment_context
+from employees.services.hierarchy import (
+    all_reports, chain_of_command, move_employee, rebuild_hierarchy, would_create_cycle,
+)
+from employees.services import resolver
+from employees.services.payroll import PayrollCalculator
+from employees.services.payroll_snapshot import get_payroll_preview
+from employees.services.vacations import debit_days, post_monthly_accrual
+from leaves.models import LeaveRequest
+
+
+class AnnotatedCountsQueryTests(TestCase):
+    """El número de consultas de los listados no debe crecer con las filas (sin N+1 de conteos)."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.seq = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            self.seq += 1
+            sucursal = Sucursal.objects.create(empresa=self.empresa, nombre=f'Sucursal {self.seq}')
+            cargo = Cargo.objects.create(empresa=self.empresa, nombre=f'Cargo {self.seq}')
+            for estado in ('activo', 'activo', 'inactivo'):
+                self.seq += 1
+                Empleado.objects.create(
+                    empresa=self.empresa, sucursal=sucursal, cargo=cargo, estado=estado,
+                    nombres=f'N{self.seq}', apellidos=f'A{self.seq}', documento=f'D{self.seq}',
+                    email=f'e{self.seq}@acme.test', telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+                )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def assert_constant_queries(self, url):
+        self.add_rows(2)
+        baseline, _ = self.count_queries(url)
+        self.add_rows(5)
+        queries, data = self.count_queries(url)
+        self.assertEqual(queries, baseline)
+        rows = data['results'] if isinstance(data, dict) else data
+        self.assertTrue(rows)
+        counts = {row['nombre']: row['employee_count'] for row in rows}
+        self.assertEqual(counts['Sucursal 1' if 'sucursales' in url else 'Cargo 1'], 2)
+        # Filas sembradas por las migraciones (p. ej. 'Sede Central') no tienen empleados activos aquí
+        self.assertEqual(sum(counts.values()), 2 * 7)
+
+    def test_sucursales_list(self):
+        self.assert_constant_queries('/api/employees/api/sucursales/')
+
+    def test_puestos_list(self):
+        self.assert_constant_queries('/api/employees/api/puestos/')
+
+    def test_cargos_list(self):
+        self.assert_constant_queries('/api/employees/api/cargos/')
+
+    def test_subordinates_count_annotation(self):
+        self.add_rows(1)
+        jefe = Empleado.objects.filter(estado='activo').first()
+        Empleado.objects.exclude(pk=jefe.pk).update(manager=jefe)
+        empleado = Empleado.objects.annotate(
+            active_subordinates_count=active_subordinates_count()
+        ).get(pk=jefe.pk)
+        serializer = EmpleadoDetailSerializer(empleado)
+        with CaptureQueriesContext(connection) as ctx:
+            count = serializer.get_subordinates_count(empleado)
+        self.assertEqual(count, 1)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+
+class EmploymentContextQueryTests(TestCase):
+    """Contratos (nuevo y legado) y turnos se resuelven por lotes, no por empleado."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.sucursal = Sucursal.objects.create(empresa=self.empresa, nombre='Matriz')
+        self.cargo = Cargo.objects.create(empresa=self.empresa, nombre='Analista')
+        self.shift = WorkShift.objects.create(
+            empresa=self.empresa, name='Diurno', start_time=time(9), end_time=time(18), days=[0, 1, 2, 3, 4]
+        )
+        self.turno = Turno.objects.create(
+            empresa=self.empresa, nombre='General', hora_inicio=time(8), hora_fin=time(17), dias_semana=[0, 1, 2, 3, 4]
+        )
+        self.seq = 0
+
+    def add_employees(self, count):
+        for _ in range(count):
+            self.seq += 1
+            empleado = Empleado.objects.create(
+                empresa=self.empresa, sucursal=self.sucursal, cargo=self.cargo,
+                nombres=f'N{self.seq}', apellidos=f'A{self.seq}', documento=f'D{self.seq}',
+                email=f'e{self.seq}@acme.test', telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+                current_shift=self.shift if self.seq % 2 else None,
+            )
+            if self.seq % 3 == 0:
+                Contract.objects.create(
+                    employee=empleado, contract_type='INDEFINIDO', start_date=date(2024, 1, 1), salary=1000
+                )
+            else:
+                Contrato.objects.create(
+                    empleado=empleado, tipo='indefinido', fecha_inicio=date(2024, 1, 1),
+                    salario_base=900, contrato_turno=self.turno,
+                )
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/employees/api/empleados/', {'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_empleados_list_constant_queries(self):
+        self.add_employees(5)
+        baseline = self.count_list_queries()
+        self.add_employees(95)
+        self.assertEqual(self.count_list_queries(), baseline)
+
+    def test_portal_serializer_reads_prefetched_context(self):
+        self.add_employees(4)
+        empleados = list(with_employment_context(Empleado.objects.select_related('cargo', 'sucursal', 'manager')))
+        with CaptureQueriesContext(connection) as ctx:
+            data = EmployeePortalSerializer(empleados, many=True).data
+        self.assertEqual(len(ctx.captured_queries), 0)
+        legacy = next(row for row in data if row['contract_details'] and row['contract_details']['type'] == 'indefinido')
+        self.assertEqual(legacy['contract_details']['salary'], 900.0)
+        shifts = {row['shift_details']['name'] for row in data if row['shift_details']}
+        self.assertEqual(shifts, {'Diurno', 'General'})
+
+
+class VacationLedgerTests(TestCase):
+    """Saldo de vacaciones: débito condicional, aprobación única y acumulación idempotente."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.empleado = Empleado.objects.create(
+            empresa=self.empresa, nombres='Ana', apellidos='Paz', documento='D1',
+            sucursal=Sucursal.objects.create(empresa=self.empresa, nombre='Matriz'),
+            cargo=Cargo.objects.create(empresa=self.empresa, nombre='Analista'),
+            email='ana@acme.test', telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+        self.saldo = SaldoVacaciones.objects.create(empleado=self.empleado, periodo=2026, dias_disponibles=Decimal('2'))
+        self.hr = Usuario.objects.create_user('rrhh', 'rrhh@acme.test', 'pw', role='ADMIN')
+
+    def balance(self):
+        self.saldo.refresh_from_db()
+        return self.saldo.dias_disponibles
+
+    def test_debit_requires_balance(self):
+        self.assertFalse(debit_days(self.empleado.pk, 2026, Decimal('3'), 'permiso:1'))
+        self.assertEqual(self.balance(), Decimal('2'))
+        self.assertFalse(MovimientoVacaciones.objects.exists())
+        self.assertTrue(debit_days(self.empleado.pk, 2026, Decimal('2'), 'permiso:2'))
+        self.assertEqual(self.balance(), Decimal('0'))
+
+    def test_leave_approved_once(self):
+        leave = LeaveRequest.objects.create(
+            empleado=self.empleado, start_date=date(2026, 3, 2), end_date=date(2026, 3, 3), days=Decimal('2'),
+        )
+        self.client.force_authenticate(self.hr)
+        url = f'/api/leaves/requests/{leave.pk}/approve/'
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.balance(), Decimal('0'))
+        self.assertEqual(MovimientoVacaciones.objects.filter(tipo='DEBITO').count(), 1)
+
+    def test_monthly_accrual_is_idempotent(self):
+        self.assertEqual(post_monthly_accrual(self.empresa.pk, 2026, 3), 1)
+        self.assertEqual(post_monthly_accrual(self.empresa.pk, 2026, 3), 0)
+        self.assertEqual(self.balance(), Decimal('3.25'))
+        self.assertEqual(MovimientoVacaciones.objects.filter(tipo='ACUMULACION').count(), 1)
+
+    def test_balance_is_read_only_and_adjusted_by_hr(self):
+        url = f'/api/employees/api/saldos-vacaciones/{self.saldo.pk}/'
+        employee_user = Usuario.objects.create_user('ana', 'ana@acme.test', 'pw', role='EMPLOYEE')
+        self.client.force_authenticate(employee_user)
+        self.assertEqual(self.client.post(url + 'ajustar/', {'dias': '5'}, format='json').status_code, 403)
+        self.client.force_authenticate(self.hr)
+        self.assertEqual(self.client.patch(url, {'dias_disponibles': '99'}, format='json').status_code, 405)
+        self.assertEqual(self.client.delete(url).status_code, 405)
+        self.assertEqual(self.client.post(url + 'ajustar/', {'dias': '-5'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url + 'ajustar/', {'dias': '1.5'}, format='json').status_code, 200)
+        self.assertEqual(self.balance(), Decimal('3.5'))
+
+    def test_hr_opens_balance_as_adjustment(self):
+        url = '/api/employees/api/saldos-vacaciones/'
+        data = {'empleado': self.empleado.pk, 'periodo': 2027, 'dias_disponibles': '4'}
+        employee_user = Usuario.objects.create_user('ana', 'ana@acme.test', 'pw', role='EMPLOYEE')
+        self.client.force_authenticate(employee_user)
+        self.assertEqual(self.client.post(url, data, format='json').status_code, 403)
+        self.client.force_authenticate(self.hr)
+        self.assertEqual(self.client.post(url, dict(data, dias_disponibles='-1'), format='json').status_code, 400)
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Decimal(response.data['dias_disponibles']), Decimal('4'))
+        movimiento = MovimientoVacaciones.objects.get(periodo=2027)
+        self.assertEqual((movimiento.tipo, movimiento.dias), ('AJUSTE', Decimal('4')))
+
+    def test_ledger_only_for_hr_or_owner(self):
+        url = f'/api/employees/api/saldos-vacaciones/{self.saldo.pk}/movimientos/'
+        self.assertIn(self.client.get(url).status_code, (401, 403))
+        otro = Usuario.objects.create_user('otro', 'otro@acme.test', 'pw', role='EMPLOYEE')
+        self.client.force_authenticate(otro)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_authenticate(self.empleado.user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.force_authenticate(self.hr)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class PayrollSnapshotLabelTests(TestCase):
+    """Renombrar sucursal o cargo actualiza las etiquetas de la pre-nómina guardada."""
+
+    def setUp(self):
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.sucursal = Sucursal.objects.create(empresa=empresa, nombre='Matriz')
+        self.cargo = Cargo.objects.create(empresa=empresa, nombre='Analista')
+        empleado = Empleado.objects.create(
+            empresa=empresa, sucursal=self.sucursal, cargo=self.cargo, nombres='Ana', apellidos='Paz',
+            documento='D1', email='ana@acme.test', telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+        Contract.objects.create(employee=empleado, contract_type='INDEFINIDO', start_date=date(2024, 1, 1), salary=1000)
+
+    def labels(self):
+        row = get_payroll_preview(2026, 1)['results'][0]
+        return row['branch'], row['position']
+
+    def test_rename_marks_lines_dirty(self):
+        self.assertEqual(self.labels(), ('Matriz', 'Analista'))
+        self.sucursal.nombre = 'Quito'
+        self.sucursal.save()
+        self.cargo.nombre = 'Contador'
+        self.cargo.save()
+        self.assertEqual(self.labels(), ('Quito', 'Contador'))
+
+
+class ResolverCacheTests(TestCase):
+    """Empleado del usuario: memo por request, LRU del proceso e invalidación por señales."""
+
+    def setUp(self):
+        resolver._local_cache.clear()
+        self.empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.user = Usuario.objects.create_user('ana', 'ana@acme.test', 'pw', role='EMPLOYEE')
+        self.empleado = Empleado.objects.create(
+            empresa=self.empresa, user=self.user,
+            sucursal=Sucursal.objects.create(empresa=self.empresa, nombre='Matriz'),
+            cargo=Cargo.objects.create(empresa=self.empresa, nombre='Analista'),
+            nombres='Ana', apellidos='Paz', documento='D1', email='ana@acme.test',
+            telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+
+    def fresh_user(self):
+        return Usuario.objects.get(pk=self.user.pk)
+
+    def test_memo_then_process_cache(self):
+        user = self.fresh_user()
+        emp = resolver.resolve_employee(user)
+        self.assertEqual(emp.pk, self.empleado.pk)
+        with self.assertNumQueries(0):
+            self.assertIs(resolver.resolve_employee(user), emp)
+        other_request = self.fresh_user()
+        with self.assertNumQueries(0):
+            cached = resolver.resolve_employee(other_request)
+        self.assertEqual(cached.pk, self.empleado.pk)
+        self.assertIsNot(cached, emp)
+
+    def test_signals_invalidate(self):
+        resolver.resolve_employee(self.fresh_user())
+        shift = WorkShift.objects.create(
+            empresa=self.empresa, name='Mañana', start_time=time(8, 0), end_time=time(16, 0), days=[0, 1, 2, 3, 4],
+        )
+        self.empleado.current_shift = shift
+        self.empleado.save()
+        self.assertEqual(resolver.resolve_employee(self.fresh_user()).current_shift, shift)
+
+        self.empleado.user = Usuario.objects.create_user('otra', 'otra@acme.test', 'pw', role='EMPLOYEE')
+        self.empleado.email = 'otra@acme.test'
+        self.empleado.save()
+        self.assertIsNone(resolver.resolve_employee(self.fresh_user()))
+
+    def test_local_cache_is_bounded_and_expires(self):
+        users = [self.user] + [
+            Usuario.objects.create_user(f'u{n}', f'u{n}@acme.test', 'pw', role='EMPLOYEE') for n in range(3)
+        ]
+        with mock.patch.object(resolver, 'LOCAL_CACHE_SIZE', 2):
+            for user in users:
+                resolver.resolve_employee(Usuario.objects.get(pk=user.pk))
+        self.assertEqual(list(resolver._local_cache), [users[2].pk, users[3].pk])
+
+        with mock.patch.object(resolver, 'LOCAL_CACHE_TTL_SECONDS', 0):
+            resolver.resolve_employee(self.fresh_user())
+            user = self.fresh_user()
+            with self.assertNumQueries(1):
+                resolver.resolve_employee(user)
+
+
+class PayrollCalculatorTests(TestCase):
+    """El cálculo por columnas devuelve lo mismo que el cálculo original por empleado."""
+
+    def setUp(self):
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        sucursal = Sucursal.objects.create(empresa=empresa, nombre='Matriz')
+        cargo = Cargo.objects.create(empresa=empresa, nombre='Analista')
+        cases = [
+            # (salario, contrato activo, días rechazados, con asistencia)
+            ('1234.56', True, ['2.50'], True),
+            ('1000.00', True, [], False),
+            ('999.99', True, ['20.00', '15.00'], True),
+            ('733.33', True, ['0.25'], True),
+            ('800.00', False, [], True),
+            (None, None, [], False),
+        ]
+        for n, (salary, active, leaves, attendance) in enumerate(cases):
+            empleado = Empleado.objects.create(
+                empresa=empresa, sucursal=sucursal, cargo=cargo if n % 2 else None,
+                nombres='N', apellidos=f'E{n}', documento=f'D{n}', email=f'e{n}@acme.test',
+                telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+            )
+            if salary:
+                Contract.objects.create(
+                    employee=empleado, contract_type='INDEFINIDO', start_date=date(2024, 1, 1),
+                    salary=Decimal(salary), is_active=active,
+                )
+            for days in leaves:
+                LeaveRequest.objects.create(
+                    empleado=empleado, start_date=date(2026, 3, 2), end_date=date(2026, 3, 3),
+                    days=Decimal(days), status='REJECTED',
+                )
+            if attendance:
+                AttendanceRecord.objects.create(
+                    employee=empleado, type='CHECK_IN', timestamp=timezone.make_aware(datetime(2026, 3, 4, 8, 0)),
+                )
+
+    @staticmethod
+    def baseline(start, end):
+        """Cálculo original: consultas y aritmética float por empleado."""
+        results, issues = [], []
+        for emp in Empleado.objects.filter(estado='activo').select_related('contract', 'sucursal', 'cargo'):
+            name = emp.nombre_completo
+            contract = getattr(emp, 'contract', None)
+            if not contract or not contract.is_active:
+                issues.append({'employee_id': emp.id, 'employee_name': name, 'level': 'error',
+                               'message': f'{name} no tiene contrato configurado'})
+                continue
+            if not AttendanceRecord.objects.filter(
+                employee=emp, timestamp__date__gte=start, timestamp__date__lte=end,
+            ).exists():
+                issues.append({'employee_id': emp.id, 'employee_name': name, 'level': 'warning',
+                               'message': 'Sin asistencia registrada en el periodo (se calcula pago base)'})
+            unexcused = LeaveRequest.objects.filter(
+                empleado=emp, status='REJECTED', start_date__lte=end, end_date__gte=start,
+            ).aggregate(total=Sum('days'))['total'] or 0
+            days_worked = max(0, 30 - float(unexcused))
+            base_salary = float(contract.salary)
+            results.append({
+                'employee_id': emp.id, 'employee_name': name,
+                'branch': emp.sucursal.nombre if emp.sucursal else None,
+                'position': emp.cargo.nombre if emp.cargo else None,
+                'base_salary': base_salary, 'unexcused_days': float(unexcused), 'days_worked': days_worked,
+                'estimated_payment': round((base_salary / 30) * days_worked, 2),
+                'contract_id': contract.id, 'end_date': contract.end_date,
+            })
+        return {'results': results, 'issues': issues}
+
+    def test_matches_per_employee_calculation(self):
+        start, end = date(2026, 3, 1), date(2026, 3, 31)
+        payload = PayrollCalculator(start, end).calculate()
+        self.assertEqual(payload, self.baseline(start, end))
+        self.assertEqual(len(payload['results']), 4)
+        self.assertEqual(payload['results'][2]['days_worked'], 0)
+
+
+@mock.patch('employees.services.dashboard.today', return_value=date(2026, 3, 10))
+class DashboardSnapshotTests(TestCase):
+    """Snapshot del dashboard por empresa: caché, alcance e invalidación por versión."""
+
+    def setUp(self):
+        cache.clear()
+        self.acme = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.otra = Empresa.objects.create(razon_social='Otra', ruc='1790000000002')
+        self.ana = self.employee(self.acme, 'Ana', date(1990, 3, 25))
+        self.employee(self.acme, 'Luis', date(1985, 3, 2))
+        self.employee(self.acme, 'Eva', date(1992, 4, 1))
+        self.employee(self.otra, 'Rosa', date(1991, 3, 5))
+
+    def employee(self, empresa, nombre, nacimiento):
+        return Empleado.objects.create(
+            empresa=empresa, nombres=nombre, apellidos='Paz', documento=f'D-{nombre}',
+            sucursal=Sucursal.objects.create(empresa=empresa, nombre=f'Matriz {nombre}'),
+            cargo=Cargo.objects.create(empresa=empresa, nombre='Analista'),
+            email=f'{nombre.lower()}@acme.test', telefono='0999999999',
+            fecha_ingreso=date(2024, 1, 1), fecha_nacimiento=nacimiento,
+        )
+
+    def test_snapshot_is_scoped_and_cached(self, _today):
+        data = get_dashboard(self.acme.pk)
+        self.assertEqual(data['total_employees'], 3)
+        self.assertEqual([b['name'] for b in data['birthdays_this_month']], ['Luis Paz', 'Ana Paz'])
+        self.assertEqual(get_dashboard(self.otra.pk)['total_employees'], 1)
+        self.assertEqual(get_dashboard()['total_employees'], 4)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_dashboard(self.acme.pk), data)
+
+    def test_changes_bump_the_version(self, _today):
+        self.assertEqual(get_dashboard(self.acme.pk)['total_employees'], 3)
+        self.ana.estado = 'inactivo'
+        self.ana.save()
+        data = get_dashboard(self.acme.pk)
+        self.assertEqual(data['total_employees'], 2)
+        self.assertEqual([b['name'] for b in data['birthdays_this_month']], ['Luis Paz'])
+        # Solo cambia el vínculo con el usuario: el snapshot sigue vigente
+        self.ana.user = None
+        self.ana.save(update_fields=['user'])
+        with self.assertNumQueries(0):
+            get_dashboard(self.acme.pk)
+
+
+class OrganigramTests(TestCase):
+    """Organigrama desde el índice en caché: árbol completo, subárbol por niveles y lista plana."""
+
+    url = '/api/employees/api/organigram/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(Usuario.objects.create_user('rrhh', 'rrhh@acme.test', 'pw', role='ADMIN'))
+        self.empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.sucursal = Sucursal.objects.create(empresa=self.empresa, nombre='Matriz')
+        self.cargo = Cargo.objects.create(empresa=self.empresa, nombre='Analista')
+        self.ceo = self.employee('Ceo')
+        self.ana = self.employee('Ana', self.ceo)
+        self.luis = self.employee('Luis', self.ceo)
+        self.eva = self.employee('Eva', self.ana)
+        self.employee('Ex', self.ana, estado='inactivo')
+
+    def employee(self, nombre, manager=None, estado='activo'):
+        return Empleado.objects.create(
+            empresa=self.empresa, sucursal=self.sucursal, cargo=self.cargo, manager=manager, estado=estado,
+            nombres=nombre, apellidos='Paz', documento=f'D-{nombre}', email=f'{nombre.lower()}@acme.test',
+            telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+
+    def get(self, **params):
+        response = self.client.get(self.url, dict(params, empresa=self.empresa.pk))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_tree_of_active_employees(self):
+        data = self.get()
+        self.assertEqual(data['total_employees'], 4)
+        (root,) = data['organization']
+        self.assertEqual(root['name'], 'Ceo Paz')
+        self.assertEqual([child['name'] for child in root['children']], ['Ana Paz', 'Luis Paz'])
+        self.assertEqual([child['name'] for child in root['children'][0]['children']], ['Eva Paz'])
+
+    def test_subtree_stops_at_depth_with_counts(self):
+        data = self.get(root=self.ceo.pk)
+        self.assertEqual((data['root'], data['depth']), (self.ceo.pk, 1))
+        ana = data['organization'][0]['children'][0]
+        self.assertEqual((ana['children_count'], ana['children']), (1, []))
+        data = self.get(root=self.ana.pk, depth=2)
+        self.assertEqual(data['organization'][0]['children'][0]['name'], 'Eva Paz')
+        self.assertEqual(self.client.get(self.url, {'root': 999999}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'layout': 'xml'}).status_code, 400)
+
+    def test_flat_layout_and_refresh_after_changes(self):
+        rows = self.get(layout='flat')['employees']
+        self.assertEqual([row['name'] for row in rows], ['Ceo Paz', 'Ana Paz', 'Luis Paz', 'Eva Paz'])
+        self.assertEqual({row['name']: row['manager_id'] for row in rows}['Eva Paz'], self.ana.pk)
+        self.eva.manager = self.luis
+        self.eva.save()
+        rows = self.get(layout='flat', root=self.luis.pk)['employees']
+        self.assertEqual([(row['name'], row['children_count']) for row in rows], [('Luis Paz', 1), ('Eva Paz', 0)])
+
+
+class HierarchyIndexTests(TestCase):
+    """Tabla de clausura EmpleadoJerarquia: se mantiene al cambiar jefes y rechaza ciclos."""
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.sucursal = Sucursal.objects.create(empresa=self.empresa, nombre='Matriz')
+        self.cargo = Cargo.objects.create(empresa=self.empresa, nombre='Analista')
+        self.ceo = self.employee('Ceo')
+        self.ana = self.employee('Ana', self.ceo)
+        self.luis = self.employee('Luis', self.ceo)
+        self.eva = self.employee('Eva', self.ana)
+        self.rosa = self.employee('Rosa', self.eva)
+
+    def employee(self, nombre, manager=None):
+        return Empleado.objects.create(
+            empresa=self.empresa, sucursal=self.sucursal, cargo=self.cargo, manager=manager,
+            nombres=nombre, apellidos='Paz', documento=f'D-{nombre}', email=f'{nombre.lower()}@acme.test',
+            telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+
+    def closure(self):
+        return set(EmpleadoJerarquia.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def assert_matches_rebuild(self):
+        incremental = self.closure()
+        rebuild_hierarchy()
+        self.assertEqual(incremental, self.closure())
+
+    def test_moving_a_subtree_updates_every_descendant(self):
+        self.eva.manager = self.luis
+        self.eva.save()
+        self.assert_matches_rebuild()
+        self.assertEqual([jefe.pk for jefe in chain_of_command(self.rosa.pk)], [self.eva.pk, self.luis.pk, self.ceo.pk])
+        self.assertEqual(
+            {(emp.pk, emp.nivel) for emp in all_reports(self.luis.pk)}, {(self.eva.pk, 1), (self.rosa.pk, 2)}
+        )
+        self.assertFalse(all_reports(self.ana.pk).exists())
+
+        move_employee(self.ana.pk, None)
+        self.assertEqual(chain_of_command(self.ana.pk), [])
+        self.ana.delete()
+        self.assert_matches_rebuild()
+
+    def test_cycles_are_rejected(self):
+        self.assertTrue(would_create_cycle(self.ana.pk, self.rosa.pk))
+        self.assertTrue(would_create_cycle(self.ana.pk, self.ana.pk))
+        self.assertFalse(would_create_cycle(self.rosa.pk, self.luis.pk))
+        serializer = EmpleadoSerializer(
+            self.ana, data={'manager': self.rosa.pk, 'cargo': self.cargo.pk}, partial=True
+        )
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('manager', serializer.errors)
+        # Sin validar (p. ej. admin o script), el índice deja el subárbol como raíz
+        move_employee(self.ana.pk, self.rosa.pk)
+        self.assertEqual(chain_of_command(self.ana.pk), [])
+        self.assertIn(self.rosa.pk, {emp.pk for emp in all_reports(self.ana.pk)})
+
+
+class LeaveBalanceAnnotationTests(TestCase):
+    """El listado de solicitudes trae el saldo del periodo anotado, sin una consulta por fila."""
+
+    url = '/api/leaves/requests/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(Usuario.objects.create_user('rrhh', 'rrhh@acme.test', 'pw', role='ADMIN'))
+        self.empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        self.sucursal = Sucursal.objects.create(empresa=self.empresa, nombre='Matriz')
+        self.cargo = Cargo.objects.create(empresa=self.empresa, nombre='Analista')
+        self.seq = 0
+
+    def add_leaves(self, count):
+        for _ in range(count):
+            self.seq += 1
+            empleado = Empleado.objects.create(
+                empresa=self.empresa, sucursal=self.sucursal, cargo=self.cargo,
+                nombres=f'N{self.seq}', apellidos='Paz', documento=f'D{self.seq}',
+                email=f'e{self.seq}@acme.test', telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+            )
+            SaldoVacaciones.objects.create(empleado=empleado, periodo=2026, dias_disponibles=Decimal(self.seq))
+            for year in (2026, 2027):
+                LeaveRequest.objects.create(
+                    empleado=empleado, start_date=date(year, 3, 2), end_date=date(year, 3, 3), days=Decimal('2'),
+                )
+
+    def list_leaves(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return len(ctx.captured_queries), data['results'] if isinstance(data, dict) else data
 
-# Create your tests here.
+    def test_balance_of_the_request_period(self):
+        self.add_leaves(2)
+        baseline, rows = self.list_leaves()
+        balances = {(row['empleado'], row['start_date'][:4]): row['saldo_disponible'] for row in rows}
+        first, second = Empleado.objects.order_by('pk').values_list('pk', flat=True)
+        self.assertEqual(balances[(first, '2026')], 1.0)
+        self.assertEqual(balances[(second, '2026')], 2.0)
+        # Sin saldo abierto para 2027
+        self.assertIsNone(balances[(first, '2027')])
+        self.add_leaves(8)
+        queries, rows = self.list_leaves()
+        self.assertEqual(queries, baseline)
+        self.assertEqual(len(rows), 20)
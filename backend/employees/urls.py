@@ -88,14 +88,16 @@ if HAS_EXTRA_API:
 # ENDPOINTS CLAVE (AUTO-GENERADOS POR DRF ROUTER):
 # ========================================================
 # Empresas:              /api/employees/api/empresas/
-# Empleados:             /api/employees/api/empleados/
+# Empleados:             /api/employees/api/empleados/  (?equipo_de=<id>)
+# Equipo transitivo:     /api/employees/api/empleados/{id}/equipo/
+# Cadena de mando:       /api/employees/api/empleados/{id}/cadena-mando/
 # Sucursales:            /api/employees/api/sucursales/
 # Puestos:               /api/employees/api/puestos/
 # Contratos:             /api/employees/api/contratos/
 # Documentos:            /api/employees/api/documentos/
 # Tipos Ausencia:        /api/employees/api/tipos-ausencia/
 # Solicitudes Ausencia:  /api/employees/api/solicitudes-ausencia/
-# Saldos Vacaciones:     /api/employees/api/saldos-vacaciones/
+# Saldos Vacaciones:     /api/employees/api/saldos-vacaciones/  (GET; POST solo RRHH; sin PUT/PATCH/DELETE)
 # KPIs:                  /api/employees/api/kpis/
 # Resultados KPI:        /api/employees/api/resultados-kpi/
 # Legacy cargos:         /api/employees/api/cargos/
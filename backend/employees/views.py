@@ -4,30 +4,42 @@
 # Sin render(), TemplateView, ListView - SOLO JSON
 # ========================================================
 
-from rest_framework import viewsets, filters, status
+from rest_framework import mixins, viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from datetime import time, datetime, date
-from calendar import monthrange
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
 from django.db.models import Sum
 from django.db.models.functions import Coalesce
 
+from core.idempotency import idempotent
 from core.models import Empresa
+from core.permissions import IsHRUser, is_hr_user
 from .models import (
     Sucursal, Empleado, Contrato, DocumentoEmpleado,
-    TipoAusencia, SolicitudAusencia, SaldoVacaciones, KPI, ResultadoKPI,
+    TipoAusencia, SolicitudAusencia, SaldoVacaciones, MovimientoVacaciones, KPI, ResultadoKPI,
     Cargo, Contract, LeaveRequest, OnboardingTask,
 )
 from attendance.models import RegistroAsistencia, Turno
-from employees.services.payroll import PayrollCalculator
+from attendance.services.live_feed import publish_mark
+from attendance.services.marking import MISSING_CHECK_IN, register_mark
+from core.dates import days_q, today
+from employees.services.counts import active_employee_count
+from employees.services.employment import load_employment_context, with_employment_context
+from employees.services.hierarchy import all_reports, chain_of_command, team_q
+from employees.services.payroll_snapshot import get_payroll_preview
+from employees.services.resolver import resolve_employee
+from employees.services.vacations import adjust_days
+from reports.serializers import ReportJobSerializer
+from reports.services.jobs import submit_job
 from .serializers import (
     EmpresaSerializer, SucursalSerializer, EmpleadoSerializer,
     ContratoSerializer, DocumentoEmpleadoSerializer,
-    TipoAusenciaSerializer, SolicitudAusenciaSerializer, SaldoVacacionesSerializer,
+    TipoAusenciaSerializer, SolicitudAusenciaSerializer, SaldoVacacionesSerializer, MovimientoVacacionesSerializer,
     KPISerializer, ResultadoKPISerializer, EmployeePortalSerializer,
     CargoSerializer, ContractSerializer, LeaveRequestSerializer, OnboardingTaskSerializer,
 )
@@ -44,7 +56,7 @@ class EmpresaViewSet(viewsets.ModelViewSet):
 
 
 class EmpleadoViewSet(viewsets.ModelViewSet):
-    queryset = Empleado.objects.select_related('empresa', 'cargo', 'sucursal', 'manager').all()
+    queryset = with_employment_context(Empleado.objects.select_related('empresa', 'cargo', 'sucursal', 'manager'))
     serializer_class = EmpleadoSerializer
     permission_classes = [AllowAny]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -56,12 +68,49 @@ class EmpleadoViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def subordinados(self, request, pk=None):
         empleado = self.get_object()
-        qs = empleado.subordinados.filter(estado='activo')
+        qs = with_employment_context(
+            empleado.subordinados.filter(estado='activo').select_related('cargo', 'sucursal')
+        )
         return Response(EmpleadoSerializer(qs, many=True).data)
 
+    def get_queryset(self):
+        qs = super().get_queryset()
+        equipo_de = self.request.query_params.get('equipo_de')
+        if equipo_de and equipo_de.isdigit():
+            qs = qs.filter(team_q('id', int(equipo_de)))
+        return qs
+
+    @action(detail=True, methods=['get'])
+    def equipo(self, request, pk=None):
+        """Subordinados directos e indirectos (activos); `?max_depth=N` limita los niveles."""
+        empleado = self.get_object()
+        max_depth = request.query_params.get('max_depth')
+        qs = all_reports(empleado.pk, int(max_depth) if max_depth and max_depth.isdigit() else None)
+        qs = with_employment_context(qs.filter(estado='activo').select_related('empresa', 'manager'))
+        data = EmpleadoSerializer(qs, many=True).data
+        for row, obj in zip(data, qs):
+            row['nivel'] = obj.nivel
+        return Response(data)
+
+    @action(detail=True, methods=['get'], url_path='cadena-mando')
+    def cadena_mando(self, request, pk=None):
+        """Jefes desde el directo hasta el más alto."""
+        empleado = self.get_object()
+        return Response([
+            {
+                'id': jefe.id,
+                'nombre_completo': jefe.nombre_completo,
+                'cargo_nombre': jefe.cargo.nombre if jefe.cargo else None,
+                'nivel': nivel,
+            }
+            for nivel, jefe in enumerate(chain_of_command(empleado.pk), start=1)
+        ])
+
 
 class SucursalViewSet(viewsets.ModelViewSet):
-    queryset = Sucursal.objects.select_related('empresa', 'padre').all()
+    queryset = Sucursal.objects.select_related('empresa', 'padre').annotate(
+        active_employee_count=active_employee_count()
+    )
     serializer_class = SucursalSerializer
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -76,7 +125,9 @@ class SucursalViewSet(viewsets.ModelViewSet):
         Retorna todos los empleados de una sucursal específica.
         """
         sucursal = self.get_object()
-        empleados = sucursal.empleados.filter(estado='activo')
+        empleados = with_employment_context(
+            sucursal.empleados.filter(estado='activo').select_related('cargo', 'sucursal')
+        )
         serializer = EmpleadoSerializer(empleados, many=True)
         return Response(serializer.data)
 
@@ -84,7 +135,7 @@ class SucursalViewSet(viewsets.ModelViewSet):
 class PuestoViewSet(viewsets.ModelViewSet):
     """Alias de cargos para mantener la ruta /puestos sin modelo duplicado."""
 
-    queryset = Cargo.objects.all()
+    queryset = Cargo.objects.annotate(active_employee_count=active_employee_count())
     serializer_class = CargoSerializer
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -95,7 +146,9 @@ class PuestoViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def empleados(self, request, pk=None):
         cargo = self.get_object()
-        empleados = cargo.empleados.filter(estado='activo') if hasattr(cargo, 'empleados') else []
+        empleados = with_employment_context(
+            cargo.empleados.filter(estado='activo').select_related('cargo', 'sucursal')
+        )
         return Response(EmpleadoSerializer(empleados, many=True).data)
 
 
@@ -134,6 +187,10 @@ class SolicitudAusenciaViewSet(viewsets.ModelViewSet):
     ordering_fields = ['fecha_inicio', 'created_at']
     ordering = ['-created_at']
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     @action(detail=True, methods=['post'])
     def aprobar(self, request, pk=None):
         solicitud = self.get_object()
@@ -149,7 +206,13 @@ class SolicitudAusenciaViewSet(viewsets.ModelViewSet):
         return Response(self.get_serializer(solicitud).data)
 
 
-class SaldoVacacionesViewSet(viewsets.ModelViewSet):
+class SaldoVacacionesViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Saldos de vacaciones. El saldo cambia únicamente vía movimientos (ver services.vacations):
+    RRHH abre un saldo con POST (el valor inicial queda como ajuste "Saldo inicial") y lo
+    corrige con `ajustar`; no hay PUT/PATCH/DELETE.
+    """
+
     queryset = SaldoVacaciones.objects.select_related('empleado').all()
     serializer_class = SaldoVacacionesSerializer
     permission_classes = [AllowAny]
@@ -158,6 +221,53 @@ class SaldoVacacionesViewSet(viewsets.ModelViewSet):
     ordering_fields = ['periodo']
     ordering = ['-periodo']
 
+    def get_permissions(self):
+        if self.action == 'create':
+            return [IsHRUser()]
+        return super().get_permissions()
+
+    def create(self, request, *args, **kwargs):
+        try:
+            dias = Decimal(str(request.data.get('dias_disponibles') or 0))
+        except (InvalidOperation, ValueError):
+            return Response({'detail': 'dias_disponibles debe ser un número'}, status=status.HTTP_400_BAD_REQUEST)
+        if not dias.is_finite() or dias < 0:
+            return Response({'detail': 'dias_disponibles no puede ser negativo'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            saldo = serializer.save()
+            if dias:
+                adjust_days(saldo.empleado_id, saldo.periodo, dias, request.user, 'Saldo inicial')
+        saldo.refresh_from_db()
+        return Response(self.get_serializer(saldo).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def movimientos(self, request, pk=None):
+        """Libro del saldo: solo RRHH o el propio empleado."""
+        saldo = self.get_object()
+        if not is_hr_user(request.user):
+            empleado = resolve_employee(request.user, include_admin=True)
+            if not empleado or empleado.pk != saldo.empleado_id:
+                return Response({'detail': 'No autorizado.'}, status=status.HTTP_403_FORBIDDEN)
+        qs = MovimientoVacaciones.objects.filter(empleado_id=saldo.empleado_id, periodo=saldo.periodo)
+        return Response(MovimientoVacacionesSerializer(qs, many=True).data)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsHRUser])
+    def ajustar(self, request, pk=None):
+        """Ajuste manual del saldo (RRHH): {"dias": <+/- decimal>, "descripcion": "..."}."""
+        saldo = self.get_object()
+        try:
+            dias = Decimal(str(request.data.get('dias')))
+        except (InvalidOperation, ValueError):
+            return Response({'detail': 'dias debe ser un número'}, status=status.HTTP_400_BAD_REQUEST)
+        if not dias.is_finite() or not dias:
+            return Response({'detail': 'dias debe ser distinto de cero'}, status=status.HTTP_400_BAD_REQUEST)
+        if not adjust_days(saldo.empleado_id, saldo.periodo, dias, request.user, request.data.get('descripcion', '')):
+            return Response({'detail': 'El ajuste dejaría el saldo en negativo'}, status=status.HTTP_400_BAD_REQUEST)
+        saldo.refresh_from_db()
+        return Response(self.get_serializer(saldo).data)
+
 
 class KPIViewSet(viewsets.ModelViewSet):
     queryset = KPI.objects.all()
@@ -181,20 +291,8 @@ class EmployeePortalViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
 
     def _get_empleado(self, request):
-        user = request.user
-        # 1) relación directa OneToOne
-        if hasattr(user, "empleado") and user.empleado:
-            return user.empleado
-        # 2) búsqueda por FK user
-        emp = Empleado.objects.filter(user=user).first()
-        if emp:
-            return emp
-        # 3) fallback por correo o username
-        if user.email:
-            emp = Empleado.objects.filter(email=user.email).first()
-            if emp:
-                return emp
-        return Empleado.objects.filter(email=user.username).first()
+        # Un ADMIN con ficha de empleado también usa su portal
+        return resolve_employee(request.user, include_admin=True)
 
     @action(detail=False, methods=["get"], url_path="me")
     def me(self, request):
@@ -202,6 +300,7 @@ class EmployeePortalViewSet(viewsets.ViewSet):
         if not emp:
             return Response({"detail": "No se encontró empleado vinculado."}, status=status.HTTP_404_NOT_FOUND)
 
+        load_employment_context([emp])
         serializer = EmployeePortalSerializer(emp)
         return Response(serializer.data)
 
@@ -211,9 +310,9 @@ class EmployeePortalViewSet(viewsets.ViewSet):
         if not emp:
             return Response({"detail": "No se encontró empleado vinculado."}, status=status.HTTP_404_NOT_FOUND)
 
-        hoy = timezone.now().date()
+        hoy = today()
         first_month_day = hoy.replace(day=1)
-        regs_mes = RegistroAsistencia.objects.filter(empleado=emp, fecha_hora__date__gte=first_month_day)
+        regs_mes = RegistroAsistencia.objects.filter(days_q('fecha_hora', first_month_day), empleado=emp)
         dias_con_marca = regs_mes.filter(tipo='ENTRADA').values_list('fecha_hora__date', flat=True).distinct().count()
         dias_transcurridos = (hoy - first_month_day).days + 1
         asistencia_pct = round((dias_con_marca / dias_transcurridos) * 100, 2) if dias_transcurridos else 0
@@ -264,6 +363,7 @@ class EmployeePortalViewSet(viewsets.ViewSet):
         return Response(data)
 
     @action(detail=False, methods=["post"], url_path="mark")
+    @idempotent
     def mark(self, request):
         emp = self._get_empleado(request)
         if not emp:
@@ -273,36 +373,13 @@ class EmployeePortalViewSet(viewsets.ViewSet):
         latitud = request.data.get('latitud')
         longitud = request.data.get('longitud')
 
-        hoy = timezone.now().date()
-        registros_hoy = RegistroAsistencia.objects.filter(empleado=emp, fecha_hora__date=hoy)
-
-        if tipo == 'ENTRADA' and registros_hoy.filter(tipo='ENTRADA').exists():
-            return Response({"detail": "Ya marcaste entrada hoy."}, status=status.HTTP_400_BAD_REQUEST)
-        if tipo == 'SALIDA':
-            if not registros_hoy.filter(tipo='ENTRADA').exists():
-                return Response({"detail": "Marca entrada antes de salida."}, status=status.HTTP_400_BAD_REQUEST)
-            if registros_hoy.filter(tipo='SALIDA').exists():
-                return Response({"detail": "Ya marcaste salida hoy."}, status=status.HTTP_400_BAD_REQUEST)
-
-        es_tardanza = False
-        minutos_atraso = 0
-        if tipo == 'ENTRADA':
-            hora_limite = time(9, 0)
-            ahora = timezone.localtime().time()
-            if ahora > hora_limite:
-                es_tardanza = True
-                t_lim = datetime.combine(hoy, hora_limite)
-                t_now = datetime.combine(hoy, ahora)
-                minutos_atraso = int((t_now - t_lim).total_seconds() / 60)
-
-        registro = RegistroAsistencia.objects.create(
-            empleado=emp,
-            tipo=tipo,
-            latitud=latitud,
-            longitud=longitud,
-            es_tardanza=es_tardanza,
-            minutos_atraso=minutos_atraso,
-        )
+        registro, error = register_mark(emp, tipo, latitud, longitud)
+        if error == MISSING_CHECK_IN:
+            return Response({"detail": "Marca entrada antes de salida."}, status=status.HTTP_400_BAD_REQUEST)
+        if error:
+            message = "Ya marcaste salida hoy." if tipo == 'SALIDA' else "Ya marcaste entrada hoy."
+            return Response({"detail": message}, status=status.HTTP_400_BAD_REQUEST)
+        publish_mark(registro)
 
         return Response(
             {
@@ -320,7 +397,7 @@ class EmployeePortalViewSet(viewsets.ViewSet):
 
 
 class PayrollPreviewView(APIView):
-    """Calcula pre-nómina simple para HR."""
+    """Pre-nómina simple para HR servida desde PayrollSnapshot. Con ?async=1 encola un ReportJob y responde 202."""
 
     permission_classes = [IsAuthenticated]
 
@@ -328,24 +405,29 @@ class PayrollPreviewView(APIView):
         month = int(request.query_params.get("month", timezone.now().month))
         year = int(request.query_params.get("year", timezone.now().year))
 
-        start = date(year, month, 1)
-        last_day = monthrange(year, month)[1]
-        end = date(year, month, last_day)
-        calculator = PayrollCalculator(start, end)
-        payload = calculator.calculate()
+        if request.query_params.get("async") in ("1", "true"):
+            job = submit_job("PAYROLL_PREVIEW", year, month, user=request.user)
+            return Response(
+                ReportJobSerializer(job, context={"request": request}).data,
+                status=status.HTTP_200_OK if job.status == "DONE" else status.HTTP_202_ACCEPTED,
+            )
+
+        payload = get_payroll_preview(year, month)
 
         return Response({
             "month": month,
             "year": year,
             "results": payload.get("results", []),
             "issues": payload.get("issues", []),
+            "inputs_hash": payload.get("inputs_hash"),
+            "computed_at": payload.get("computed_at"),
         })
 
 
 # ===== LEGACY VIEWSETS (se mantienen) =====
 
 class CargoViewSet(viewsets.ModelViewSet):
-    queryset = Cargo.objects.all()
+    queryset = Cargo.objects.annotate(active_employee_count=active_employee_count())
     serializer_class = CargoSerializer
     permission_classes = [AllowAny]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -356,7 +438,9 @@ class CargoViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     def empleados(self, request, pk=None):
         cargo = self.get_object()
-        empleados = cargo.empleados.filter(estado='activo') if hasattr(cargo, 'empleados') else []
+        empleados = with_employment_context(
+            cargo.empleados.filter(estado='activo').select_related('cargo', 'sucursal')
+        )
         serializer = EmpleadoSerializer(empleados, many=True)
         return Response(serializer.data)
 
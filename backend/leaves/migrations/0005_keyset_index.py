@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaves', '0004_remove_leaverequest_approved_by_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaverequest',
+            index=models.Index(fields=['created_at', 'id'], name='leaves_leav_created_b10ac7_idx'),
+        ),
+    ]
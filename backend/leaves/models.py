@@ -36,6 +36,7 @@ class LeaveRequest(TimeStampedModel):
         indexes = [
             models.Index(fields=["empleado", "status"]),
             models.Index(fields=["start_date", "end_date"]),
+            models.Index(fields=["created_at", "id"]),
         ]
 
     def __str__(self) -> str:
@@ -55,6 +55,9 @@ class LeaveRequestSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
     def get_saldo_disponible(self, obj):
+        if hasattr(obj, "saldo_dias"):
+            # Anotado por LeaveRequestViewSet.get_queryset
+            return float(obj.saldo_dias) if obj.saldo_dias is not None else None
         saldo = (
             SaldoVacaciones.objects.filter(empleado=obj.empleado, periodo=obj.period)
             .order_by("-created_at")
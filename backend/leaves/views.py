@@ -1,4 +1,6 @@
-from django.utils import timezone
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import ExtractYear
 from rest_framework import viewsets, status, filters
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.decorators import action
@@ -6,13 +8,18 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 
-from employees.models import Empleado, SaldoVacaciones
+from core.idempotency import idempotent
+from core.pagination import KeysetPaginationMixin
+from employees.models import SaldoVacaciones
+from employees.services.hierarchy import team_q
+from employees.services.resolver import resolve_employee
+from employees.services.vacations import current_balance, debit_days, leave_reference
 from .models import LeaveRequest
 from .serializers import LeaveRequestSerializer
 from .permissions import IsAdminOrManager
 
 
-class LeaveRequestViewSet(viewsets.ModelViewSet):
+class LeaveRequestViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     """Solicitudes de permiso/vacaciones con flujo de aprobación."""
 
     queryset = LeaveRequest.objects.select_related("empleado", "empleado__empresa").all()
@@ -20,6 +27,7 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ["status", "empleado"]
     ordering = ["-created_at"]
+    cursor_field = "created_at"
 
     def get_permissions(self):
         if self.action in ["approve", "reject", "update", "partial_update", "destroy"]:
@@ -27,30 +35,34 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
         return [IsAuthenticated()]
 
     def _get_empleado(self):
-        user = self.request.user
-        if not user or not user.is_authenticated:
-            return None
-        if getattr(user, "role", None) == "ADMIN":
-            return None
-        if user.email:
-            emp = Empleado.objects.filter(email=user.email).first()
-            if emp:
-                return emp
-        return Empleado.objects.filter(email=user.username).first()
+        return resolve_employee(self.request.user)
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        # Saldo del periodo (año de inicio) en la misma consulta; ver LeaveRequestSerializer.get_saldo_disponible
+        saldo = SaldoVacaciones.objects.filter(
+            empleado_id=OuterRef("empleado_id"), periodo=ExtractYear(OuterRef("start_date"))
+        ).values("dias_disponibles")[:1]
+        qs = super().get_queryset().annotate(saldo_dias=Subquery(saldo))
         day = self.request.query_params.get("day")
+        team_of = self.request.query_params.get("team_of")
         if day:
             qs = qs.filter(start_date__lte=day, end_date__gte=day)
         user = self.request.user
         if user.is_superuser or getattr(user, "role", None) in {"ADMIN", "MANAGER"} or user.is_staff:
+            if team_of and team_of.isdigit():
+                qs = qs.filter(team_q("empleado_id", int(team_of), include_self=True))
             return qs
         empleado = self._get_empleado()
         if not empleado:
             return qs.none()
+        if team_of == str(empleado.pk):
+            return qs.filter(team_q("empleado_id", empleado.pk, include_self=True))
         return qs.filter(empleado=empleado)
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         empleado = self._get_empleado()
         if not empleado:
@@ -63,21 +75,20 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
         if leave.status != "PENDING":
             return Response({"detail": "La solicitud ya fue procesada."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Validar saldo y descontar
-        saldo, _ = SaldoVacaciones.objects.get_or_create(
-            empleado=leave.empleado,
-            periodo=leave.period,
-            defaults={"dias_disponibles": 0},
-        )
-        if saldo.dias_disponibles < leave.days:
-            return Response({"detail": "Saldo insuficiente para aprobar."}, status=status.HTTP_400_BAD_REQUEST)
-
-        saldo.dias_disponibles -= leave.days
-        saldo.save(update_fields=["dias_disponibles", "updated_at"])
-
-        leave.mark_approved(request.user)
-        leave.save(update_fields=["status", "reviewed_by", "approved_at", "rejection_reason", "updated_at"])
-
+        # Fila bloqueada + débito condicional con F(): aprobaciones concurrentes no descuentan dos veces
+        with transaction.atomic():
+            leave = LeaveRequest.objects.select_for_update().get(pk=leave.pk)
+            if leave.status != "PENDING":
+                return Response({"detail": "La solicitud ya fue procesada."}, status=status.HTTP_400_BAD_REQUEST)
+            if not debit_days(
+                leave.empleado_id, leave.period, leave.days, leave_reference(leave.pk),
+                user=request.user, descripcion=f"Permiso {leave.start_date} - {leave.end_date}",
+            ):
+                return Response({"detail": "Saldo insuficiente para aprobar."}, status=status.HTTP_400_BAD_REQUEST)
+            leave.mark_approved(request.user)
+            leave.save(update_fields=["status", "reviewed_by", "approved_at", "rejection_reason", "updated_at"])
+
+        leave.saldo_dias = current_balance(leave.empleado_id, leave.period)
         return Response(self.get_serializer(leave).data)
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, IsAdminOrManager])
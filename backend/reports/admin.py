@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import ReportJob
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ("report_type", "year", "month", "empresa", "status", "is_stale", "created_at", "finished_at")
+    list_filter = ("report_type", "status", "is_stale")
+    readonly_fields = ("created_at", "updated_at", "started_at", "finished_at", "attempts", "worker")
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class ReportsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "reports"
+
+    def ready(self):
+        # Invalidación de resultados cacheados cuando cambian asistencia/contratos
+        from . import signals  # noqa: F401
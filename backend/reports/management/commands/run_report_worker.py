@@ -0,0 +1,41 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from reports.services.jobs import requeue_abandoned_jobs, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Procesa la cola de reportes (tabla ReportJob) con un pool de hilos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="Hilos concurrentes")
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Segundos entre consultas a la cola")
+        parser.add_argument("--once", action="store_true", help="Vaciar la cola y terminar")
+
+    def handle(self, *args, **options):
+        workers = max(1, options["workers"])
+        stop_event = threading.Event()
+
+        def _loop():
+            total = 0
+            while not stop_event.is_set():
+                requeue_abandoned_jobs()
+                total += run_pending_jobs(stop_event=stop_event)
+                if options["once"]:
+                    break
+                stop_event.wait(options["poll_interval"])
+            return total
+
+        self.stdout.write(f"Worker de reportes iniciado con {workers} hilo(s).")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_loop) for _ in range(workers)]
+            try:
+                while not all(f.done() for f in futures):
+                    time.sleep(0.5)
+            except KeyboardInterrupt:
+                stop_event.set()
+        processed = sum(f.result() for f in futures)
+        self.stdout.write(self.style.SUCCESS(f"Reportes procesados: {processed}"))
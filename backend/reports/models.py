@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+from core.models import Empresa, TimeStampedModel
+
+
+class ReportJob(TimeStampedModel):
+    """Trabajo de reporte asíncrono; la propia tabla actúa como cola (sin broker externo)."""
+
+    TYPE_CHOICES = [
+        ("PRENOMINA_EXCEL", "Pre-nómina de asistencia (Excel)"),
+        ("PAYROLL_PREVIEW", "Pre-nómina (vista previa de pagos)"),
+    ]
+    STATUS_CHOICES = [
+        ("PENDING", "Pendiente"),
+        ("RUNNING", "En proceso"),
+        ("DONE", "Completado"),
+        ("FAILED", "Fallido"),
+    ]
+
+    report_type = models.CharField(max_length=30, choices=TYPE_CHOICES)
+    year = models.PositiveIntegerField()
+    month = models.PositiveSmallIntegerField()
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=True, blank=True, related_name="report_jobs")
+    cache_key = models.CharField(max_length=80, help_text="tipo:periodo:empresa")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="PENDING")
+    is_stale = models.BooleanField(default=False, help_text="Los datos de origen cambiaron tras generarlo")
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="report_jobs",
+    )
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    artifact = models.FileField(upload_to="reports/%Y/%m/", null=True, blank=True)
+    error = models.TextField(blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=120, blank=True, default="")
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Trabajo de Reporte"
+        verbose_name_plural = "Trabajos de Reporte"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+            models.Index(fields=["cache_key", "status"]),
+            models.Index(fields=["year", "month"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.get_report_type_display()} {self.year}-{self.month:02d} ({self.status})"
+
+    @staticmethod
+    def build_cache_key(report_type: str, year: int, month: int, empresa_id=None) -> str:
+        return f"{report_type}:{year}-{month:02d}:{empresa_id or 'all'}"
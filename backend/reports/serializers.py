@@ -0,0 +1,48 @@
+from django.urls import reverse
+from rest_framework import serializers
+
+from .models import ReportJob
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            "id",
+            "report_type",
+            "year",
+            "month",
+            "empresa",
+            "status",
+            "is_stale",
+            "error",
+            "attempts",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "download_url",
+        ]
+        read_only_fields = [
+            "status",
+            "is_stale",
+            "error",
+            "attempts",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "download_url",
+        ]
+
+    def validate_month(self, value):
+        if not 1 <= value <= 12:
+            raise serializers.ValidationError("Mes inválido.")
+        return value
+
+    def get_download_url(self, obj):
+        if obj.status != "DONE":
+            return None
+        request = self.context.get("request")
+        path = reverse("reports:report-jobs-download", args=[obj.pk])
+        return request.build_absolute_uri(path) if request else path
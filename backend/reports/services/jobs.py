@@ -0,0 +1,164 @@
+"""
+Cola de reportes respaldada por la tabla ReportJob.
+
+- `submit_job` reutiliza un resultado vigente (o un trabajo en curso) del mismo
+  solicitante con la misma clave (tipo, periodo, empresa) antes de encolar uno nuevo.
+- `claim_next_job` toma un trabajo con un UPDATE condicional, así varios workers
+  pueden consultar la misma tabla sin tomar dos veces el mismo trabajo.
+- `invalidate_period` / `invalidate_type` marcan resultados como obsoletos cuando
+  cambian los datos de origen (ver reports/signals.py).
+"""
+import logging
+import os
+import socket
+import tempfile
+import threading
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from django.core.files import File
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from attendance.services.prenomina import month_bounds, prenomina_filename, write_prenomina_xlsx
+from employees.services.payroll_snapshot import get_payroll_preview
+from reports.models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+# Un trabajo RUNNING sin terminar tras este tiempo se considera abandonado (worker caído)
+RUNNING_TIMEOUT = timedelta(minutes=30)
+
+
+def _run_prenomina_excel(job: ReportJob) -> None:
+    start, end = month_bounds(job.year, job.month)
+    with tempfile.TemporaryFile() as tmp:
+        write_prenomina_xlsx(tmp, start, end, empresa_id=job.empresa_id)
+        tmp.seek(0)
+        job.artifact.save(prenomina_filename(start), File(tmp), save=False)
+
+
+def _run_payroll_preview(job: ReportJob) -> None:
+    payload = get_payroll_preview(job.year, job.month, empresa_id=job.empresa_id)
+    job.result = {
+        "month": job.month,
+        "year": job.year,
+        "results": payload.get("results", []),
+        "issues": payload.get("issues", []),
+    }
+
+
+RUNNERS: Dict[str, Callable[[ReportJob], None]] = {
+    "PRENOMINA_EXCEL": _run_prenomina_excel,
+    "PAYROLL_PREVIEW": _run_payroll_preview,
+}
+
+
+def submit_job(report_type: str, year: int, month: int, empresa_id=None, user=None, force: bool = False) -> ReportJob:
+    if report_type not in RUNNERS:
+        raise ValueError(f"Tipo de reporte no soportado: {report_type}")
+    cache_key = ReportJob.build_cache_key(report_type, year, month, empresa_id)
+    requester = user if user and user.is_authenticated else None
+
+    if not force:
+        existing = (
+            ReportJob.objects.filter(
+                cache_key=cache_key, requested_by=requester, is_stale=False,
+                status__in=["PENDING", "RUNNING", "DONE"],
+            )
+            .order_by("-created_at")
+            .first()
+        )
+        if existing:
+            return existing
+
+    return ReportJob.objects.create(
+        report_type=report_type,
+        year=year,
+        month=month,
+        empresa_id=empresa_id,
+        cache_key=cache_key,
+        requested_by=requester,
+    )
+
+
+def _worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def requeue_abandoned_jobs() -> int:
+    cutoff = timezone.now() - RUNNING_TIMEOUT
+    return ReportJob.objects.filter(
+        status="RUNNING", started_at__lt=cutoff, attempts__lt=MAX_ATTEMPTS
+    ).update(status="PENDING", worker="")
+
+
+def claim_next_job() -> Optional[ReportJob]:
+    """Reserva el trabajo pendiente más antiguo; None si la cola está vacía."""
+    worker = _worker_name()
+    candidates = ReportJob.objects.filter(status="PENDING").order_by("created_at").values_list("pk", flat=True)[:10]
+    for pk in candidates:
+        claimed = ReportJob.objects.filter(pk=pk, status="PENDING").update(
+            status="RUNNING",
+            worker=worker,
+            attempts=F("attempts") + 1,
+            started_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        if claimed:
+            return ReportJob.objects.get(pk=pk)
+    return None
+
+
+def run_job(job: ReportJob) -> ReportJob:
+    try:
+        RUNNERS[job.report_type](job)
+    except Exception as exc:  # el error queda registrado en el trabajo
+        logger.exception("Falló el reporte %s", job.pk)
+        job.status = "FAILED" if job.attempts >= MAX_ATTEMPTS else "PENDING"
+        job.error = str(exc)
+        job.finished_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at", "updated_at"])
+        return job
+
+    job.status = "DONE"
+    job.error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "artifact", "error", "finished_at", "updated_at"])
+    return job
+
+
+def run_pending_jobs(stop_event: Optional[threading.Event] = None, max_jobs: Optional[int] = None) -> int:
+    """Procesa trabajos hasta vaciar la cola, llegar a `max_jobs` o recibir `stop_event`."""
+    processed = 0
+    while not (stop_event and stop_event.is_set()):
+        if max_jobs is not None and processed >= max_jobs:
+            break
+        close_old_connections()
+        job = claim_next_job()
+        if not job:
+            break
+        run_job(job)
+        processed += 1
+    close_old_connections()
+    return processed
+
+
+def invalidate_period(year: int, month: int, report_types=None) -> int:
+    """Marca como obsoletos los resultados del periodo (todas las empresas)."""
+    return (
+        ReportJob.objects.filter(year=year, month=month, is_stale=False)
+        .filter(report_type__in=report_types or list(RUNNERS.keys()))
+        .exclude(status="FAILED")
+        .update(is_stale=True)
+    )
+
+
+def invalidate_type(report_type: str, empresa_id=None) -> int:
+    """Marca como obsoletos todos los periodos de un tipo de reporte."""
+    qs = ReportJob.objects.filter(report_type=report_type, is_stale=False).exclude(status="FAILED")
+    if empresa_id:
+        qs = qs.filter(Q(empresa_id=empresa_id) | Q(empresa__isnull=True))
+    return qs.update(is_stale=True)
@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord, RegistroAsistencia
+from attendance.signals import marks_bulk_created
+from employees.models import Contract, Contrato
+from leaves.models import LeaveRequest
+
+from .services.jobs import invalidate_period, invalidate_type
+
+
+# Cada fuente de marcaciones invalida solo los reportes que la leen: la pre-nómina
+# en Excel lee RegistroAsistencia; la vista previa de pagos, AttendanceRecord.
+# En on_commit: un rollback no invalida nada y el UPDATE no alarga la transacción.
+MARK_SOURCE_REPORTS = {
+    AttendanceRecord: ["PAYROLL_PREVIEW"],
+    RegistroAsistencia: ["PRENOMINA_EXCEL"],
+}
+
+
+def _invalidate_periods_on_commit(sender, days) -> None:
+    periods = {(day.year, day.month) for day in days}
+    report_types = MARK_SOURCE_REPORTS[sender]
+
+    def invalidate():
+        for year, month in periods:
+            invalidate_period(year, month, report_types)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+def invalidate_reports_for_record(sender, instance: AttendanceRecord, **kwargs):
+    _invalidate_periods_on_commit(AttendanceRecord, [timezone.localdate(instance.timestamp)])
+
+
+@receiver(post_save, sender=RegistroAsistencia)
+@receiver(post_delete, sender=RegistroAsistencia)
+def invalidate_reports_for_registro(sender, instance: RegistroAsistencia, **kwargs):
+    _invalidate_periods_on_commit(RegistroAsistencia, [timezone.localdate(instance.fecha_hora)])
+
+
+@receiver(marks_bulk_created)
+def invalidate_reports_for_bulk_marks(sender, keys, **kwargs):
+    _invalidate_periods_on_commit(AttendanceRecord, [day for _, day in keys])
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+@receiver(post_save, sender=Contrato)
+@receiver(post_delete, sender=Contrato)
+@receiver(post_save, sender=LeaveRequest)
+@receiver(post_delete, sender=LeaveRequest)
+def invalidate_payroll_reports(sender, instance, **kwargs):
+    invalidate_type("PAYROLL_PREVIEW")
@@ -0,0 +1,89 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.db.models import F
+from django.test import TestCase
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord, RegistroAsistencia
+from core.models import Empresa, Usuario
+from employees.models import Cargo, Empleado, Sucursal
+from reports.models import ReportJob
+from reports.services import jobs
+
+
+class ReportJobQueueTests(TestCase):
+    """Cola ReportJob: reserva condicional, reintentos y reutilización de resultados vigentes."""
+
+    def setUp(self):
+        self.user = Usuario.objects.create_user('rrhh', 'rrhh@acme.test', 'pw', role='ADMIN')
+        self.hoy = timezone.localdate()
+
+    def submit(self, report_type='PRENOMINA_EXCEL', **kwargs):
+        return jobs.submit_job(report_type, self.hoy.year, self.hoy.month, user=self.user, **kwargs)
+
+    def test_claim_skips_job_taken_by_another_worker(self):
+        first = self.submit()
+        second = self.submit('PAYROLL_PREVIEW')
+        taken = []
+
+        def race(name):
+            # Otro worker reserva el primer candidato entre la lectura y el UPDATE condicional
+            if not taken:
+                taken.append(ReportJob.objects.filter(pk=first.pk).update(status='RUNNING', worker='otro'))
+            return F(name)
+
+        with mock.patch('reports.services.jobs.F', side_effect=race):
+            claimed = jobs.claim_next_job()
+        self.assertEqual(claimed.pk, second.pk)
+        self.assertEqual((claimed.status, claimed.attempts), ('RUNNING', 1))
+        first.refresh_from_db()
+        self.assertEqual((first.worker, first.attempts), ('otro', 0))
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_failed_job_is_retried_up_to_max_attempts(self):
+        job = self.submit()
+        failing = mock.Mock(side_effect=RuntimeError('sin datos'))
+        statuses = []
+        with mock.patch.dict(jobs.RUNNERS, {'PRENOMINA_EXCEL': failing}), self.assertLogs(jobs.logger, 'ERROR'):
+            for _ in range(jobs.MAX_ATTEMPTS):
+                statuses.append(jobs.run_job(jobs.claim_next_job()).status)
+        self.assertEqual(statuses, ['PENDING'] * (jobs.MAX_ATTEMPTS - 1) + ['FAILED'])
+        job.refresh_from_db()
+        self.assertEqual((job.attempts, job.error), (jobs.MAX_ATTEMPTS, 'sin datos'))
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_abandoned_jobs_requeued_until_max_attempts(self):
+        stuck, exhausted = self.submit(), self.submit('PAYROLL_PREVIEW')
+        old = timezone.now() - jobs.RUNNING_TIMEOUT - timedelta(minutes=1)
+        ReportJob.objects.filter(pk=stuck.pk).update(status='RUNNING', started_at=old, attempts=1)
+        ReportJob.objects.filter(pk=exhausted.pk).update(status='RUNNING', started_at=old, attempts=jobs.MAX_ATTEMPTS)
+        self.assertEqual(jobs.requeue_abandoned_jobs(), 1)
+        self.assertEqual(ReportJob.objects.get(pk=stuck.pk).status, 'PENDING')
+        self.assertEqual(ReportJob.objects.get(pk=exhausted.pk).status, 'RUNNING')
+
+    def test_fresh_result_reused_until_marks_change(self):
+        empresa = Empresa.objects.create(razon_social='ACME', ruc='1790000000001')
+        empleado = Empleado.objects.create(
+            empresa=empresa, nombres='Ana', apellidos='Paz', documento='D1',
+            sucursal=Sucursal.objects.create(empresa=empresa, nombre='Matriz'),
+            cargo=Cargo.objects.create(empresa=empresa, nombre='Analista'),
+            email='ana@acme.test', telefono='0999999999', fecha_ingreso=date(2024, 1, 1),
+        )
+        excel, preview = self.submit(), self.submit('PAYROLL_PREVIEW')
+        ReportJob.objects.update(status='DONE')
+        self.assertEqual(self.submit().pk, excel.pk)
+
+        # RegistroAsistencia solo afecta a la pre-nómina en Excel, y recién al confirmar
+        with self.captureOnCommitCallbacks() as callbacks:
+            RegistroAsistencia.objects.create(empleado=empleado, tipo='ENTRADA')
+            self.assertFalse(ReportJob.objects.filter(is_stale=True).exists())
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(self.submit().pk, excel.pk)
+        self.assertEqual(self.submit('PAYROLL_PREVIEW').pk, preview.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AttendanceRecord.objects.create(employee=empleado, type='CHECK_IN')
+        self.assertTrue(ReportJob.objects.get(pk=preview.pk).is_stale)
+        self.assertNotEqual(self.submit('PAYROLL_PREVIEW').pk, preview.pk)
@@ -0,0 +1,13 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+
+from .views import ReportJobViewSet
+
+app_name = "reports"
+
+router = DefaultRouter()
+router.register(r"jobs", ReportJobViewSet, basename="report-jobs")
+
+urlpatterns = [
+    path("", include(router.urls)),
+]
@@ -0,0 +1,63 @@
+from django.http import FileResponse
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from core.permissions import is_hr_user
+from .models import ReportJob
+from .serializers import ReportJobSerializer
+from .services.jobs import submit_job
+
+
+class ReportJobViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Reportes asíncronos (pre-nómina Excel y vista previa de nómina).
+
+    POST   /api/reports/jobs/                {report_type, year, month, empresa?, force?}
+    GET    /api/reports/jobs/{id}/           → estado del trabajo
+    GET    /api/reports/jobs/{id}/download/  → archivo o JSON cuando status=DONE
+    """
+
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        qs = ReportJob.objects.all()
+        user = self.request.user
+        if is_hr_user(user):
+            return qs
+        return qs.filter(requested_by=user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        empresa = data.get("empresa")
+        job = submit_job(
+            data["report_type"],
+            data["year"],
+            data["month"],
+            empresa_id=empresa.pk if empresa else None,
+            user=request.user,
+            force=str(request.data.get("force", "")).lower() in {"1", "true"},
+        )
+        response_status = status.HTTP_200_OK if job.status == "DONE" else status.HTTP_202_ACCEPTED
+        return Response(self.get_serializer(job).data, status=response_status)
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != "DONE":
+            return Response(
+                {"detail": "El reporte aún no está listo.", "status": job.status},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if job.artifact:
+            return FileResponse(job.artifact.open("rb"), as_attachment=True, filename=job.artifact.name.rsplit("/", 1)[-1])
+        return Response(job.result)
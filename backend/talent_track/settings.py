@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'employees',
     'attendance',
     'leaves',
+    'reports',
 ]
 
 # Modelo de usuario personalizado con roles
@@ -99,6 +100,19 @@ DATABASES = {
 }
 
 
+# Cache
+# Por defecto en memoria de cada proceso; con varios workers configurar un backend
+# compartido (p. ej. django.core.cache.backends.redis.RedisCache) para que se
+# activen las cachés condicionadas por core.cache.is_shared_cache().
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -162,6 +176,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
@@ -224,3 +239,10 @@ REST_FRAMEWORK = {
 # DJANGO-FILTER (para filtros avanzados en QuerySets)
 # =======================================================
 INSTALLED_APPS += ['django_filters']
+
+# =======================================================
+# ASISTENCIA: write-behind de marcaciones (attendance/services/write_behind.py)
+# =======================================================
+# Con True, POST /api/attendance/mark/ responde 202 y el comando
+# `flush_attendance_marks` vuelca las marcaciones por lotes.
+ATTENDANCE_WRITE_BEHIND = config('ATTENDANCE_WRITE_BEHIND', default=False, cast=bool)
@@ -43,6 +43,7 @@ urlpatterns = [
     path('api/employees/', include('employees.urls')),
     path('api/attendance/', include('attendance.urls')),
     path('api/leaves/', include('leaves.urls')),
+    path('api/reports/', include('reports.urls')),
     path('api/hr/payroll-preview/', PayrollPreviewView.as_view(), name='payroll-preview'),
     path('api/auth/login/', LoginWithProfileView.as_view(), name='login-with-profile'),
     path('api/auth/change-password-initial/', ChangePasswordInitialView.as_view(), name='change-password-initial'),